@@ -1,18 +1,49 @@
 import os
 import sys
 import csv
+import json
+import random
+import argparse
+import tempfile
+import mmap
+from array import array
+from collections import OrderedDict, deque, namedtuple
+from contextlib import closing, contextmanager
 import sqlite3
 from datetime import datetime
-import re, html, time
-
-from PySide6.QtCore import Qt, QSettings, QByteArray, QStandardPaths
-from PySide6.QtGui import QAction, QIcon, QCloseEvent, QKeySequence, QFont, QCursor
+import re, html, time, threading
+import gc, tracemalloc
+import multiprocessing
+import hashlib, unicodedata, zlib
+import io, gzip, bz2, lzma
+from itertools import islice
+from concurrent.futures import CancelledError, ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+
+try:
+    import numpy as np
+except ImportError:  # active-learning ordering is optional
+    np = None
+
+try:
+    import zstandard
+except ImportError:  # compressed text storage falls back to zlib
+    zstandard = None
+
+from PySide6.QtCore import (
+    Qt, QEvent, QObject, QPointF, QSettings, Signal, QByteArray, QStandardPaths, QTimer, QAbstractTableModel, QModelIndex
+)
+from PySide6.QtGui import (
+    QAction, QActionGroup, QIcon, QCloseEvent, QKeySequence, QFont, QFontMetrics, QCursor, QMouseEvent, QInputEvent
+)
 from PySide6.QtWidgets import (
     QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
     QPushButton, QMessageBox, QLabel,
     QFileDialog, QStyle, QFrame, QSizePolicy,
-    QToolBar, QWidgetAction, QButtonGroup, QScrollArea
+    QToolBar, QWidgetAction, QButtonGroup, QScrollArea, QInputDialog,
+    QTableView, QHeaderView, QComboBox, QLineEdit, QAbstractItemView,
+    QDialog, QDialogButtonBox, QCheckBox, QListWidget, QListWidgetItem, QProgressDialog
 )
+from shiboken6 import isValid as shiboken_is_valid
 
 # ================== App config ==================
 APP_NAME = "TweetTagger"
@@ -20,9 +51,85 @@ ORG_NAME = "YourOrg"
 
 APP_DIR = os.path.join(os.path.expanduser("~"), ".tweet_tagger")
 DB_PATH = os.path.join(APP_DIR, "annotations.sqlite3")
+LEXICON_PATH = os.path.join(APP_DIR, "lexicon.json")
 
 ICON_FALLBACK = None
 
+# --- Tweet text storage for new imports ---
+# "inline": tweets.text column; "mmap": append-only per-dataset blob file
+# next to the DB (texts/ds_<id>.blob + .off offsets), tweets.text left '';
+# "compressed": tweets.text_z, zstd (or zlib) with a per-dataset dictionary.
+TEXT_STORE_MODES = ("inline", "mmap", "compressed")
+TEXT_DICT_SIZE = 32 * 1024    # trained dictionary size (zlib caps it at 32 KiB)
+TEXT_DICT_SAMPLES = 20_000    # tweets sampled to train it
+TEXT_LRU_SIZE = 256           # decompressed texts kept in memory
+
+# --- Import ---
+IMPORT_TXN_ROWS = 50_000      # rows inserted per transaction
+IMPORT_INFLIGHT = 2           # parsed-but-unwritten shards allowed per worker (bounds memory)
+IMPORT_CHUNK_ROWS = 10_000    # rows handed to the writer at a time by streaming readers
+IMPORT_READ_BUFFER = 1 << 20  # bytes read from a (decompressed) source at a time
+
+# --- Export ---
+EXPORT_PROGRESS_ROWS = 5000   # rows written between progress reports (and cancel checks)
+
+# --- Active learning (optional, needs numpy) ---
+AL_N_FEATURES = 2 ** 16     # hashed vocabulary size
+AL_RETRAIN_EVERY = 20       # retrain after this many saved answers
+AL_MIN_TRAIN = 10           # annotated tweets needed before the first model
+AL_SCORE_BATCH = 5000       # unannotated tweets (from a random position) re-scored per retrain
+AL_TOP_K = 500              # tweets that keep a priority: the queue next_priority_idx draws from
+AL_FIRST_EPOCHS = 60        # gradient steps on the first answers
+AL_DELTA_EPOCHS = 10        # warm-started steps on the answers saved since the last retrain
+
+# --- Automatic backups (online snapshots of the DB file) ---
+BACKUP_DIR = os.path.join(APP_DIR, "backups")
+TRACE_DIR = os.path.join(APP_DIR, "traces")   # opt-in session recordings (Pomoc menu)
+TRACE_KEEP = 20                               # newest recordings kept
+NAV_HISTORY_MAX = 1000                        # Back steps remembered per dataset
+LEAK_SAMPLE_S = 60                            # memory diagnostics (Pomoc menu): sampling period
+BACKUP_EVERY_MIN = 15       # minutes between automatic snapshots
+BACKUP_KEEP = 12            # newest snapshots always kept
+BACKUP_KEEP_DAILY = 14      # plus the newest snapshot of each of this many days
+BACKUP_PAGES_PER_STEP = 256 # pages copied per step; the source is locked only during a step
+BACKUP_MAX_RESTARTS = 10    # then copy in one step (brief write stall) instead of starving
+
+# --- Archive & maintenance (exported datasets leave the hot DB) ---
+ARCHIVE_DIR = os.path.join(APP_DIR, "archive")
+ARCHIVE_AFTER_DAYS = 3      # exported this long ago -> moved to archive/ds_<id>.sqlite3
+MAINT_EVERY_DAYS = 7        # scheduled maintenance runs at startup when due
+MAINT_VACUUM_FREE = 0.25    # full VACUUM (once) when this share of pages is free
+
+# --- Overview (whole-dataset table) ---
+# sortable columns; each one but idx costs an index that every save keeps up to date
+OVERVIEW_SORT_COLS = ("idx", "annotated", "intent")
+
+# --- Rapid (keyboard) mode ---
+RAPID_OPTION_KEYS = "abcdefgh"   # letter i answers option i of the focused follow-up
+RAPID_SAVE_DELAY_MS = 1500       # pending keyboard edits are written after this much quiet
+
+# --- Annotation timing ---
+IDLE_AFTER_S = 60                # active time stops this long after the last input (adjustable in the app)
+
+# --- GUI load test (python app.py loadtest): a run fails when any of these is exceeded ---
+LOADTEST_BUDGETS = {
+    "p95_ms": 40.0,               # 95th percentile of a single action (tile, follow-up, next)
+    "max_ms": 400.0,              # slowest single action
+    "stall_rate": 0.02,           # share of actions that blocked the event loop > LOADTEST_STALL_MS
+    "statements_per_tweet": 80.0, # SQL statements on the GUI connection per annotated tweet
+    "rss_growth_mb": 40.0,        # resident memory growth after warm-up
+    "dialogs": 0,                 # message boxes the scripted session ran into
+    "mismatches": 0,              # tweets whose stored answers differ from the last ones on screen
+}
+LOADTEST_STALL_MS = 50           # about three frames
+# --- Leak soak (python app.py soak): growth allowed between the first and the last sample ---
+SOAK_LIMITS = {
+    "qobject_growth": 0,          # live QObjects (the screen is the same at every sample)
+    "wrapper_growth": 0,          # Python wrappers of QObjects
+    "python_growth_mb": 2.0,      # traced Python heap (caches fill up to their caps)
+    "rss_growth_mb": 20.0,        # resident memory; allocator noise, SQLite page cache
+}
+
 # --- Sizing knobs ---
 TILE_MIN_SIDE = 96          # minimum square size for a tile
 TILE_MAX_SIDE = 220         # maximum square size for a tile
@@ -117,6 +224,18 @@ DETAIL_QUESTIONS = {
     ),
 }
 
+# Keyword cues per topic (lower-case word prefixes), used for suggested tiles.
+# Override with a {"<label col>": ["prefix", ...]} JSON file at LEXICON_PATH.
+LEXICON = {
+    "imigracja":   ["imigra", "migran", "emigra", "uchodźc", "uchodzc", "relokac", "granic"],
+    "zaufanie":    ["zaufani", "ufam", "ufać", "nieufn", "wiarygodn", "oszu"],
+    "klimat":      ["klimat", "ociepleni", "emisj", "co2", "smog", "ekolog", "fotowolta", "węgl"],
+    "zdrowie":     ["zdrow", "chorob", "chory", "chora", "lekarz", "szpital", "samopoczu", "depresj", "nfz"],
+    "sprawczosc":  ["wybor", "głosow", "glosow", "referend", "protest", "petycj", "sejm", "rząd", "rzad"],
+    "naukowcy":    ["naukow", "nauk", "badani", "badacz", "uczon", "profesor", "uniwersyt"],
+    "szczepionki": ["szczepi", "szczepion", "antyszczep", "wakcyn", "pfizer", "moderna", "nop"],
+}
+
 # Intent question (for “INNE”)
 INTENT_QUESTION = (
     "Główna intencja wypowiedzi nadawcy to:",
@@ -147,6 +266,7 @@ QFrame#Card {{
     border: 1px solid #475569;
     border-radius: 14px;
 }}
+QFrame#Card[rapidFocus="true"] {{ border: 2px solid #a78bfa; }}
 
 QLabel#TweetText {{
     border: none;
@@ -184,6 +304,7 @@ QPushButton#TileButton {{
     padding: 0;
 }}
 QPushButton#TileButton:hover {{ border-color: #60a5fa; }}
+QPushButton#TileButton[suggested="true"] {{ border: 2px dashed #f59e0b; }}
 QPushButton#TileButton:checked {{
     background: {PRIMARY};
     border-color: #a78bfa;
@@ -265,15 +386,35 @@ QMenu::item:disabled {
 STYLE = STYLE + STYLE_MENUS
 
 # ================== DB helpers & schema ==================
+def _table_exists(con, table) -> bool:
+    return con.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name=?", (table,)).fetchone() is not None
+
 def _column_exists(con, table, column) -> bool:
     cur = con.cursor()
     cur.execute(f"PRAGMA table_info({table})")
     return any(r[1] == column for r in cur.fetchall())
 
-def ensure_db():
-    os.makedirs(APP_DIR, exist_ok=True)
-    con = sqlite3.connect(DB_PATH)
+def connect_db(db_path, readonly=False, **kwargs):
+    """sqlite3.connect + the SQL functions the schema relies on (tweet_text)."""
+    if readonly:
+        uri = "file:" + os.path.abspath(db_path).replace("?", "%3f").replace("#", "%23") + "?mode=ro"
+        con = sqlite3.connect(uri, uri=True, **kwargs)
+    else:
+        con = sqlite3.connect(db_path, **kwargs)
+    texts_dir = _texts_dir(db_path)
+    con.create_function("tweet_text", 2, lambda ds, idx: _store_text(texts_dir, ds, idx),
+                        deterministic=True)
+    con.create_function("tweet_unz", 3, lambda ds, tid, blob: _decompress_text(db_path, ds, tid, blob),
+                        deterministic=True)
+    return con
+
+def ensure_db(db_path=None):
+    db_path = db_path or DB_PATH
+    os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+    con = connect_db(db_path)
     cur = con.cursor()
+    # new files only: freed pages can later be returned with incremental_vacuum
+    cur.execute("PRAGMA auto_vacuum=INCREMENTAL")
 
     cur.execute("""
         CREATE TABLE IF NOT EXISTS datasets (
@@ -305,6 +446,7 @@ def ensure_db():
             intent INTEGER DEFAULT -1,
             stance INTEGER DEFAULT 0,
             time_spent_ms INTEGER DEFAULT 0,
+            active_ms INTEGER DEFAULT 0,
             first_seen_at TEXT,
             last_seen_at  TEXT,
             FOREIGN KEY(dataset_id) REFERENCES datasets(id)
@@ -333,6 +475,10 @@ def ensure_db():
     if not _column_exists(con, "tweets", "time_spent_ms"):
         cur.execute("ALTER TABLE tweets ADD COLUMN time_spent_ms INTEGER DEFAULT 0")
         con.commit()
+    # idle-aware timing: time_spent_ms stays wall-clock, active_ms excludes idle/unfocused time
+    if not _column_exists(con, "tweets", "active_ms"):
+        cur.execute("ALTER TABLE tweets ADD COLUMN active_ms INTEGER DEFAULT 0")
+        con.commit()
     # NEW migrations
     if not _column_exists(con, "tweets", "first_seen_at"):
         cur.execute("ALTER TABLE tweets ADD COLUMN first_seen_at TEXT")
@@ -340,41 +486,849 @@ def ensure_db():
     if not _column_exists(con, "tweets", "last_seen_at"):
         cur.execute("ALTER TABLE tweets ADD COLUMN last_seen_at TEXT")
         con.commit()
+    # duplicate propagation: normalized-text hash + source of propagated answers
+    if not _column_exists(con, "tweets", "text_hash"):
+        cur.execute("ALTER TABLE tweets ADD COLUMN text_hash TEXT")
+        con.commit()
+    if not _column_exists(con, "tweets", "propagated_from"):
+        cur.execute("ALTER TABLE tweets ADD COLUMN propagated_from INTEGER")
+        con.commit()
+    # annotation memory: answers reused from an earlier dataset
+    if not _column_exists(con, "tweets", "reused_from"):
+        cur.execute("ALTER TABLE tweets ADD COLUMN reused_from INTEGER")
+        con.commit()
+    # keyword pre-labeling: bitmask over LABELS, kept apart from confirmed labels
+    if not _column_exists(con, "tweets", "suggested"):
+        cur.execute("ALTER TABLE tweets ADD COLUMN suggested INTEGER DEFAULT 0")
+        con.commit()
+    # active learning: model uncertainty of not-yet-annotated tweets
+    if not _column_exists(con, "tweets", "priority"):
+        cur.execute("ALTER TABLE tweets ADD COLUMN priority REAL")
+        con.commit()
+    cur.execute("SELECT id, text FROM tweets WHERE text_hash IS NULL")
+    missing = cur.fetchall()
+    if missing:
+        cur.executemany("UPDATE tweets SET text_hash=? WHERE id=?",
+                        [(_text_hash(t), i) for i, t in missing])
+        con.commit()
+
+    if not _column_exists(con, "datasets", "text_store"):
+        cur.execute("ALTER TABLE datasets ADD COLUMN text_store TEXT DEFAULT 'inline'")
+        con.commit()
+    if not _column_exists(con, "tweets", "text_z"):
+        cur.execute("ALTER TABLE tweets ADD COLUMN text_z BLOB")
+        con.commit()
+    # change tracking: rows stamped with a global revision by every write helper
+    if not _column_exists(con, "tweets", "revision"):
+        cur.execute("ALTER TABLE tweets ADD COLUMN revision INTEGER DEFAULT 0")
+        con.commit()
+    cur.execute("CREATE TABLE IF NOT EXISTS change_seq (id INTEGER PRIMARY KEY CHECK (id = 0), value INTEGER NOT NULL)")
+    cur.execute("INSERT OR IGNORE INTO change_seq (id, value) VALUES (0, 0)")
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS export_checkpoints (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            dataset_id INTEGER NOT NULL,
+            revision INTEGER NOT NULL,
+            kind TEXT NOT NULL,
+            rows INTEGER NOT NULL,
+            path TEXT,
+            exported_at TEXT NOT NULL
+        )
+    """)
+    # archiving: when a dataset was exported, and where its tweets went
+    if not _column_exists(con, "datasets", "exported_at"):
+        cur.execute("ALTER TABLE datasets ADD COLUMN exported_at TEXT")
+        con.commit()
+    # exported before the column existed: their archiving clock starts now
+    cur.execute("UPDATE datasets SET exported_at=? WHERE exported=1 AND exported_at IS NULL",
+                (datetime.now().strftime("%Y-%m-%d %H:%M:%S"),))
+    con.commit()
+    if not _column_exists(con, "datasets", "archive_path"):
+        cur.execute("ALTER TABLE datasets ADD COLUMN archive_path TEXT")
+        con.commit()
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS text_dicts (
+            dataset_id INTEGER PRIMARY KEY,
+            codec TEXT NOT NULL,
+            dict BLOB NOT NULL
+        )
+    """)
+    # annotation memory of archived datasets: text hash + answers, keyed by the archived tweet's id
+    new_memory = not _table_exists(con, "annotation_memory")
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS annotation_memory (
+            id INTEGER PRIMARY KEY,
+            dataset_id INTEGER NOT NULL,
+            text_hash TEXT NOT NULL
+        )
+    """)
+    for col in SCHEMA.answer_cols:
+        if not _column_exists(con, "annotation_memory", col):
+            cur.execute(f"ALTER TABLE annotation_memory ADD COLUMN {col} INTEGER")
+    cur.execute("CREATE INDEX IF NOT EXISTS ix_memory_hash ON annotation_memory(text_hash)")
+    cur.execute("CREATE INDEX IF NOT EXISTS ix_memory_ds ON annotation_memory(dataset_id)")
+    con.commit()
+    if new_memory:
+        # archived before the table existed: read their answers back from the archive files
+        cur.execute("SELECT id, archive_path FROM datasets WHERE archive_path IS NOT NULL")
+        for ds_id, path in cur.fetchall():
+            if os.path.exists(path):
+                _remember_archived(con, ds_id, path)
+    # cached per-dataset progress, kept exact by triggers (no recounts on refresh/switch)
+    new_counters = [c for c in ("done", "n_propagated", "n_reused") if not _column_exists(con, "datasets", c)]
+    for c in new_counters:
+        cur.execute(f"ALTER TABLE datasets ADD COLUMN {c} INTEGER DEFAULT 0")
+    if new_counters:
+        cur.execute("""
+            UPDATE datasets SET
+                done         = (SELECT COUNT(*) FROM tweets t WHERE t.dataset_id=datasets.id AND t.annotated=1),
+                n_propagated = (SELECT COUNT(*) FROM tweets t WHERE t.dataset_id=datasets.id AND t.propagated_from IS NOT NULL),
+                n_reused     = (SELECT COUNT(*) FROM tweets t WHERE t.dataset_id=datasets.id AND t.reused_from IS NOT NULL)
+        """)
+        con.commit()
+    cur.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_tweets_progress_ins
+        AFTER INSERT ON tweets
+        WHEN NEW.annotated IS 1 OR NEW.propagated_from IS NOT NULL OR NEW.reused_from IS NOT NULL
+        BEGIN
+            UPDATE datasets SET
+                done         = done + (NEW.annotated IS 1),
+                n_propagated = n_propagated + (NEW.propagated_from IS NOT NULL),
+                n_reused     = n_reused + (NEW.reused_from IS NOT NULL)
+            WHERE id = NEW.dataset_id;
+        END
+    """)
+    cur.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_tweets_progress_upd
+        AFTER UPDATE OF annotated, propagated_from, reused_from ON tweets
+        WHEN (OLD.annotated IS 1) <> (NEW.annotated IS 1)
+          OR (OLD.propagated_from IS NULL) <> (NEW.propagated_from IS NULL)
+          OR (OLD.reused_from IS NULL) <> (NEW.reused_from IS NULL)
+        BEGIN
+            UPDATE datasets SET
+                done         = done + (NEW.annotated IS 1) - (OLD.annotated IS 1),
+                n_propagated = n_propagated + (NEW.propagated_from IS NOT NULL) - (OLD.propagated_from IS NOT NULL),
+                n_reused     = n_reused + (NEW.reused_from IS NOT NULL) - (OLD.reused_from IS NOT NULL)
+            WHERE id = NEW.dataset_id;
+        END
+    """)
+    cur.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_tweets_progress_del
+        AFTER DELETE ON tweets
+        WHEN OLD.annotated IS 1 OR OLD.propagated_from IS NOT NULL OR OLD.reused_from IS NOT NULL
+        BEGIN
+            UPDATE datasets SET
+                done         = done - (OLD.annotated IS 1),
+                n_propagated = n_propagated - (OLD.propagated_from IS NOT NULL),
+                n_reused     = n_reused - (OLD.reused_from IS NOT NULL)
+            WHERE id = OLD.dataset_id;
+        END
+    """)
+
+    cur.execute("CREATE INDEX IF NOT EXISTS ix_tweets_ds_idx ON tweets(dataset_id, idx)")
+    cur.execute("CREATE INDEX IF NOT EXISTS ix_tweets_ds_hash ON tweets(dataset_id, text_hash)")
+    # annotation memory: every annotated text, across all datasets
+    cur.execute("CREATE INDEX IF NOT EXISTS ix_tweets_memory ON tweets(text_hash) WHERE annotated=1")
+    # navigation: gaps (unannotated) and tweets with a missing follow-up answer
+    cur.execute("CREATE INDEX IF NOT EXISTS ix_tweets_unannotated ON tweets(dataset_id, idx) WHERE annotated=0")
+    # (named after its condition, so a change to LABELS replaces the stale index once)
+    cond = SCHEMA.missing_followup_sql
+    ix_name = "ix_tweets_missing_followup_" + hashlib.blake2b(cond.encode(), digest_size=4).hexdigest()
+    cur.execute("SELECT name FROM sqlite_master WHERE type='index' AND name LIKE 'ix_tweets_missing_followup_%'")
+    for (stale,) in cur.fetchall():
+        if stale != ix_name:
+            cur.execute(f"DROP INDEX {stale}")
+    cur.execute(f"CREATE INDEX IF NOT EXISTS {ix_name} ON tweets(dataset_id, idx) WHERE {cond}")
+    cur.execute("CREATE INDEX IF NOT EXISTS ix_tweets_priority ON tweets(dataset_id, priority DESC) WHERE annotated=0")
+    # delta export: rows changed since a checkpoint, without scanning the dataset
+    cur.execute("CREATE INDEX IF NOT EXISTS ix_tweets_revision ON tweets(dataset_id, revision)")
+    # overview sort indexes (built on first use) exist only for OVERVIEW_SORT_COLS
+    cur.execute("SELECT name FROM sqlite_master WHERE type='index' AND name LIKE 'ix_tweets_sort_%'")
+    for (name,) in cur.fetchall():
+        if name[len("ix_tweets_sort_"):] not in OVERVIEW_SORT_COLS:
+            cur.execute(f"DROP INDEX {name}")
+    con.commit()
+    # WAL (kept in the file): exports and reports read a snapshot (read_snapshot)
+    # and neither wait for the annotator's writes nor hold them up
+    cur.execute("PRAGMA journal_mode=WAL")
 
     return con
 
-def create_dataset_from_csv(con, csv_path):
-    rows = []
-    with open(csv_path, "r", encoding="utf-8", newline="") as f:
-        reader = csv.DictReader(f)
-        if "tweets" not in reader.fieldnames:
-            raise ValueError("CSV musi mieć kolumnę 'tweets'.")
-        for r in reader:
-            txt = (r.get("tweets") or "").strip()
-            if txt:
-                rows.append(txt)
-    if not rows:
-        raise ValueError("Brak tweetów do zaimportowania.")
+def _normalize_text(text: str) -> str:
+    """Unicode NFC + collapsed whitespace; tweets equal after this are duplicates."""
+    return " ".join(unicodedata.normalize("NFC", text).split())
 
-    cur = con.cursor()
-    cur.execute("""
-        INSERT INTO datasets (name, source_path, created_at, cursor, total, exported)
-        VALUES (?, ?, ?, 0, ?, 0)
-    """, (
-        os.path.basename(csv_path),
-        os.path.abspath(csv_path),
-        datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-        len(rows),
-    ))
-    ds_id = cur.lastrowid
-
-    cur.executemany("""
-        INSERT INTO tweets (dataset_id, idx, text)
-        VALUES (?, ?, ?)
-    """, [(ds_id, i, t) for i, t in enumerate(rows)])
+def _text_hash(text: str) -> str:
+    return hashlib.blake2b(_normalize_text(text).encode("utf-8"), digest_size=16).hexdigest()
+
+# Tweet text as SQL: the inline column, a decompressed text_z, or (mmap
+# datasets) a slice of the blob store. CASE is lazy, so inline rows never
+# call into Python.
+TEXT_SQL = ("CASE WHEN text <> '' THEN text"
+            " WHEN text_z IS NOT NULL THEN tweet_unz(dataset_id, id, text_z)"
+            " ELSE tweet_text(dataset_id, idx) END")
 
+# Revision stamp for writes: every helper that changes answers first calls
+# _bump_revision() and sets revision=REVISION_SQL in the same transaction, so
+# each saved change gets a revision above every export checkpoint taken
+# before it. View-only writes (seen timestamps, time spent) leave it alone:
+# a tweet that was only looked at is not a change for delta export.
+REVISION_SQL = "(SELECT value FROM change_seq)"
+
+def _bump_revision(cur):
+    cur.execute("UPDATE change_seq SET value = value + 1")
+
+def current_revision(con) -> int:
+    return con.execute("SELECT value FROM change_seq").fetchone()[0]
+
+class RowSchema:
+    """
+    Everything derived from LABELS / DETAIL_QUESTIONS / INTENT_QUESTION,
+    computed once: column lists, a namedtuple row type with its field
+    positions, and the SQL text of every fixed statement (identical strings
+    on every call, so sqlite3's statement cache is always hit).
+    """
+    def __init__(self, labels, detail_questions, intent_question):
+        self.label_cols = tuple(col for _, col in labels)
+        self.label_names = {col: name for name, col in labels}
+        self.detail_topics = tuple(col for _, col in labels if col != "inne")
+        self.detail_cols = tuple(f"{col}_detail" for col in self.detail_topics)
+        self.topic_options = {col: detail_questions[col][1] for col in self.detail_topics if col in detail_questions}
+        self.intent_options = intent_question[1]
+        # answers copied verbatim between twins (duplicates, memory, bulk edits)
+        self.answer_cols = self.label_cols + self.detail_cols + ("intent", "annotated")
+
+        # ---- one tweet, as returned by get_tweet_row() / iter_dataset_rows() ----
+        self.row_fields = ("id", "text", "annotated", *self.label_cols, *self.detail_cols,
+                           "intent", "time_spent_ms", "active_ms", "first_seen_at", "last_seen_at", "suggested")
+        self.Row = namedtuple("TweetRow", self.row_fields)
+        self.pos = {f: i for i, f in enumerate(self.row_fields)}
+        row_select = ", ".join([
+            "id", TEXT_SQL, "annotated", *self.label_cols, *self.detail_cols,
+            "COALESCE(intent, -1)", "COALESCE(time_spent_ms, 0)", "COALESCE(active_ms, 0)",
+            "first_seen_at", "last_seen_at", "COALESCE(suggested, 0)",
+        ])
+        self.sql_get_row = f"SELECT {row_select} FROM tweets WHERE dataset_id=? AND idx=?"
+        self.sql_dataset_rows = f"SELECT {row_select} FROM tweets WHERE dataset_id=? ORDER BY idx ASC"
+        # (idx, revision) + row, for rows changed in a revision range
+        self.sql_dataset_delta = (f"SELECT idx, revision, {row_select} FROM tweets "
+                                  "WHERE dataset_id=? AND revision > ? AND revision <= ? ORDER BY idx ASC")
+
+        # ---- overview pages: sort key, idx, preview, annotated, labels, details, intent ----
+        self.overview_fields = ("sort_key", "idx", "preview", "annotated",
+                                *self.label_cols, *self.detail_cols, "intent")
+        self.OverviewRow = namedtuple("OverviewRow", self.overview_fields)
+        self.overview_select = ", ".join([
+            "idx", f"substr({TEXT_SQL}, 1, 200)", "annotated", *self.label_cols, *self.detail_cols, "intent",
+        ])
+
+        # ---- writes ----
+        label_sets = ", ".join(f"{c}=?" for c in self.label_cols)
+        rev = f"revision={REVISION_SQL}"
+        self.sql_save_labels = (f"UPDATE tweets SET {label_sets}, annotated=1, "
+                                f"propagated_from=NULL, reused_from=NULL, {rev} WHERE id=?")
+        self.sql_save_labels_keep = (f"UPDATE tweets SET {label_sets}, "
+                                     f"propagated_from=NULL, reused_from=NULL, {rev} WHERE id=?")
+        self.sql_save_detail = {
+            t: (f"UPDATE tweets SET {t}_detail=?, annotated=?, propagated_from=NULL, reused_from=NULL, {rev} "
+                "WHERE id=?")
+            for t in self.detail_topics
+        }
+        self.sql_clear_detail = {t: f"UPDATE tweets SET {t}_detail='', {rev} WHERE id=?" for t in self.detail_topics}
+        answers = ", ".join(self.answer_cols)
+        self.sql_propagate = f"""
+            UPDATE tweets
+            SET ({answers}) = (SELECT {answers} FROM tweets WHERE id=:src),
+                propagated_from = :src, {rev}
+            WHERE dataset_id = (SELECT dataset_id FROM tweets WHERE id=:src)
+              AND text_hash  = (SELECT text_hash  FROM tweets WHERE id=:src)
+              AND id <> :src
+              AND (annotated = 0 OR propagated_from = :src OR reused_from IS NOT NULL)
+        """
+        self.sql_undo_propagation = "UPDATE tweets SET " + ", ".join(
+            [f"{c}=0" for c in self.label_cols] + [f"{c}=-1" for c in self.detail_cols]
+            + ["intent=-1", "annotated=0", "propagated_from=NULL", rev]
+        ) + " WHERE propagated_from=?"
+        self.answers_from_s = ", ".join(f"{c}=s.{c}" for c in self.answer_cols)
+
+        # ---- validation as SQL (see TaggerWindow._validate_required_followups) ----
+        conds = [f"({col}=1 AND ({col}_detail IS NULL OR {col}_detail IN ('', -1)))"
+                 for col in self.detail_topics if col in detail_questions]
+        conds.append("(inne=1 AND (intent IS NULL OR intent < 0))")
+        self.missing_followup_sql = "(" + " OR ".join(conds) + ")"
+
+        # ---- export ----
+        self.export_headers = ["tweets"] \
+            + [name for name, _ in labels] \
+            + [f"{name}_doprecyz." for name, col in labels if col != "inne"] \
+            + ["Intencja", "Czas_s", "First_seen_at", "Last_seen_at",
+               "Czas_aktywny_s"]  # newer columns go last: readers index the old ones by position
+
+    # ---- row decoding ----
+    def labels_of(self, row) -> dict[str, bool]:
+        return {col: bool(getattr(row, col)) for col in self.label_cols}
+
+    def details_of(self, row) -> dict[str, set[int]]:
+        return {t: _parse_detail_value(getattr(row, f"{t}_detail")) for t in self.detail_topics}
+
+    def detail_texts(self, topic: str, raw) -> list[str]:
+        opts = self.topic_options.get(topic, [])
+        return [opts[i] for i in sorted(_parse_detail_value(raw)) if 0 <= i < len(opts)]
+
+SCHEMA = RowSchema(LABELS, DETAIL_QUESTIONS, INTENT_QUESTION)
+
+def _texts_dir(db_path) -> str:
+    return os.path.join(os.path.dirname(os.path.abspath(db_path)), "texts")
+
+# The text caches below (open TextStores, codecs, decompressed texts) are
+# shared by every connection, and the SQL functions run on whichever thread
+# queries: the GUI, the DbWorker and the reports worker at the same time.
+_text_lock = threading.RLock()
+
+class TextStore:
+    """
+    Append-only UTF-8 blob with an int64 offsets file, both memory-mapped:
+    text i is blob[off[i]:off[i+1]], read as a memoryview slice and decoded
+    without an intermediate bytes copy. One open instance per file.
+    """
+    _open: dict[str, "TextStore"] = {}
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as f:
+            self._blob_mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        with open(path + ".off", "rb") as f:
+            self._off_mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._blob = memoryview(self._blob_mm)
+        self._off = memoryview(self._off_mm).cast("q")
+
+    @staticmethod
+    def path_for(texts_dir: str, ds_id: int) -> str:
+        return os.path.join(texts_dir, f"ds_{ds_id}.blob")
+
+    @classmethod
+    def for_dataset(cls, texts_dir: str, ds_id: int) -> "TextStore":
+        path = cls.path_for(texts_dir, ds_id)
+        with _text_lock:
+            store = cls._open.get(path)
+            if store is None:
+                store = cls._open[path] = cls(path)
+            return store
+
+    @classmethod
+    def write(cls, texts_dir: str, ds_id: int, texts) -> str:
+        """Append `texts` (in idx order) to a new store for `ds_id`; returns its path."""
+        w = TextStoreAppender(texts_dir, ds_id)
+        w.extend(texts)
+        return w.close()
+
+    def __len__(self):
+        return len(self._off) - 1
+
+    def get(self, i: int) -> str:
+        return str(self._blob[self._off[i]:self._off[i + 1]], "utf-8")
+
+    def close(self):
+        with _text_lock:
+            self._off.release(); self._blob.release()
+            self._off_mm.close(); self._blob_mm.close()
+            TextStore._open.pop(self.path, None)
+
+def _store_text(texts_dir: str, ds_id: int, idx: int) -> str:
+    """tweet_text(): read under the lock, so a concurrent close() cannot release the map mid-read."""
+    with _text_lock:
+        return TextStore.for_dataset(texts_dir, ds_id).get(idx)
+
+class TextStoreAppender:
+    """Streams texts (idx order) into a new store for `ds_id`; close() writes the offsets file."""
+    def __init__(self, texts_dir: str, ds_id: int):
+        os.makedirs(texts_dir, exist_ok=True)
+        self.path = TextStore.path_for(texts_dir, ds_id)
+        self._blob = open(self.path, "wb")
+        self._offsets = array("q", [0])
+
+    def extend(self, texts):
+        blob, off = self._blob, self._offsets
+        for t in texts:
+            off.append(off[-1] + blob.write(t.encode("utf-8")))
+
+    def close(self) -> str:
+        if not self._blob.closed:
+            self._blob.close()
+            with open(self.path + ".off", "wb") as f:
+                self._offsets.tofile(f)
+        return self.path
+
+class TextCodec:
+    """
+    Per-dataset text compression: zstd with a dictionary trained on the
+    dataset's own tweets, or — without the zstandard package — zlib with a
+    preset dictionary of the dataset's most frequent words.
+    """
+    def __init__(self, codec: str, zdict: bytes):
+        if codec == "zstd" and zstandard is None:
+            raise RuntimeError("Ten zbiór wymaga pakietu 'zstandard' (pip install zstandard).")
+        self.codec = codec
+        self.zdict = zdict
+        if codec == "zstd":
+            d = zstandard.ZstdCompressionDict(zdict) if zdict else None
+            self._c = zstandard.ZstdCompressor(level=9, dict_data=d, write_content_size=True, write_checksum=False)
+            self._d = zstandard.ZstdDecompressor(dict_data=d)
+
+    @classmethod
+    def train(cls, texts: list[str], seed: int = 0) -> "TextCodec":
+        rnd = random.Random(seed)
+        sample = texts if len(texts) <= TEXT_DICT_SAMPLES else rnd.sample(texts, TEXT_DICT_SAMPLES)
+        if zstandard is not None:
+            try:
+                d = zstandard.train_dictionary(TEXT_DICT_SIZE, [t.encode("utf-8") for t in sample])
+                return cls("zstd", d.as_bytes())
+            except zstandard.ZstdError:
+                return cls("zstd", b"")  # too few samples to train on
+        freq: dict[str, int] = {}
+        for t in sample:
+            for w in t.split():
+                freq[w] = freq.get(w, 0) + 1
+        zdict = b""
+        # zlib finds matches best near the end of the dictionary: most frequent last
+        for w in sorted(freq, key=freq.get, reverse=True):
+            chunk = (w + " ").encode("utf-8")
+            if len(zdict) + len(chunk) > TEXT_DICT_SIZE:
+                break
+            zdict = chunk + zdict
+        return cls("zlib", zdict)
+
+    def compress(self, text: str) -> bytes:
+        raw = text.encode("utf-8")
+        if self.codec == "zstd":
+            return self._c.compress(raw)
+        c = zlib.compressobj(9, zlib.DEFLATED, -15, zdict=self.zdict) if self.zdict \
+            else zlib.compressobj(9, zlib.DEFLATED, -15)
+        return c.compress(raw) + c.flush()
+
+    def decompress(self, blob: bytes) -> str:
+        if self.codec == "zstd":
+            return self._d.decompress(blob).decode("utf-8")
+        d = zlib.decompressobj(-15, zdict=self.zdict) if self.zdict else zlib.decompressobj(-15)
+        return (d.decompress(blob) + d.flush()).decode("utf-8")
+
+    def save(self, con, ds_id):
+        con.execute("INSERT OR REPLACE INTO text_dicts (dataset_id, codec, dict) VALUES (?, ?, ?)",
+                    (ds_id, self.codec, self.zdict))
+
+_codecs: dict[tuple[str, int], TextCodec] = {}
+_text_lru: "OrderedDict[tuple[str, int], str]" = OrderedDict()
+
+def _decompress_text(db_path: str, ds_id: int, tweet_id: int, blob: bytes) -> str:
+    """tweet_unz(): decompress on read, through a small LRU of recent texts."""
+    key = (db_path, tweet_id)
+    # one lock for the caches and the codec: a zstd decompressor is not safe to share between threads
+    with _text_lock:
+        hit = _text_lru.get(key)
+        if hit is not None:
+            _text_lru.move_to_end(key)
+            return hit
+        codec = _codecs.get((db_path, ds_id))
+        if codec is None:
+            # separate connection: a SQL function must not query its own connection
+            with closing(sqlite3.connect(db_path)) as c:
+                row = c.execute("SELECT codec, dict FROM text_dicts WHERE dataset_id=?", (ds_id,)).fetchone()
+            codec = _codecs[(db_path, ds_id)] = TextCodec(row[0], row[1])
+        text = codec.decompress(blob)
+        _text_lru[key] = text
+        if len(_text_lru) > TEXT_LRU_SIZE:
+            _text_lru.popitem(last=False)
+        return text
+
+def get_text_store_mode() -> str:
+    settings = QSettings(ORG_NAME, APP_NAME)
+    mode = settings.value("text_store", "inline")
+    return mode if mode in TEXT_STORE_MODES else "inline"
+
+def set_text_store_mode(mode: str):
+    settings = QSettings(ORG_NAME, APP_NAME)
+    settings.setValue("text_store", mode)
+
+def compress_dataset(con, ds_id, progress=None) -> dict:
+    """
+    Convert an existing "inline" dataset to the "compressed" store: train a
+    TextCodec on its tweets, then move text to text_z in IMPORT_TXN_ROWS
+    transactions. A half-converted dataset reads fine (TEXT_SQL takes either
+    column) and a rerun picks up where it stopped, with the saved codec.
+    `progress(rows done, rows)` after each transaction. Answers and their
+    revisions are untouched. The freed pages go back to the file system with
+    the next maintenance.
+    """
+    row = con.execute("SELECT text_store, archive_path FROM datasets WHERE id=?", (ds_id,)).fetchone()
+    if row is None:
+        raise ValueError(f"Brak zbioru #{ds_id}.")
+    text_store, archived = row
+    if archived:
+        raise ValueError("Zbiór jest zarchiwizowany; najpierw go przywróć.")
+    if text_store == "mmap":
+        raise ValueError("Teksty tego zbioru są już poza bazą (mmap).")
+    db_path = _db_path(con)
+    saved = con.execute("SELECT codec, dict FROM text_dicts WHERE dataset_id=?", (ds_id,)).fetchone()
+    if saved is not None:
+        codec = TextCodec(*saved)   # resuming: earlier rows were compressed with it
+    else:
+        sample = [t for (t,) in con.execute("SELECT text FROM tweets WHERE dataset_id=? AND text<>'' "
+                                            "ORDER BY random() LIMIT ?", (ds_id, TEXT_DICT_SAMPLES))]
+        codec = TextCodec.train(sample)
+        codec.save(con, ds_id)
+        with _text_lock:
+            _codecs.pop((db_path, ds_id), None)
+    con.execute("UPDATE datasets SET text_store='compressed' WHERE id=?", (ds_id,))
     con.commit()
-    return ds_id, len(rows)
+
+    todo = con.execute("SELECT COUNT(*) FROM tweets WHERE dataset_id=? AND text<>''", (ds_id,)).fetchone()[0]
+    cur = con.cursor()
+    done, raw_bytes, z_bytes, last_id = 0, 0, 0, 0
+    while True:
+        cur.execute("SELECT id, text FROM tweets WHERE dataset_id=? AND text<>'' AND id>? ORDER BY id LIMIT ?",
+                    (ds_id, last_id, IMPORT_TXN_ROWS))
+        rows = cur.fetchall()
+        if not rows:
+            break
+        blobs = [(codec.compress(t), i) for i, t in rows]
+        raw_bytes += sum(len(t.encode("utf-8")) for _, t in rows)
+        z_bytes += sum(len(z) for z, _ in blobs)
+        cur.executemany("UPDATE tweets SET text='', text_z=? WHERE id=?", blobs)
+        con.commit()
+        done += len(rows)
+        last_id = rows[-1][0]
+        if progress:
+            progress(done, todo)
+    return {"dataset": ds_id, "codec": codec.codec, "tweets": done,
+            "text_bytes": raw_bytes, "compressed_bytes": z_bytes}
+
+class DatasetWriter:
+    """
+    The chunked insert path shared by every import: creates the dataset row,
+    add() appends batches of (text, text_hash) in idx order and commits every
+    IMPORT_TXN_ROWS rows, each with its keyword pre-labels (suggested),
+    finish() sets the total and applies annotation memory. Handles all three text store modes; in
+    "compressed" mode rows are held back until TEXT_DICT_SAMPLES texts (or
+    all of them) are there to train the dictionary on. abort() removes
+    whatever was written.
+    """
+    def __init__(self, con, name, source_path, text_store=None):
+        self.con = con
+        self.mode = text_store or get_text_store_mode()
+        cur = con.cursor()
+        cur.execute("""
+            INSERT INTO datasets (name, source_path, created_at, cursor, total, exported, text_store)
+            VALUES (?, ?, ?, 0, 0, 0, ?)
+        """, (name, source_path, datetime.now().strftime("%Y-%m-%d %H:%M:%S"), self.mode))
+        self.ds_id = cur.lastrowid
+        self.n = 0
+        self._uncommitted = 0
+        self._held: list[tuple[str, str]] = []
+        self._codec = None
+        self._matcher = KeywordMatcher(load_lexicon())
+        self._store = TextStoreAppender(_texts_dir(_db_path(con)), self.ds_id) if self.mode == "mmap" else None
+
+    @property
+    def count(self) -> int:
+        """Rows added so far (inserted or held for dictionary training)."""
+        return self.n + len(self._held)
+
+    def add(self, rows: list[tuple[str, str]]):
+        if self.mode == "compressed" and self._codec is None:
+            self._held.extend(rows)
+            if len(self._held) < TEXT_DICT_SAMPLES:
+                return
+            rows, self._held = self._held, []
+            self._train(rows)
+        self._insert(rows)
+
+    def _train(self, rows):
+        self._codec = TextCodec.train([t for t, _ in rows])
+        self._codec.save(self.con, self.ds_id)
+
+    def _insert(self, rows):
+        if self.mode == "mmap":
+            self._store.extend(t for t, _ in rows)
+            stored = (("", None) for _ in rows)
+        elif self.mode == "compressed":
+            stored = (("", self._codec.compress(t)) for t, _ in rows)
+        else:
+            stored = ((t, None) for t, _ in rows)
+        self.con.executemany("""
+            INSERT INTO tweets (dataset_id, idx, text, text_z, text_hash, suggested)
+            VALUES (?, ?, ?, ?, ?, ?)
+        """, [(self.ds_id, self.n + i, txt, z, h, _suggested_mask(self._matcher.labels(t)))
+              for i, ((t, h), (txt, z)) in enumerate(zip(rows, stored))])
+        self.n += len(rows)
+        self._uncommitted += len(rows)
+        if self._uncommitted >= IMPORT_TXN_ROWS:
+            self.con.commit()
+            self._uncommitted = 0
+
+    def finish(self) -> tuple[int, int]:
+        if self.mode == "compressed" and self._codec is None:
+            rows, self._held = self._held, []
+            self._train(rows)
+            self._insert(rows)
+        if self._store is not None:
+            self._store.close()
+        cur = self.con.cursor()
+        cur.execute("UPDATE datasets SET total=? WHERE id=?", (self.n, self.ds_id))
+        apply_annotation_memory(cur, self.ds_id)
+        self.con.commit()
+        return self.ds_id, self.n
+
+    def abort(self):
+        self.con.rollback()
+        if self._store is not None:
+            self._store.close()
+            for f in (self._store.path, self._store.path + ".off"):
+                if os.path.exists(f):
+                    os.remove(f)
+        cur = self.con.cursor()
+        cur.execute("DELETE FROM tweets WHERE dataset_id=?", (self.ds_id,))
+        cur.execute("DELETE FROM text_dicts WHERE dataset_id=?", (self.ds_id,))
+        cur.execute("DELETE FROM datasets WHERE id=?", (self.ds_id,))
+        self.con.commit()
+
+# ---- Import sources: (decompressed) file or stdin -> reader -> DatasetWriter ----
+_DECOMPRESSORS = {".gz": gzip.open, ".bz2": bz2.open, ".xz": lzma.open}
+
+def read_csv_texts(fh, field="tweets"):
+    reader = csv.DictReader(fh)
+    if not reader.fieldnames or field not in reader.fieldnames:
+        raise ValueError(f"CSV musi mieć kolumnę '{field}'.")
+    for r in reader:
+        txt = (r.get(field) or "").strip()
+        if txt:
+            yield txt
+
+def read_jsonl_texts(fh, field="text"):
+    """One JSON object per line; `field` may be a dotted path ("tweet.full_text")."""
+    keys = field.split(".")
+    for n, line in enumerate(fh, 1):
+        if not line.strip():
+            continue
+        try:
+            obj = json.loads(line)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"JSONL, wiersz {n}: {e.msg}") from None
+        for k in keys:
+            obj = obj.get(k) if isinstance(obj, dict) else None
+        if isinstance(obj, str) and obj.strip():
+            yield obj.strip()
+
+# format -> (reader(text stream, field) yielding stripped texts, default field);
+# a new format needs an entry here and its file suffixes in READER_SUFFIXES
+READERS = {
+    "csv": (read_csv_texts, "tweets"),
+    "jsonl": (read_jsonl_texts, "text"),
+}
+READER_SUFFIXES = {".csv": "csv", ".jsonl": "jsonl", ".ndjson": "jsonl"}
+
+def detect_format(source):
+    """Reader format from the file name, ignoring a compression suffix (None if unknown)."""
+    base, ext = os.path.splitext(source.lower())
+    if ext in _DECOMPRESSORS:
+        base, ext = os.path.splitext(base)
+    return READER_SUFFIXES.get(ext)
+
+def open_source(source):
+    """
+    Text stream over `source` ('-' = stdin), decompressing .gz/.bz2/.xz on
+    the fly and reading IMPORT_READ_BUFFER bytes at a time, so a large or
+    compressed file is never unpacked to disk nor held in memory.
+    """
+    if source == "-":
+        raw = sys.stdin.buffer
+    else:
+        opener = _DECOMPRESSORS.get(os.path.splitext(source.lower())[1])
+        if opener:
+            raw = io.BufferedReader(opener(source, "rb"), IMPORT_READ_BUFFER)
+        else:
+            raw = open(source, "rb", buffering=IMPORT_READ_BUFFER)
+    return io.TextIOWrapper(raw, encoding="utf-8-sig", newline="")
+
+def import_source(con, source, *, fmt=None, field=None, text_store=None, name=None, progress=None):
+    """
+    One dataset from a file or stdin through the pluggable readers, in
+    IMPORT_CHUNK_ROWS chunks into DatasetWriter. The first chunk is read
+    before the dataset is created, so a wrong header or empty source leaves
+    nothing behind. `progress(rows)` may raise ImportCancelled.
+    """
+    fmt = fmt or detect_format(source) or ("csv" if source == "-" else None)
+    if fmt not in READERS:
+        raise ValueError(f"Nieobsługiwany format pliku: {os.path.basename(source)}")
+    reader, default_field = READERS[fmt]
+    with open_source(source) as fh:
+        texts = reader(fh, field or default_field)
+        chunk = list(islice(texts, IMPORT_CHUNK_ROWS))
+        if not chunk:
+            raise ValueError("Brak tweetów do zaimportowania.")
+        writer = DatasetWriter(con, name or ("stdin" if source == "-" else os.path.basename(source)),
+                               None if source == "-" else os.path.abspath(source), text_store)
+        try:
+            while chunk:
+                writer.add([(t, _text_hash(t)) for t in chunk])
+                if progress:
+                    progress(writer.count)
+                chunk = list(islice(texts, IMPORT_CHUNK_ROWS))
+        except BaseException:
+            writer.abort()
+            raise
+    return writer.finish()
+
+def create_dataset_from_csv(con, csv_path, text_store=None):
+    return import_source(con, csv_path, fmt="csv", text_store=text_store)
+
+def bench_readers(n: int = 200_000) -> dict:
+    """Import rows/s and file size per source format, same `n` tweets in each."""
+    rnd = random.Random(0)
+    words = ["klimat", "szczepionki", "granica", "podatki", "rząd", "Unia", "wybory", "sąd", "ceny", "prąd"]
+    texts = [" ".join(rnd.choices(words, k=20)) + f" #{i}" for i in range(n)]
+    res = {"tweets": n}
+    with tempfile.TemporaryDirectory() as tmp:
+        plain = {"csv": os.path.join(tmp, "t.csv"), "jsonl": os.path.join(tmp, "t.jsonl")}
+        with open(plain["csv"], "w", encoding="utf-8", newline="") as f:
+            w = csv.writer(f); w.writerow(["tweets"]); w.writerows([t] for t in texts)
+        with open(plain["jsonl"], "w", encoding="utf-8") as f:
+            f.writelines(json.dumps({"id": i, "text": t}, ensure_ascii=False) + "\n" for i, t in enumerate(texts))
+        sources = dict(plain)
+        for fmt, path in plain.items():
+            for ext, opener in _DECOMPRESSORS.items():
+                with open(path, "rb") as src, opener(path + ext, "wb") as dst:
+                    while block := src.read(IMPORT_READ_BUFFER):
+                        dst.write(block)
+                sources[fmt + ext] = path + ext
+        for label, path in sources.items():
+            con = ensure_db(os.path.join(tmp, f"bench_{label}.sqlite3"))
+            t0 = time.perf_counter()
+            _, total = import_source(con, path, text_store="inline")
+            secs = time.perf_counter() - t0
+            con.close()
+            res[label] = {"rows_per_s": round(total / secs), "file_mb": round(os.path.getsize(path) / 1_048_576, 2)}
+    return res
+
+class ImportCancelled(Exception):
+    pass
+
+def _natural_key(name: str):
+    """shard_2.csv before shard_10.csv."""
+    return [int(p) if p.isdigit() else p.lower() for p in re.split(r"(\d+)", name)]
+
+def list_csv_shards(folder) -> list[str]:
+    """CSV shards in `folder` (compressed ones too), in natural name order."""
+    names = [n for n in os.listdir(folder) if detect_format(n) == "csv" and not n.startswith(".")]
+    return [os.path.join(folder, n) for n in sorted(names, key=_natural_key)]
+
+def _parse_csv_shard(path) -> list[tuple[str, str]]:
+    """Worker job: the 'tweets' column of one shard, stripped, as (text, text_hash) in file order."""
+    try:
+        with open_source(path) as fh:
+            return [(t, _text_hash(t)) for t in read_csv_texts(fh)]
+    except ValueError as e:
+        raise ValueError(f"{os.path.basename(path)}: {e}") from None
+
+def import_csv_folder(con, folder, *, workers=None, text_store=None, progress=None) -> tuple[int, int]:
+    """
+    One dataset from every *.csv shard in `folder` (natural name order).
+    Parsing, stripping and hashing run in a process pool; this thread is
+    the single writer (DatasetWriter, large transactions). Results are
+    taken in submission order, which keeps the order across files, and at
+    most IMPORT_INFLIGHT shards per worker are parsed ahead of the writer,
+    which bounds memory. workers=0 parses on this thread. `progress(files
+    done, files, rows)` may raise ImportCancelled; any error removes the
+    partial dataset.
+    """
+    paths = list_csv_shards(folder)
+    if not paths:
+        raise ValueError("Brak plików CSV w folderze.")
+    workers = (os.cpu_count() or 1) if workers is None else workers
+    writer = DatasetWriter(con, os.path.basename(os.path.normpath(folder)), os.path.abspath(folder), text_store)
+    executor = ProcessPoolExecutor(max_workers=workers) if workers > 0 else None
+    try:
+        if executor is None:
+            batches = map(_parse_csv_shard, paths)
+        else:
+            batches = _ordered_results(executor, _parse_csv_shard, paths, workers * IMPORT_INFLIGHT)
+        for done, batch in enumerate(batches, 1):
+            writer.add(batch)
+            if progress:
+                progress(done, len(paths), writer.count)
+        if writer.count == 0:
+            raise ValueError("Brak tweetów do zaimportowania.")
+    except BaseException:
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+        writer.abort()
+        raise
+    if executor is not None:
+        executor.shutdown()
+    return writer.finish()
+
+def _ordered_results(executor, fn, items, window: int):
+    """executor.map with at most `window` results in flight (map submits everything up front)."""
+    items = iter(items)
+    pending = deque(executor.submit(fn, x) for x, _ in zip(items, range(window)))
+    while pending:
+        fut = pending.popleft()
+        nxt = next(items, None)
+        if nxt is not None:
+            pending.append(executor.submit(fn, nxt))
+        yield fut.result()
+
+def bench_folder_import(files: int = 64, rows: int = 5_000, workers=None) -> dict:
+    """Rows/s of import_csv_folder for `files` shards x `rows` tweets, per worker count (0 = inline)."""
+    cores = os.cpu_count() or 1
+    counts = workers or [0] + sorted({1, 2, 4, 8, cores} & set(range(1, cores + 1)) | {1})
+    rnd = random.Random(0)
+    words = ["klimat", "szczepionki", "granica", "podatki", "rząd", "Unia", "wybory", "sąd", "ceny", "prąd"]
+    with tempfile.TemporaryDirectory() as tmp:
+        folder = os.path.join(tmp, "shards")
+        os.makedirs(folder)
+        for f in range(files):
+            with open(os.path.join(folder, f"shard_{f}.csv"), "w", encoding="utf-8", newline="") as fh:
+                w = csv.writer(fh)
+                w.writerow(["id", "tweets"])
+                for i in range(rows):
+                    w.writerow([i, "  " + " ".join(rnd.choices(words, k=20)) + f" #{f}/{i}  "])
+        res = {"files": files, "rows": files * rows, "cores": cores, "rows_per_s": {}}
+        for n in counts:
+            con = ensure_db(os.path.join(tmp, f"bench{n}.sqlite3"))
+            t0 = time.perf_counter()
+            _, total = import_csv_folder(con, folder, workers=n, text_store="inline")
+            res["rows_per_s"][n] = round(total / (time.perf_counter() - t0))
+            con.close()
+    return res
+
+def apply_annotation_memory(cur, ds_id) -> int:
+    """
+    Pre-fill tweets of `ds_id` whose text was already annotated in an earlier
+    dataset, hot or archived (annotation_memory); the latest annotation (the
+    highest tweet id) wins. One joined UPDATE; no per-row lookups.
+    Returns the number of reused tweets.
+    """
+    answers = ", ".join(SCHEMA.answer_cols)
+    _bump_revision(cur)
+    # bare columns next to MAX(id) come from the row holding the maximum (SQLite)
+    cur.execute(f"""
+        UPDATE tweets SET {SCHEMA.answers_from_s}, reused_from=s.id, revision={REVISION_SQL}
+        FROM (
+            SELECT text_hash, MAX(id) AS id, {answers}
+            FROM (
+                SELECT id, text_hash, {answers} FROM tweets
+                WHERE annotated=1 AND dataset_id<>:ds
+                  AND text_hash IN (SELECT text_hash FROM tweets WHERE dataset_id=:ds)
+                UNION ALL
+                SELECT id, text_hash, {answers} FROM annotation_memory
+                WHERE dataset_id<>:ds
+                  AND text_hash IN (SELECT text_hash FROM tweets WHERE dataset_id=:ds)
+            )
+            GROUP BY text_hash
+        ) AS s
+        WHERE tweets.dataset_id=:ds AND tweets.text_hash=s.text_hash
+    """, {"ds": ds_id})
+    return max(0, cur.rowcount)
 
 def load_active_dataset(con):
     settings = QSettings(ORG_NAME, APP_NAME)
@@ -399,61 +1353,552 @@ def set_active_dataset(ds_id):
     else:
         settings.setValue("active_dataset_id", ds_id)
 
+def load_open_datasets(con) -> list[tuple]:
+    """Open (not yet exported) datasets as (id, name, cursor, total, done), in opening order."""
+    settings = QSettings(ORG_NAME, APP_NAME)
+    ids = [int(x) for x in str(settings.value("open_dataset_ids", "") or "").split(",") if x.strip()]
+    active = settings.value("active_dataset_id", type=int)
+    if active and active not in ids:
+        ids.append(active)  # sessions started before multi-dataset support
+    if not ids:
+        return []
+    cur = con.cursor()
+    cur.execute(
+        f"SELECT id, name, cursor, total, done FROM datasets WHERE exported=0 AND id IN ({','.join('?' * len(ids))})",
+        ids
+    )
+    by_id = {r[0]: r for r in cur.fetchall()}
+    return [by_id[i] for i in ids if i in by_id]
+
+def set_open_datasets(ids):
+    settings = QSettings(ORG_NAME, APP_NAME)
+    settings.setValue("open_dataset_ids", ",".join(str(i) for i in ids))
+
+def mark_dataset_exported(con, ds_id):
+    cur = con.cursor()
+    cur.execute("UPDATE datasets SET exported=1, exported_at=? WHERE id=?",
+                (datetime.now().strftime("%Y-%m-%d %H:%M:%S"), ds_id))
+    con.commit()
+
 def get_tweet_row(con, ds_id, idx):
+    """SCHEMA.Row for tweet `idx` of `ds_id` (None if missing); still indexable like a tuple."""
     cur = con.cursor()
-    detail_cols = [f"{col}_detail" for _, col in LABELS if col != "inne"]
-    select_cols = ", ".join([
-        *(col for _, col in LABELS),
-        *detail_cols,
-        "COALESCE(intent, -1)",
-        "COALESCE(time_spent_ms,0)",
-        "first_seen_at",
-        "last_seen_at",
-    ])
-    cur.execute(f"""
-        SELECT id, text, annotated, {select_cols}
-        FROM tweets
-        WHERE dataset_id=? AND idx=?
-    """, (ds_id, idx))
-    return cur.fetchone()
+    cur.execute(SCHEMA.sql_get_row, (ds_id, idx))
+    r = cur.fetchone()
+    return SCHEMA.Row._make(r) if r else None
 
-def save_labels_for(con, tweet_id, label_values: dict, mark_annotated=True):
-    sets = []
-    vals = []
-    for _, col in LABELS:
-        sets.append(f"{col}=?")
-        vals.append(1 if label_values.get(col, 0) else 0)
-    if mark_annotated:
-        sets.append("annotated=?")
-        vals.append(1)
+def iter_dataset_rows(con, ds_id):
+    """All tweets of `ds_id` in idx order, as SCHEMA.Row."""
+    cur = con.cursor()
+    cur.execute(SCHEMA.sql_dataset_rows, (ds_id,))
+    return map(SCHEMA.Row._make, cur)
+
+def _propagate_duplicates(cur, tweet_id: int) -> int:
+    """
+    Copy the answers of `tweet_id` to every byte-identical (normalized) tweet
+    in the same dataset, in one set-based UPDATE. Rows that were annotated
+    independently are left alone. Returns the number of duplicates updated.
+    """
+    cur.execute(SCHEMA.sql_propagate, {"src": tweet_id})
+    return max(0, cur.rowcount)
+
+def save_labels_for(con, tweet_id, label_values: dict, mark_annotated=True) -> int:
+    """Returns how many tweets were saved (the tweet itself + its duplicates)."""
+    vals = [1 if label_values.get(col, 0) else 0 for col in SCHEMA.label_cols]
     vals.append(tweet_id)
-    sql = f"UPDATE tweets SET {', '.join(sets)} WHERE id=?"
     cur = con.cursor()
-    cur.execute(sql, vals)
+    _bump_revision(cur)
+    cur.execute(SCHEMA.sql_save_labels if mark_annotated else SCHEMA.sql_save_labels_keep, vals)
+    n = _propagate_duplicates(cur, tweet_id)
     con.commit()
+    return 1 + n
 
-def save_detail(con, tweet_id: int, topic_col: str, selected: set[int]):
+def save_detail(con, tweet_id: int, topic_col: str, selected: set[int]) -> int:
     cur = con.cursor()
+    _bump_revision(cur)
     cur.execute(
-        f"UPDATE tweets SET {topic_col}_detail=? , annotated=? WHERE id=?",
+        SCHEMA.sql_save_detail[topic_col],
         (_serialize_detail_value(selected), 1 if bool(selected) else 0, tweet_id)
     )
+    n = _propagate_duplicates(cur, tweet_id)
     con.commit()
+    return 1 + n
 
 def clear_detail(con, tweet_id: int, topic_col: str):
     cur = con.cursor()
-    cur.execute(f"UPDATE tweets SET {topic_col}_detail='' WHERE id=?", (tweet_id,))
+    _bump_revision(cur)
+    cur.execute(SCHEMA.sql_clear_detail[topic_col], (tweet_id,))
+    _propagate_duplicates(cur, tweet_id)
     con.commit()
 
-def save_intent(con, tweet_id: int, option_idx: int):
+def save_intent(con, tweet_id: int, option_idx: int) -> int:
     cur = con.cursor()
-    cur.execute("UPDATE tweets SET intent=?, annotated=1 WHERE id=?", (int(option_idx), tweet_id))
+    _bump_revision(cur)
+    cur.execute(f"UPDATE tweets SET intent=?, annotated=1, propagated_from=NULL, reused_from=NULL, "
+                f"revision={REVISION_SQL} WHERE id=?", (int(option_idx), tweet_id))
+    n = _propagate_duplicates(cur, tweet_id)
     con.commit()
+    return 1 + n
 
 def clear_intent(con, tweet_id: int):
     cur = con.cursor()
-    cur.execute("UPDATE tweets SET intent=-1 WHERE id=?", (tweet_id,))
+    _bump_revision(cur)
+    cur.execute(f"UPDATE tweets SET intent=-1, revision={REVISION_SQL} WHERE id=?", (tweet_id,))
+    _propagate_duplicates(cur, tweet_id)
+    con.commit()
+
+def undo_propagation(con, tweet_id: int) -> int:
+    """Reset every duplicate that received its answers from `tweet_id`; returns how many."""
+    cur = con.cursor()
+    _bump_revision(cur)
+    cur.execute(SCHEMA.sql_undo_propagation, (tweet_id,))
     con.commit()
+    return max(0, cur.rowcount)
+
+def count_propagated(con, ds_id) -> int:
+    cur = con.cursor()
+    cur.execute("SELECT n_propagated FROM datasets WHERE id=?", (ds_id,))
+    return cur.fetchone()[0]
+
+def count_reused(con, ds_id) -> int:
+    cur = con.cursor()
+    cur.execute("SELECT n_reused FROM datasets WHERE id=?", (ds_id,))
+    return cur.fetchone()[0]
+
+def find_idx(con, ds_id, from_idx, *, forward=True, missing_followup=False):
+    """
+    Nearest unannotated tweet (or, with `missing_followup`, tweet with an
+    unanswered follow-up) strictly after/before `from_idx`, wrapping around
+    the dataset (the second arm, tagged k=1, only when the first finds
+    nothing). One query over a partial index; None if there is none.
+    """
+    cond = SCHEMA.missing_followup_sql if missing_followup else "annotated=0"
+    agg, op = ("MIN", ">") if forward else ("MAX", "<")
+    cur = con.cursor()
+    cur.execute(f"""
+        SELECT idx FROM (
+            SELECT 0 AS k, {agg}(idx) AS idx FROM tweets WHERE dataset_id=:ds AND {cond} AND idx {op} :at
+            UNION ALL
+            SELECT 1 AS k, {agg}(idx) AS idx FROM tweets WHERE dataset_id=:ds AND {cond} AND idx <> :at
+        ) WHERE idx IS NOT NULL ORDER BY k LIMIT 1
+    """, {"ds": ds_id, "at": from_idx})
+    r = cur.fetchone()
+    return r[0] if r else None
+
+def next_own_idx(con, ds_id, after_idx, skip_reused=False):
+    """
+    First idx after `after_idx` that was not filled by duplicate propagation
+    (nor reused from an earlier dataset, if `skip_reused`). None if none.
+    """
+    cur = con.cursor()
+    cur.execute(
+        """SELECT MIN(idx) FROM tweets
+           WHERE dataset_id=? AND idx>? AND propagated_from IS NULL
+             AND (? = 0 OR reused_from IS NULL)""",
+        (ds_id, after_idx, 1 if skip_reused else 0)
+    )
+    return cur.fetchone()[0]
+
+def next_priority_idx(con, ds_id, current_idx):
+    """Most uncertain unannotated tweet other than the current one (None if nothing scored)."""
+    cur = con.cursor()
+    cur.execute(
+        """SELECT idx FROM tweets
+           WHERE dataset_id=? AND annotated=0 AND priority IS NOT NULL AND idx<>?
+           ORDER BY priority DESC LIMIT 1""",
+        (ds_id, current_idx)
+    )
+    r = cur.fetchone()
+    return r[0] if r else None
+
+def _db_path(con) -> str:
+    return con.execute("PRAGMA database_list").fetchone()[2]
+
+def get_uncertain_first() -> bool:
+    settings = QSettings(ORG_NAME, APP_NAME)
+    return settings.value("uncertain_first", False, type=bool)
+
+def set_uncertain_first(flag: bool):
+    settings = QSettings(ORG_NAME, APP_NAME)
+    settings.setValue("uncertain_first", bool(flag))
+
+def get_skip_reused() -> bool:
+    settings = QSettings(ORG_NAME, APP_NAME)
+    return settings.value("skip_reused", False, type=bool)
+
+def set_skip_reused(flag: bool):
+    settings = QSettings(ORG_NAME, APP_NAME)
+    settings.setValue("skip_reused", bool(flag))
+
+def get_auto_backup() -> bool:
+    settings = QSettings(ORG_NAME, APP_NAME)
+    return settings.value("auto_backup", True, type=bool)
+
+def set_auto_backup(flag: bool):
+    settings = QSettings(ORG_NAME, APP_NAME)
+    settings.setValue("auto_backup", bool(flag))
+
+def get_idle_after() -> int:
+    settings = QSettings(ORG_NAME, APP_NAME)
+    return settings.value("idle_after_s", IDLE_AFTER_S, type=int)
+
+def set_idle_after(seconds: int):
+    settings = QSettings(ORG_NAME, APP_NAME)
+    settings.setValue("idle_after_s", int(seconds))
+
+def get_record_sessions() -> bool:
+    settings = QSettings(ORG_NAME, APP_NAME)
+    return settings.value("record_sessions", False, type=bool)
+
+def set_record_sessions(flag: bool):
+    settings = QSettings(ORG_NAME, APP_NAME)
+    settings.setValue("record_sessions", bool(flag))
+
+def get_rapid_mode() -> bool:
+    settings = QSettings(ORG_NAME, APP_NAME)
+    return settings.value("rapid_mode", False, type=bool)
+
+def set_rapid_mode(flag: bool):
+    settings = QSettings(ORG_NAME, APP_NAME)
+    settings.setValue("rapid_mode", bool(flag))
+
+def validate_bulk_edit(labels: dict, details: dict, intent) -> tuple[bool, str]:
+    """
+    The rules of TaggerWindow._validate_required_followups, applied to a bulk
+    edit: every topic it ticks needs a follow-up answer, ticking INNE needs
+    an intent, and each answer set must respect the option rules. An edit
+    may not answer a topic it unticks (nor give an intent while unticking
+    INNE): the UPDATE would assign that column twice.
+    """
+    for col, on in labels.items():
+        disp = SCHEMA.label_names[col]
+        if not on:
+            if col in details:
+                return False, f"Odpowiedź w pytaniu doprecyzowującym dla odznaczanego tematu „{disp}”."
+            if col == "inne" and intent is not None:
+                return False, "Odpowiedź w pytaniu o intencję przy odznaczaniu „INNE”."
+            continue
+        if col in DETAIL_QUESTIONS and not details.get(col):
+            return False, f"Zaznacz co najmniej jedną odpowiedź w pytaniu doprecyzowującym dla „{disp}”."
+        if col == "inne" and (intent is None or intent < 0):
+            return False, "Zaznacz odpowiedź w pytaniu o główną intencję wypowiedzi (dla „INNE”)."
+    for col, selected in details.items():
+        opts = DETAIL_QUESTIONS[col][1]
+        rebuilt: set[int] = set()
+        for i in sorted(selected):
+            rebuilt = _apply_rules_toggle(rebuilt, i, opts)
+        if rebuilt != set(selected):
+            disp = SCHEMA.label_names[col]
+            return False, f"Wykluczające się odpowiedzi w pytaniu doprecyzowującym dla „{disp}”."
+    return True, ""
+
+def bulk_apply(con, ds_id, idxs=None, *, where="", params=(),
+               labels: dict = None, details: dict = None, intent=None) -> int:
+    """
+    Apply one edit to many tweets of `ds_id`, chosen by `idxs` or by a
+    `where` filter, in a single transaction of set-based UPDATEs:
+      labels  {col: bool}      tick/untick (unticking clears its follow-up)
+      details {col: set[int]}  follow-up answers (ticks the topic too)
+      intent  int              intent answer (ticks INNE too)
+    Edited rows become annotated and confirmed; duplicates elsewhere in the
+    dataset receive the same answers. Progress counters follow via triggers.
+    Returns the number of tweets changed. Raises ValueError, changing
+    nothing, on an invalid edit or when an edited row would end up with a
+    ticked topic that lacks its follow-up answer.
+    """
+    labels = dict(labels or {})
+    details = {c: set(v) for c, v in (details or {}).items()}
+    for col in details:
+        labels.setdefault(col, True)
+    if intent is not None:
+        labels.setdefault("inne", True)
+    ok, msg = validate_bulk_edit(labels, details, intent)
+    if not ok:
+        raise ValueError(msg)
+
+    sets, vals = [], []
+    for col, on in labels.items():
+        sets.append(f"{col}=?"); vals.append(1 if on else 0)
+        if not on:
+            if col == "inne":
+                sets.append("intent=-1")
+            elif col in DETAIL_QUESTIONS:
+                sets.append(f"{col}_detail=''")
+    for col, selected in details.items():
+        sets.append(f"{col}_detail=?"); vals.append(_serialize_detail_value(selected))
+    if intent is not None and labels.get("inne"):
+        sets.append("intent=?"); vals.append(int(intent))
+    sets += ["annotated=1", "propagated_from=NULL", "reused_from=NULL", f"revision={REVISION_SQL}"]
+
+    cur = con.cursor()
+    try:
+        cur.execute("CREATE TEMP TABLE IF NOT EXISTS bulk_sel (idx INTEGER PRIMARY KEY)")
+        cur.execute("DELETE FROM bulk_sel")
+        _bump_revision(cur)
+        if idxs is not None:
+            cur.executemany("INSERT OR IGNORE INTO bulk_sel(idx) VALUES (?)", ((int(i),) for i in idxs))
+        else:
+            cur.execute(f"INSERT INTO bulk_sel(idx) SELECT idx FROM tweets WHERE dataset_id=? AND ({where or '1'})",
+                        (ds_id, *params))
+        cur.execute(
+            f"UPDATE tweets SET {', '.join(sets)} WHERE dataset_id=? AND idx IN (SELECT idx FROM bulk_sel)",
+            (*vals, ds_id)
+        )
+        changed = max(0, cur.rowcount)
+        # the edit is valid on its own; the rows after it must be too (topics it leaves alone
+        # may be ticked without their follow-up, and the rows are now annotated)
+        broken, first = cur.execute(
+            f"SELECT COUNT(*), MIN(idx) FROM tweets WHERE dataset_id=? AND idx IN (SELECT idx FROM bulk_sel) "
+            f"AND {SCHEMA.missing_followup_sql}", (ds_id,)
+        ).fetchone()
+        if broken:
+            raise ValueError(f"Po zmianie {broken} tweetów (np. #{first + 1}) nie miałoby wymaganej odpowiedzi "
+                             "w pytaniu doprecyzowującym lub o intencję. Uzupełnij je w tej zmianie "
+                             "albo zawęź wybór.")
+        # duplicates outside the selection take the answers of one edited twin
+        cur.execute(f"""
+            UPDATE tweets SET {SCHEMA.answers_from_s}, propagated_from=s.id, revision={REVISION_SQL}
+            FROM (
+                SELECT text_hash, MIN(id) AS src_id FROM tweets
+                WHERE dataset_id=:ds AND idx IN (SELECT idx FROM bulk_sel)
+                GROUP BY text_hash
+            ) AS src JOIN tweets AS s ON s.id = src.src_id
+            WHERE tweets.dataset_id=:ds AND tweets.text_hash=src.text_hash
+              AND tweets.idx NOT IN (SELECT idx FROM bulk_sel)
+              AND (tweets.annotated=0 OR tweets.propagated_from IS NOT NULL OR tweets.reused_from IS NOT NULL)
+        """, {"ds": ds_id})
+        changed += max(0, cur.rowcount)
+        cur.execute("DELETE FROM bulk_sel")
+        con.commit()
+    except Exception:
+        con.rollback()
+        raise
+    return changed
+
+def bench_bulk_edit(n: int = 100_000) -> dict:
+    """Seconds for one bulk edit of `n` tweets vs. the per-tweet save path (extrapolated)."""
+    with tempfile.TemporaryDirectory() as tmp:
+        con = ensure_db(os.path.join(tmp, "bench.sqlite3"))
+        cur = con.cursor()
+        cur.execute("INSERT INTO datasets (name, created_at, total) VALUES ('bench', '', ?)", (n,))
+        ds_id = cur.lastrowid
+        cur.executemany("INSERT INTO tweets (dataset_id, idx, text, text_hash) VALUES (?, ?, ?, ?)",
+                        ((ds_id, i, f"tweet {i}", _text_hash(f"tweet {i}")) for i in range(n)))
+        con.commit()
+
+        t0 = time.perf_counter()
+        changed = bulk_apply(con, ds_id, range(n), labels={"klimat": True}, details={"klimat": {1}})
+        t_bulk = time.perf_counter() - t0
+
+        sample = min(n, 2000)
+        cur.execute("SELECT id FROM tweets WHERE dataset_id=? ORDER BY idx LIMIT ?", (ds_id, sample))
+        ids = [r[0] for r in cur.fetchall()]
+        t0 = time.perf_counter()
+        for tid in ids:
+            save_labels_for(con, tid, {"inne": True})
+            save_intent(con, tid, 0)
+        t_rows = (time.perf_counter() - t0) * n / sample
+        done, _ = count_annotated(con, ds_id)
+        con.close()
+    return {
+        "tweets": n,
+        "changed": changed,
+        "bulk_s": round(t_bulk, 3),
+        "per_tweet_s_estimated": round(t_rows, 1),
+        "annotated_counter": done,
+    }
+
+def check_bulk_edit() -> dict:
+    """
+    Contradictory bulk edits (answers for a topic the same edit unticks), and
+    edits that would leave a row with a ticked topic lacking its follow-up,
+    are rejected and leave the rows alone; a consistent edit is applied as
+    given.
+    """
+    topic, other = list(DETAIL_QUESTIONS)[:2]
+    cases = {
+        "details_for_unticked": {"labels": {topic: False}, "details": {topic: {0}}},
+        "intent_for_unticked_inne": {"labels": {"inne": False}, "intent": 0},
+        "other_topic_without_followup": {"labels": {topic: True}, "details": {topic: {0}}},
+    }
+    failures = []
+    with tempfile.TemporaryDirectory() as tmp:
+        with closing(ensure_db(os.path.join(tmp, "check.sqlite3"))) as con:
+            cur = con.cursor()
+            cur.execute("INSERT INTO datasets (name, created_at, total) VALUES ('check', '', 2)")
+            ds_id = cur.lastrowid
+            cur.executemany("INSERT INTO tweets (dataset_id, idx, text, text_hash) VALUES (?, ?, ?, ?)",
+                            ((ds_id, i, f"tweet {i}", _text_hash(f"tweet {i}")) for i in range(2)))
+            # ticked without its follow-up (a pre-label or an unfinished tweet)
+            cur.execute(f"UPDATE tweets SET {other}=1 WHERE dataset_id=? AND idx=0", (ds_id,))
+            con.commit()
+            for name, edit in cases.items():
+                try:
+                    bulk_apply(con, ds_id, [0], **edit)
+                    failures.append(f"{name}: accepted")
+                except ValueError:
+                    pass
+            row = con.execute(f"SELECT annotated, {topic}, {topic}_detail, intent FROM tweets "
+                              f"WHERE dataset_id=? AND idx=0", (ds_id,)).fetchone()
+            if tuple(row) != (0, 0, -1, -1):
+                failures.append(f"rejected edits changed the row: {tuple(row)}")
+            bulk_apply(con, ds_id, [1], labels={topic: True}, details={topic: {0}})
+            row = con.execute(f"SELECT annotated, {topic}, {topic}_detail FROM tweets "
+                              f"WHERE dataset_id=? AND idx=1", (ds_id,)).fetchone()
+            if (row[0], row[1], str(row[2])) != (1, 1, _serialize_detail_value({0})):
+                failures.append(f"consistent edit stored {tuple(row)}")
+    return {"cases": len(cases) + 1, "failures": failures, "ok": not failures}
+
+def bench_text_store(n: int = 200_000, updates: int = 20_000, seed: int = 0) -> dict:
+    """Per text storage mode: import time, size, navigation, label-UPDATE cost and export throughput."""
+    rnd = random.Random(seed)
+    words = ["szczepionki", "klimat", "rząd", "dzisiaj", "wszyscy", "https://t.co/x", "Polska", "ludzie"]
+    results = {"tweets": n}
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_path = os.path.join(tmp, "in.csv")
+        with open(csv_path, "w", encoding="utf-8", newline="") as f:
+            w = csv.writer(f); w.writerow(["tweets"])
+            for i in range(n):
+                w.writerow([f"{i} " + " ".join(rnd.choice(words) for _ in range(rnd.randint(15, 40)))])
+        for mode in TEXT_STORE_MODES:
+            db_path = os.path.join(tmp, mode, "bench.sqlite3")
+            con = ensure_db(db_path)
+            t0 = time.perf_counter()
+            ds_id, _ = create_dataset_from_csv(con, csv_path, text_store=mode)
+            t_imp = time.perf_counter() - t0
+            cur = con.cursor()
+            cur.execute("SELECT id FROM tweets WHERE dataset_id=?", (ds_id,))
+            ids = [r[0] for r in cur.fetchall()]
+            with _text_lock:
+                _text_lru.clear()
+            t0 = time.perf_counter()
+            for i in rnd.sample(range(n), min(updates, n)):
+                get_tweet_row(con, ds_id, i)
+            t_nav = time.perf_counter() - t0
+            t0 = time.perf_counter()
+            for tid in rnd.sample(ids, min(updates, len(ids))):
+                save_labels_for(con, tid, {"klimat": True})
+            t_upd = time.perf_counter() - t0
+            t0 = time.perf_counter()
+            export_dataset_to_csv(con, ds_id, os.path.join(tmp, f"{mode}.csv"))
+            t_exp = time.perf_counter() - t0
+            con.close()
+            blob_bytes = sum(os.path.getsize(os.path.join(r, fn))
+                             for r, _, fns in os.walk(_texts_dir(db_path)) for fn in fns)
+            results[mode] = {
+                "import_s": round(t_imp, 2),
+                "db_mb": round(os.path.getsize(db_path) / 2**20, 1),
+                "text_store_mb": round(blob_bytes / 2**20, 1),
+                "get_row_us": round(t_nav / max(1, updates) * 1e6, 1),
+                "update_us": round(t_upd / max(1, updates) * 1e6, 1),
+                "export_rows_per_s": round(n / t_exp),
+            }
+    with _text_lock:
+        for store in list(TextStore._open.values()):
+            store.close()
+    results["codec"] = "zstd" if zstandard is not None else "zlib"
+    return results
+
+def bench_row_layout(calls: int = 50_000) -> dict:
+    """Per-call µs of row read + decode and label save: SCHEMA vs. rebuilding SQL per call."""
+    def legacy_get_row(con, ds_id, idx):
+        detail_cols = [f"{col}_detail" for _, col in LABELS if col != "inne"]
+        select_cols = ", ".join([*(col for _, col in LABELS), *detail_cols, "COALESCE(intent, -1)",
+                                 "COALESCE(time_spent_ms,0)", "first_seen_at", "last_seen_at"])
+        cur = con.cursor()
+        cur.execute(f"SELECT id, {TEXT_SQL}, annotated, {select_cols} FROM tweets WHERE dataset_id=? AND idx=?",
+                    (ds_id, idx))
+        row = cur.fetchone()
+        labels_count = len(LABELS)
+        return {col: bool(v) for (col, v) in zip([c for _, c in LABELS], row[3:3 + labels_count])}
+
+    def legacy_save_labels(con, tweet_id, label_values):
+        sets, vals = [], []
+        for _, col in LABELS:
+            sets.append(f"{col}=?"); vals.append(1 if label_values.get(col, 0) else 0)
+        sets += ["annotated=?"]; vals += [1, tweet_id]
+        con.execute(f"UPDATE tweets SET {', '.join(sets)} WHERE id=?", vals)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        con = ensure_db(os.path.join(tmp, "bench.sqlite3"))
+        con.execute("PRAGMA synchronous=OFF")
+        cur = con.cursor()
+        cur.execute("INSERT INTO datasets (name, created_at, total) VALUES ('bench', '', 1000)")
+        ds_id = cur.lastrowid
+        cur.executemany("INSERT INTO tweets (dataset_id, idx, text, text_hash) VALUES (?, ?, ?, ?)",
+                        ((ds_id, i, f"tweet {i}", f"h{i}") for i in range(1000)))
+        con.commit()
+
+        def per_call(fn):
+            t0 = time.perf_counter()
+            for i in range(calls):
+                fn(i % 1000)
+            return round((time.perf_counter() - t0) / calls * 1e6, 2)
+
+        labels = {"klimat": True}
+        res = {
+            "calls": calls,
+            "get_row_legacy_us": per_call(lambda i: legacy_get_row(con, ds_id, i)),
+            "get_row_schema_us": per_call(lambda i: SCHEMA.labels_of(get_tweet_row(con, ds_id, i))),
+            "save_stmt_legacy_us": per_call(lambda i: legacy_save_labels(con, i + 1, labels)),
+            "save_stmt_schema_us": per_call(lambda i: con.execute(
+                SCHEMA.sql_save_labels, [1 if labels.get(c) else 0 for c in SCHEMA.label_cols] + [i + 1])),
+        }
+        con.rollback()
+        con.close()
+    return res
+
+def has_sort_index(con, col: str) -> bool:
+    return col == "idx" or con.execute("SELECT 1 FROM sqlite_master WHERE type='index' AND name=?",
+                                       (f"ix_tweets_sort_{col}",)).fetchone() is not None
+
+def ensure_sort_index(con, col: str):
+    """Index for keyset paging ordered by `col` (created on first use of that sort)."""
+    if col == "idx":
+        return
+    if col not in OVERVIEW_SORT_COLS:
+        raise ValueError(f"Kolumna {col} nie jest sortowalna.")
+    cur = con.cursor()
+    cur.execute(f"CREATE INDEX IF NOT EXISTS ix_tweets_sort_{col} ON tweets(dataset_id, {col}, idx)")
+    con.commit()
+
+def fetch_overview_page(con, ds_id, after, *, sort_col="idx", desc=False,
+                        where="", params=(), limit=500):
+    """
+    One page of the overview, keyset-paginated on (sort_col, idx) — never OFFSET,
+    so page N costs the same as page 1. `after` is the (sort value, idx) key
+    of the last row already shown, or None for the first page. Tweet text is
+    cut to a preview to keep pages small.
+    """
+    op, order = ("<", "DESC") if desc else (">", "ASC")
+    clauses = ["dataset_id=?"]
+    args = [ds_id]
+    if where:
+        clauses.append(f"({where})")
+        args.extend(params)
+    if after is not None:
+        if sort_col == "idx":
+            clauses.append(f"idx {op} ?")
+            args.append(after[1])
+        else:
+            clauses.append(f"({sort_col}, idx) {op} (?, ?)")
+            args.extend(after)
+    sort_key = "idx" if sort_col == "idx" else f"{sort_col}, idx"
+    order_by = ", ".join(f"{c} {order}" for c in sort_key.split(", "))
+    cur = con.cursor()
+    cur.execute(f"""
+        SELECT {sort_col}, {SCHEMA.overview_select}
+        FROM tweets
+        WHERE {' AND '.join(clauses)}
+        ORDER BY {order_by}
+        LIMIT ?
+    """, (*args, limit))
+    return [SCHEMA.OverviewRow._make(r) for r in cur.fetchall()]
+
+def count_overview_rows(con, ds_id, where="", params=()) -> int:
+    """Tweets of `ds_id` matching an overview filter (fetch_overview_page's `where`)."""
+    return con.execute(f"SELECT COUNT(*) FROM tweets WHERE dataset_id=? AND ({where or '1'})",
+                       (ds_id, *params)).fetchone()[0]
 
 def set_dataset_cursor(con, ds_id, new_cursor):
     cur = con.cursor()
@@ -462,69 +1907,363 @@ def set_dataset_cursor(con, ds_id, new_cursor):
 
 def count_annotated(con, ds_id):
     cur = con.cursor()
-    cur.execute("SELECT COUNT(*) FROM tweets WHERE dataset_id=? AND annotated=1", (ds_id,))
-    done = cur.fetchone()[0]
-    cur.execute("SELECT total FROM datasets WHERE id=?", (ds_id,))
-    total = cur.fetchone()[0]
+    cur.execute("SELECT done, total FROM datasets WHERE id=?", (ds_id,))
+    done, total = cur.fetchone()
     return done, total
 
-def export_dataset_to_csv(con, ds_id, out_path):
+def dataset_progress(con, ds_id) -> tuple[int, int, int, int]:
+    """(done, total, propagated, reused) for the progress label."""
+    done, total = count_annotated(con, ds_id)
+    return done, total, count_propagated(con, ds_id), count_reused(con, ds_id)
+
+# Viewing writes below do not bump the revision (see REVISION_SQL).
+
+def mark_first_seen(con, tweet_id: int, when: str):
     cur = con.cursor()
-    cols_db = [col for _, col in LABELS]
-    detail_cols = [f"{col}_detail" for _, col in LABELS if col != "inne"]
-    select_cols = ", ".join([
-        "text",
-        *cols_db,
-        *detail_cols,
-        "COALESCE(intent,-1)",
-        "COALESCE(time_spent_ms,0)",
-        "first_seen_at",
-        "last_seen_at",
-    ])
-    cur.execute(f"""
-        SELECT {select_cols}
-        FROM tweets
-        WHERE dataset_id=?
-        ORDER BY idx ASC
-    """, (ds_id,))
-    rows = cur.fetchall()
+    cur.execute("UPDATE tweets SET first_seen_at=? WHERE id=? AND first_seen_at IS NULL", (when, tweet_id))
+    con.commit()
 
-    headers = ["tweets"] \
-        + [name for name, _ in LABELS] \
-        + [f"{name}_doprecyz." for name, col in LABELS if col != "inne"] \
-        + ["Intencja", "Czas_s", "First_seen_at", "Last_seen_at"]
+def mark_last_seen(con, tweet_id: int, when: str):
+    cur = con.cursor()
+    cur.execute("UPDATE tweets SET last_seen_at=? WHERE id=?", (when, tweet_id))
+    con.commit()
 
-    # map topic_col -> options to convert indices to labels
-    topic_opts = {col: DETAIL_QUESTIONS[col][1] for _, col in LABELS if col in DETAIL_QUESTIONS}
+def add_time_spent(con, tweet_id: int, elapsed_ms: int, active_ms: int):
+    cur = con.cursor()
+    cur.execute(
+        "UPDATE tweets SET time_spent_ms = COALESCE(time_spent_ms,0) + ?, "
+        "active_ms = COALESCE(active_ms,0) + ? WHERE id=?",
+        (elapsed_ms, max(0, active_ms), tweet_id)
+    )
+    con.commit()
 
+def _export_values(r) -> list:
+    """One CSV row (after the text) in SCHEMA.export_headers order."""
+    label_vals = [int(getattr(r, col) or 0) for col in SCHEMA.label_cols]
+    # convert each detail TEXT value "0,2" -> "label0; label2"
+    detail_labels = ["; ".join(SCHEMA.detail_texts(t, getattr(r, f"{t}_detail")))
+                     for t in SCHEMA.detail_topics]
+    t_sec = round(int(r.time_spent_ms or 0) / 1000.0, 3)
+    active_sec = round(int(r.active_ms or 0) / 1000.0, 3)
+    return [*label_vals, *detail_labels, int(r.intent), t_sec,
+            r.first_seen_at or "", r.last_seen_at or "", active_sec]
+
+class ExportCancelled(Exception):
+    pass
+
+def export_dataset_to_csv(con, ds_id, out_path, progress=None) -> int:
+    """`progress(rows)` every EXPORT_PROGRESS_ROWS rows; it may raise ExportCancelled."""
+    n = 0
     with open(out_path, "w", encoding="utf-8-sig", newline="") as f:
         w = csv.writer(f)
-        w.writerow(headers)
-        for r in rows:
-            text = r[0]
-            label_vals = [int(v or 0) for v in r[1:1+len(LABELS)]]
-            det_start = 1 + len(LABELS)
-            det_end = det_start + len(detail_cols)
-            # convert each detail TEXT value "0,2" -> "label0; label2"
-            detail_labels = []
-            for i, det_col in enumerate(detail_cols):
-                raw = r[det_start + i]
-                raw = "" if raw is None else str(raw)
-                selected = _parse_detail_value(raw)
-                topic_col = det_col.removesuffix("_detail")
-                opts = topic_opts.get(topic_col, [])
-                chosen_texts = []
-                for idx in sorted(selected):
-                    if 0 <= idx < len(opts):
-                        chosen_texts.append(opts[idx])
-                detail_labels.append("; ".join(chosen_texts))
-            intent_val = int(r[det_end])
-            t_ms = int(r[det_end+1] or 0)
-            t_sec = round(t_ms / 1000.0, 3)
-            first_seen = r[det_end+2] or ""
-            last_seen  = r[det_end+3] or ""
-            w.writerow([text, *label_vals, *detail_labels, intent_val, t_sec, first_seen, last_seen])
+        w.writerow(SCHEMA.export_headers)
+        for r in iter_dataset_rows(con, ds_id):
+            w.writerow([r.text, *_export_values(r)])
+            n += 1
+            if progress and n % EXPORT_PROGRESS_ROWS == 0:
+                progress(n)
+    return n
+
+@contextmanager
+def read_snapshot(db_path):
+    """
+    Read-only connection inside one read transaction: every query sees the
+    DB as of the first one, whatever is written meanwhile (WAL). Leaving the
+    block ends the transaction and closes the connection, so the snapshot
+    never holds back a checkpoint longer than the reads need.
+    """
+    con = connect_db(db_path, readonly=True, timeout=30, isolation_level=None)
+    try:
+        con.execute("BEGIN")
+        yield con
+    finally:
+        con.close()
 
+def export_snapshot(con, ds_id, out_path, since=None, progress=None) -> tuple[int, int]:
+    """
+    Full export of `ds_id`, or with `since` only the tweets changed after
+    that revision, on a connection inside a read transaction (read_snapshot,
+    or a read-only DbWorker). Returns (rows, revision of the snapshot); the
+    caller records the checkpoint on a writing connection. The file appears
+    only once complete; an error (or ExportCancelled from `progress(rows)`)
+    leaves no partial file behind.
+    """
+    revision = current_revision(con)
+    part = out_path + ".part"
+    try:
+        if since is None:
+            rows = export_dataset_to_csv(con, ds_id, part, progress)
+        else:
+            rows = _write_delta(con, ds_id, part, since, revision, progress)
+    except BaseException:
+        if os.path.exists(part):
+            os.remove(part)
+        raise
+    os.replace(part, out_path)
+    return rows, revision
+
+def count_changed_since(con, ds_id, revision) -> int:
+    return con.execute("SELECT COUNT(*) FROM tweets WHERE dataset_id=? AND revision>?",
+                       (ds_id, revision)).fetchone()[0]
+
+# set in each batch-export worker process by _export_worker_init
+_export_cancel = None   # multiprocessing.Event: stop at the next progress report
+_export_rows = None     # shared array: rows written so far, one slot per dataset
+
+def _export_worker_init(cancel, rows):
+    global _export_cancel, _export_rows
+    _export_cancel, _export_rows = cancel, rows
+
+def _export_worker(db_path, ds_id, out_path, slot=None) -> tuple[int, str, int, int, float]:
+    """Process-pool job: one dataset to its own file from a read snapshot."""
+    def progress(rows):
+        if _export_rows is not None and slot is not None:
+            _export_rows[slot] = rows
+        if _export_cancel is not None and _export_cancel.is_set():
+            raise ExportCancelled()
+
+    t0 = time.perf_counter()
+    with read_snapshot(db_path) as con:
+        rows, revision = export_snapshot(con, ds_id, out_path, progress=progress)
+    return ds_id, out_path, rows, revision, time.perf_counter() - t0
+
+def batch_export_paths(con, ds_ids, out_dir) -> dict[int, str]:
+    """Output file per dataset: <name>_annotated.csv, or <name>_<id>_annotated.csv when names repeat."""
+    cur = con.cursor()
+    cur.execute(f"SELECT id, name FROM datasets WHERE id IN ({','.join('?' * len(ds_ids))})", list(ds_ids))
+    names = {i: os.path.splitext(n or f"dataset_{i}")[0] for i, n in cur.fetchall()}
+    counts: dict[str, int] = {}
+    for n in names.values():
+        counts[n] = counts.get(n, 0) + 1
+    return {i: os.path.join(out_dir, f"{names[i]}_annotated.csv" if counts[names[i]] == 1
+                            else f"{names[i]}_{i}_annotated.csv")
+            for i in ds_ids if i in names}
+
+class BatchExport:
+    """
+    Batch export: each dataset in `ds_ids` to its own CSV in `out_dir`, one
+    _export_worker per dataset in a process pool. Archived or missing
+    datasets are refused up front. Each finished dataset gets a full export
+    checkpoint at the revision of the snapshot it was read from (and, with
+    `mark_exported`, leaves the open set). Workers report the rows written
+    per dataset as they go (`done`, `rows_by_dataset()`); cancel() stops
+    them within EXPORT_PROGRESS_ROWS rows. Drive it with poll() from a GUI
+    timer, or run() to block.
+    """
+    def __init__(self, con, ds_ids, out_dir, *, workers=None, mark_exported=False):
+        self.con = con
+        self.mark_exported = mark_exported
+        cur = con.cursor()
+        cur.execute(f"SELECT id, total, archive_path FROM datasets WHERE id IN ({','.join('?' * len(ds_ids))})",
+                    list(ds_ids))
+        info = {i: (total, arc) for i, total, arc in cur.fetchall()}
+        self.failed = {i: "brak zbioru" for i in ds_ids if i not in info}
+        self.failed.update({i: "zbiór zarchiwizowany" for i, (_, arc) in info.items() if arc})
+        todo = [i for i in ds_ids if i in info and not info[i][1]]
+        self.sizes = {i: info[i][0] for i in todo}
+        self.total = sum(self.sizes.values())
+        self.ok: list[tuple[int, str]] = []
+        self.cancelled: set[int] = set()
+        os.makedirs(out_dir, exist_ok=True)
+        self.paths = batch_export_paths(con, todo, out_dir)
+        self.slots = {i: k for k, i in enumerate(self.paths)}
+        self._cancel = multiprocessing.Event()
+        self._rows = multiprocessing.RawArray("q", max(1, len(self.paths)))
+        n = max(1, min(workers or os.cpu_count() or 1, len(self.paths) or 1))
+        self._executor = ProcessPoolExecutor(max_workers=n, initializer=_export_worker_init,
+                                             initargs=(self._cancel, self._rows))
+        self.futures = {self._executor.submit(_export_worker, _db_path(con), i, path, self.slots[i]): i
+                        for i, path in self.paths.items()}
+        self.pending = set(self.futures)
+
+    @property
+    def done(self) -> int:
+        """Tweets written so far, finished datasets and those in progress."""
+        return sum(self._rows[:len(self.paths)])
+
+    def rows_by_dataset(self) -> dict[int, int]:
+        """Rows written so far of each dataset still being exported."""
+        return {self.futures[f]: self._rows[self.slots[self.futures[f]]] for f in self.pending}
+
+    def _finish(self, fut):
+        self.pending.discard(fut)
+        ds_id = self.futures[fut]
+        slot = self.slots[ds_id]
+        try:
+            _, path, rows, revision, _secs = fut.result()
+        except (CancelledError, ExportCancelled):
+            self.cancelled.add(ds_id)
+            self._rows[slot] = 0
+            return
+        except Exception as e:
+            self.failed[ds_id] = str(e)
+            self._rows[slot] = 0
+            part = self.paths[ds_id] + ".part"
+            if os.path.exists(part):
+                os.remove(part)   # a worker that died mid-file
+            return
+        self._rows[slot] = rows
+        record_export_checkpoint(self.con, ds_id, revision, "full", rows, path)
+        if self.mark_exported:
+            mark_dataset_exported(self.con, ds_id)
+        self.ok.append((ds_id, path))
+
+    def poll(self) -> bool:
+        """Collect finished workers; True once every dataset is done."""
+        for fut in [f for f in self.pending if f.done()]:
+            self._finish(fut)
+        if not self.pending:
+            self.shutdown()
+        return not self.pending
+
+    def run(self, progress=None):
+        """Block until done; `progress(done_tweets, total_tweets, ds_id)` after each dataset."""
+        try:
+            for fut in as_completed(list(self.pending)):
+                self._finish(fut)
+                if progress:
+                    progress(self.done, self.total, self.futures[fut])
+        except BaseException:
+            self.cancel()
+            raise
+        finally:
+            self.shutdown()
+        return self
+
+    def cancel(self):
+        """
+        Stop the batch: queued datasets are dropped, running workers stop at
+        their next progress report and leave no file. A dataset that got
+        written meanwhile is kept and checkpointed like any other.
+        """
+        self._cancel.set()
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+        self.poll()
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+def bench_batch_export(datasets: int = 8, n: int = 50_000, workers=None) -> dict:
+    """Wall seconds to export `datasets` x `n` tweets with 1..cores worker processes."""
+    cores = os.cpu_count() or 1
+    counts = workers or sorted({1, 2, 4, 8, cores} & set(range(1, cores + 1)) | {1})
+    with tempfile.TemporaryDirectory() as tmp:
+        con = ensure_db(os.path.join(tmp, "bench.sqlite3"))
+        rnd = random.Random(0)
+        ids = []
+        for d in range(datasets):
+            cur = con.cursor()
+            cur.execute("INSERT INTO datasets (name, created_at, total) VALUES (?, '', ?)", (f"ds{d}.csv", n))
+            ds_id = cur.lastrowid
+            ids.append(ds_id)
+            cur.executemany(
+                f"INSERT INTO tweets (dataset_id, idx, text, text_hash, annotated, klimat, klimat_detail) "
+                f"VALUES (?, ?, ?, ?, 1, 1, ?)",
+                ((ds_id, i, f"tweet {d}/{i} " + "lorem ipsum " * 10, f"h{d}-{i}", str(rnd.randrange(4)))
+                 for i in range(n)))
+        con.commit()
+        res = {"datasets": datasets, "tweets_each": n, "cores": cores, "seconds": {}}
+        for w in counts:
+            t0 = time.perf_counter()
+            job = BatchExport(con, ids, os.path.join(tmp, f"out{w}"), workers=w).run()
+            assert not job.failed, job.failed
+            res["seconds"][w] = round(time.perf_counter() - t0, 2)
+        base = res["seconds"][counts[0]]
+        res["speedup"] = {w: round(base / s, 2) for w, s in res["seconds"].items()}
+        con.close()
+    return res
+
+def record_export_checkpoint(con, ds_id, revision, kind, rows, path=None):
+    con.execute(
+        "INSERT INTO export_checkpoints (dataset_id, revision, kind, rows, path, exported_at) VALUES (?, ?, ?, ?, ?, ?)",
+        (ds_id, revision, kind, rows, path, datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
+    )
+    con.commit()
+
+def last_export_revision(con, ds_id) -> int:
+    """Revision of the newest export checkpoint of `ds_id`; -1 if never exported (a first delta is complete)."""
+    r = con.execute("SELECT MAX(revision) FROM export_checkpoints WHERE dataset_id=?", (ds_id,)).fetchone()
+    return -1 if r[0] is None else r[0]
+
+def export_dataset_delta(con, ds_id, out_path, since=None) -> tuple[int, int]:
+    """
+    Write only the tweets of `ds_id` changed after revision `since` (default:
+    the last checkpoint), read through ix_tweets_revision, so the cost follows
+    the number of changes rather than the dataset size. Rows carry idx and
+    revision: merge downstream by (dataset_id, idx), keeping the highest
+    revision. Only answer changes count: viewing a tweet (seen timestamps,
+    time spent) does not put it in a delta, and a delta row carries the
+    timing columns as of the export. The file appears (and the checkpoint is
+    recorded) only once it is complete, so an interrupted export is simply
+    re-run from the same checkpoint. Returns (rows written, revision reached).
+    """
+    since = last_export_revision(con, ds_id) if since is None else since
+    upto = current_revision(con)
+    part = out_path + ".part"
+    n = _write_delta(con, ds_id, part, since, upto)
+    os.replace(part, out_path)
+    record_export_checkpoint(con, ds_id, upto, "delta", n, out_path)
+    return n, upto
+
+def _write_delta(con, ds_id, path, since, upto, progress=None) -> int:
+    n = 0
+    with open(path, "w", encoding="utf-8-sig", newline="") as f:
+        w = csv.writer(f)
+        w.writerow(["dataset_id", "idx", "revision", *SCHEMA.export_headers])
+        cur = con.cursor()
+        cur.execute(SCHEMA.sql_dataset_delta, (ds_id, since, upto))
+        for idx, rev, *rest in cur:
+            r = SCHEMA.Row._make(rest)
+            w.writerow([ds_id, idx, rev, r.text, *_export_values(r)])
+            n += 1
+            if progress and n % EXPORT_PROGRESS_ROWS == 0:
+                progress(n)
+    return n
+
+def dataset_report(con, ds_id) -> dict:
+    """Answer statistics of one dataset: tweets per category, per follow-up option and intent, time spent."""
+    cols = SCHEMA.label_cols
+    total, done, *per_label, time_ms, active_ms = con.execute(
+        f"SELECT COUNT(*), COALESCE(SUM(annotated), 0), {', '.join(f'COALESCE(SUM({c}), 0)' for c in cols)}, "
+        f"COALESCE(SUM(time_spent_ms), 0), COALESCE(SUM(active_ms), 0) FROM tweets WHERE dataset_id=?",
+        (ds_id,)).fetchone()
+    details = {}
+    for topic in SCHEMA.detail_topics:
+        options = DETAIL_QUESTIONS[topic][1]
+        counts = [0] * len(options)
+        for (v,) in con.execute(f"SELECT {topic}_detail FROM tweets WHERE dataset_id=? AND {topic}=1", (ds_id,)):
+            for i in _parse_detail_value(v):
+                if 0 <= i < len(counts):
+                    counts[i] += 1
+        details[SCHEMA.label_names[topic]] = dict(zip(options, counts))
+    intent_opts = INTENT_QUESTION[1]
+    intent = dict.fromkeys(intent_opts, 0)
+    for i, k in con.execute("SELECT intent, COUNT(*) FROM tweets WHERE dataset_id=? AND intent>=0 GROUP BY intent",
+                            (ds_id,)):
+        if i < len(intent_opts):
+            intent[intent_opts[i]] = k
+    return {
+        "dataset": ds_id,
+        "revision": current_revision(con),
+        "total": total,
+        "annotated": done,
+        "labels": {SCHEMA.label_names[c]: n for c, n in zip(cols, per_label)},
+        "details": details,
+        "intent": intent,
+        "time_s": round(time_ms / 1000, 1),
+        "active_s": round(active_ms / 1000, 1),
+    }
+
+def format_dataset_report(rep: dict) -> str:
+    per = rep["active_s"] / rep["annotated"] if rep["annotated"] else 0.0
+    lines = [f"Oznaczone: {rep['annotated']}/{rep['total']} "
+             f"(czas aktywny {rep['active_s'] / 3600:.1f} h, {per:.1f} s na tweet)", ""]
+    lines += [f"{name}: {n}" for name, n in rep["labels"].items()]
+    return "\n".join(lines)
 
 # ---- Multi-select detail helpers ----
 def _parse_detail_value(v) -> set[int]:
@@ -586,8 +2325,1302 @@ def _apply_rules_toggle(current: set[int], toggled: int, options: list[str]) ->
     sel.add(toggled)
     return sel
 
+class AnnotationDraft:
+    """
+    The answers of the tweet on screen as the window sees them. Edits land
+    here first; flush() writes the pending ones with the save helpers,
+    including wiping follow-ups of unticked categories. Rapid mode flushes
+    after a burst of keys, a mouse click right away, and either way the
+    write runs on the DB worker from a take() copy.
+    """
+    def __init__(self, row=None, *, tweet_id=None, labels=None, details=None, intent=-1):
+        if row is not None:
+            tweet_id, labels, details, intent = row.id, SCHEMA.labels_of(row), SCHEMA.details_of(row), row.intent
+        self.tweet_id = tweet_id
+        self.labels = dict(labels)
+        self.details = {col: set(v) for col, v in details.items()}
+        self.intent = int(intent)
+        self._saved_labels = dict(self.labels)
+        self._dirty: set[str] = set()   # "labels", "intent" and/or topic columns
+
+    def take(self) -> "AnnotationDraft":
+        """Copy carrying the pending answers (to flush elsewhere); this draft counts as saved."""
+        snap = AnnotationDraft(tweet_id=self.tweet_id, labels=self.labels, details=self.details, intent=self.intent)
+        snap._saved_labels = self._saved_labels
+        snap._dirty = self._dirty
+        self._saved_labels = dict(self.labels)
+        self._dirty = set()
+        return snap
+
+    def resume(self) -> "AnnotationDraft":
+        """Fresh draft with these answers, as if they were already saved (a write still in flight)."""
+        return AnnotationDraft(tweet_id=self.tweet_id, labels=self.labels, details=self.details, intent=self.intent)
+
+    @property
+    def dirty(self) -> bool:
+        return bool(self._dirty)
+
+    def set_label(self, col: str, on: bool):
+        self.labels[col] = on
+        if not on:
+            if col == "inne":
+                self.intent = -1
+            elif col in DETAIL_QUESTIONS:
+                self.details[col] = set()
+        self._dirty.add("labels")
+
+    def set_detail(self, col: str, selected: set[int]):
+        self.details[col] = set(selected)
+        self._dirty.add(col)
+
+    def set_intent(self, idx: int):
+        self.intent = idx
+        self._dirty.add("intent")
+
+    def missing_followup(self):
+        """Panel key ('intent' or a topic column) of the first unanswered follow-up, or None."""
+        for col in DETAIL_QUESTIONS:
+            if self.labels.get(col) and not self.details.get(col):
+                return col
+        if self.labels.get("inne") and self.intent < 0:
+            return "intent"
+        return None
+
+    def flush(self, con) -> int:
+        """Write pending answers; returns how many tweets were saved (with duplicates)."""
+        n = 0
+        if "labels" in self._dirty:
+            n = save_labels_for(con, self.tweet_id, self.labels, mark_annotated=True)
+            for col, was in self._saved_labels.items():
+                if was and not self.labels[col]:
+                    if col == "inne":
+                        clear_intent(con, self.tweet_id)
+                    elif col in DETAIL_QUESTIONS:
+                        clear_detail(con, self.tweet_id, col)
+            self._saved_labels = dict(self.labels)
+        for col in DETAIL_QUESTIONS:
+            if col in self._dirty and self.labels.get(col):
+                n = max(n, save_detail(con, self.tweet_id, col, self.details[col]))
+        if "intent" in self._dirty and self.labels.get("inne") and self.intent >= 0:
+            n = max(n, save_intent(con, self.tweet_id, self.intent))
+        self._dirty.clear()
+        return n
+
+class DbWorker(QObject):
+    """
+    Single owner thread for the window's routine DB work: saves, timing,
+    cursor and progress counts. Jobs run in submission order on the worker's
+    own connection, so the writes for a tweet land in the order they were
+    made and a read queued after them sees them. Each job's `then` gets its
+    result on the GUI thread; a job that raised goes to its `fail` or, without
+    one, to `failed`. drain() waits for the queue (operations that read or
+    write on the GUI connection call it first). The DB is in WAL mode (see
+    ensure_db), so reads on the GUI connection never wait for the worker's
+    transactions. `latency_s` makes every job hold an exclusive lock that long
+    before it runs, to model a slow commit or a lock wait. With `readonly`
+    (exports, reports) the connection is read-only and each job runs in its
+    own read transaction: one snapshot per job, released as soon as it
+    returns.
+    """
+    failed = Signal(str)
+    _finished = Signal(object, object, object, object)   # then, fail, result, exception
+
+    def __init__(self, db_path: str, latency_s: float = 0.0, parent=None, *, readonly: bool = False):
+        super().__init__(parent)
+        self.db_path = db_path
+        self.readonly = readonly
+        self.latency_s = latency_s
+        self.pending = 0
+        self._con = None   # opened and used on the worker thread only
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="db")
+        self._finished.connect(self._deliver)   # emitted on the worker: queued to the GUI thread
+
+    def submit(self, fn, *args, then=None, fail=None):
+        """Queue fn(con, *args); returns its Future. `fail` gets the error message."""
+        self.pending += 1
+        return self._executor.submit(self._run, fn, args, then, fail)
+
+    def _run(self, fn, args, then, fail):
+        if self._con is None:
+            if self.readonly:
+                self._con = connect_db(self.db_path, readonly=True, timeout=30, isolation_level=None)
+            else:
+                self._con = connect_db(self.db_path, timeout=30)
+        try:
+            if self.readonly:
+                self._con.execute("BEGIN")
+            elif self.latency_s:
+                # the lock a slow commit holds (readers wait on it unless in WAL);
+                # the job's own writes join this transaction
+                self._con.execute("BEGIN EXCLUSIVE")
+            if self.latency_s:
+                time.sleep(self.latency_s)
+            result, error = fn(self._con, *args), None
+            if not self.readonly and self._con.in_transaction:
+                self._con.commit()   # a read-only job under latency_s
+        except Exception as e:
+            result, error = None, e
+        if self.readonly or error is not None:
+            self._con.rollback()
+        self._finished.emit(then, fail, result, error)
+        return result
+
+    def _deliver(self, then, fail, result, error):
+        self.pending -= 1
+        if error is not None:
+            msg = f"{type(error).__name__}: {error}"
+            if fail is not None:
+                fail(msg)
+            else:
+                self.failed.emit(msg)
+        elif then is not None:
+            then(result)
+
+    def drain(self):
+        """Block until the queue is empty and every `then` was called (they may queue more)."""
+        while self._executor is not None and self.pending:
+            self._executor.submit(lambda: None).result()
+            QApplication.sendPostedEvents(self, QEvent.MetaCall)
+
+    def shutdown(self):
+        """Finish the queue (nothing queued is dropped) and close the connection."""
+        if self._executor is None:
+            return
+        self.drain()
+        self._executor.submit(lambda: self._con is not None and self._con.close()).result()
+        self._executor.shutdown(wait=True)
+        self._executor = None
+
+
+# ================== Keyword pre-labeling ==================
+class KeywordMatcher:
+    """
+    Aho-Corasick automaton over all lexicon prefixes: one pass over the
+    lower-cased text finds every keyword of every label. A keyword only
+    counts when it starts a word (it may end mid-word, so stems match
+    inflected forms).
+    """
+    def __init__(self, lexicon: dict[str, list[str]]):
+        self.goto: list[dict[str, int]] = [{}]
+        self.fail: list[int] = [0]
+        self.out: list[list[tuple[int, str]]] = [[]]   # (keyword length, label col)
+        for col, words in lexicon.items():
+            for w in words:
+                w = w.lower()
+                if not w:
+                    continue
+                node = 0
+                for ch in w:
+                    nxt = self.goto[node].get(ch)
+                    if nxt is None:
+                        nxt = len(self.goto)
+                        self.goto[node][ch] = nxt
+                        self.goto.append({}); self.fail.append(0); self.out.append([])
+                    node = nxt
+                self.out[node].append((len(w), col))
+        # breadth-first failure links
+        queue = list(self.goto[0].values())
+        for node in queue:
+            for ch, nxt in self.goto[node].items():
+                queue.append(nxt)
+                f = self.fail[node]
+                while f and ch not in self.goto[f]:
+                    f = self.fail[f]
+                cand = self.goto[f].get(ch, 0)
+                self.fail[nxt] = cand if cand != nxt else 0
+                self.out[nxt] = self.out[nxt] + self.out[self.fail[nxt]]
+
+    def finditer(self, text: str):
+        """Yield (start, end, label col) for every word-initial keyword hit."""
+        goto, fail, out = self.goto, self.fail, self.out
+        low = text.lower()
+        node = 0
+        for i, ch in enumerate(low):
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            for length, col in out[node]:
+                start = i + 1 - length
+                if start == 0 or not low[start - 1].isalnum():
+                    yield start, i + 1, col
+
+    def labels(self, text: str) -> set[str]:
+        return {col for _, _, col in self.finditer(text)}
+
+def load_lexicon() -> dict[str, list[str]]:
+    """LEXICON, overridden per label by LEXICON_PATH when present."""
+    lexicon = dict(LEXICON)
+    if os.path.exists(LEXICON_PATH):
+        with open(LEXICON_PATH, "r", encoding="utf-8") as f:
+            custom = json.load(f)
+        valid = {col for _, col in LABELS}
+        lexicon.update({k: list(v) for k, v in custom.items() if k in valid})
+    return lexicon
+
+def _suggested_mask(cols: set[str]) -> int:
+    return sum(1 << i for i, (_, col) in enumerate(LABELS) if col in cols)
+
+def _suggested_cols(mask: int) -> set[str]:
+    return {col for i, (_, col) in enumerate(LABELS) if mask >> i & 1}
+
+def prelabel_dataset(con, ds_id, matcher: KeywordMatcher = None, batch: int = 5000) -> int:
+    """Store keyword-suggested tiles for every tweet of `ds_id`; returns how many got any."""
+    matcher = matcher or KeywordMatcher(load_lexicon())
+    cur = con.cursor()
+    wcur = con.cursor()
+    hits = 0
+    last_id = 0
+    while True:
+        cur.execute(
+            f"SELECT id, {TEXT_SQL} FROM tweets WHERE dataset_id=? AND id>? ORDER BY id LIMIT ?",
+            (ds_id, last_id, batch)
+        )
+        rows = cur.fetchall()
+        if not rows:
+            break
+        updates = [(_suggested_mask(matcher.labels(t)), i) for i, t in rows]
+        hits += sum(1 for m, _ in updates if m)
+        wcur.executemany("UPDATE tweets SET suggested=? WHERE id=?", updates)
+        con.commit()
+        last_id = rows[-1][0]
+    return hits
+
+def bench_prelabel(n: int = 100_000, seed: int = 0) -> dict:
+    """Tweets/s of the automaton vs. one compiled regex per keyword, on synthetic tweets."""
+    rnd = random.Random(seed)
+    lexicon = load_lexicon()
+    keywords = [w for words in lexicon.values() for w in words]
+    filler = ["dzisiaj", "jest", "bardzo", "ważne", "że", "wszyscy", "mówią", "o", "tym", "w", "Polsce"]
+    texts = []
+    for _ in range(n):
+        words = [rnd.choice(filler) for _ in range(rnd.randint(10, 30))]
+        for _ in range(rnd.randint(0, 2)):
+            words.insert(rnd.randrange(len(words) + 1), rnd.choice(keywords) + "ami")
+        texts.append(" ".join(words))
+
+    matcher = KeywordMatcher(lexicon)
+    t0 = time.perf_counter()
+    for t in texts:
+        matcher.labels(t)
+    t_ac = time.perf_counter() - t0
+
+    patterns = [(col, re.compile(r"(?<!\w)" + re.escape(w), re.IGNORECASE))
+                for col, words in lexicon.items() for w in words]
+    sample = texts[: max(1, n // 10)]
+    t0 = time.perf_counter()
+    for t in sample:
+        {col for col, rx in patterns if rx.search(t)}
+    t_rx = (time.perf_counter() - t0) * (n / len(sample))
+
+    return {
+        "tweets": n,
+        "keywords": len(keywords),
+        "aho_corasick_tweets_per_s": round(n / t_ac),
+        "regex_per_keyword_tweets_per_s": round(n / t_rx),
+    }
+
+
+# ================== Active learning ==================
+# A hashed TF-IDF + one-vs-rest logistic regression, trained in a worker
+# process. Everything here runs without Qt so it can live in a process pool.
+
+def _al_featurize(texts: list[str], idf=None):
+    """
+    Sparse hashed TF-IDF as flat arrays (cols, vals, rows, n_docs).
+    Without `idf`, it is computed from `texts` and returned as well.
+    """
+    cols, counts, rows = [], [], []
+    for r, text in enumerate(texts):
+        tf: dict[int, int] = {}
+        for tok in re.findall(r"\w+", text.lower()):
+            h = zlib.crc32(tok.encode("utf-8")) & (AL_N_FEATURES - 1)
+            tf[h] = tf.get(h, 0) + 1
+        cols.extend(tf.keys()); counts.extend(tf.values()); rows.extend([r] * len(tf))
+    n = len(texts)
+    cols = np.asarray(cols, dtype=np.int64)
+    rows = np.asarray(rows, dtype=np.int64)
+    vals = 1.0 + np.log(np.asarray(counts, dtype=np.float64))
+    if idf is None:
+        df = np.bincount(cols, minlength=AL_N_FEATURES)
+        idf = np.log((1.0 + n) / (1.0 + df)) + 1.0
+    vals *= idf[cols]
+    norms = np.sqrt(np.bincount(rows, weights=vals * vals, minlength=n))
+    vals /= np.where(norms > 0, norms, 1.0)[rows]
+    return (cols, vals, rows, n), idf
+
+def _al_logits(X, w, b):
+    cols, vals, rows, n = X
+    return np.bincount(rows, weights=w[cols] * vals, minlength=n) + b
+
+def _al_fit(X, Y, W, B, epochs=AL_FIRST_EPOCHS, lr=2.0, l2=1e-4):
+    """Gradient descent on the batch X, warm-started from (W, B)."""
+    cols, vals, rows, n = X
+    for k in range(Y.shape[1]):
+        for _ in range(epochs):
+            p = 1.0 / (1.0 + np.exp(-_al_logits(X, W[k], B[k])))
+            err = (p - Y[:, k]) / n
+            grad = np.bincount(cols, weights=vals * err[rows], minlength=AL_N_FEATURES)
+            W[k] -= lr * (grad + l2 * W[k])
+            B[k] -= lr * err.sum()
+    return W, B
+
+def al_retrain(db_path: str, ds_id: int, state=None):
+    """
+    Worker entry point, incremental. Warm-start the model in `state` on the
+    answers saved since it was trained (revision above state["revision"];
+    all of them on the first run), then re-score a bounded candidate set:
+    the tweets holding a priority now plus AL_SCORE_BATCH unannotated ones
+    from a random position. Only the AL_TOP_K most uncertain keep a
+    priority; the rest of the dataset is neither read nor written.
+    Returns the new state, or None when there is not enough data yet.
+    """
+    con = connect_db(db_path, timeout=30)
+    try:
+        cur = con.cursor()
+        upto = current_revision(con)
+        label_cols = ", ".join(SCHEMA.label_cols)
+        cur.execute(f"SELECT {TEXT_SQL}, {label_cols} FROM tweets "
+                    f"WHERE dataset_id=? AND annotated=1 AND revision>? AND revision<=?",
+                    (ds_id, state["revision"] if state else -1, upto))
+        train = cur.fetchall()
+        if state is None and len(train) < AL_MIN_TRAIN:
+            return None
+
+        cur.execute(f"SELECT id, {TEXT_SQL} FROM tweets WHERE dataset_id=? AND annotated=0 AND priority IS NOT NULL "
+                    f"ORDER BY priority DESC LIMIT ?", (ds_id, AL_TOP_K))
+        held = dict(cur.fetchall())
+        total = con.execute("SELECT total FROM datasets WHERE id=?", (ds_id,)).fetchone()[0] or 0
+        start = random.randrange(total) if total else 0
+        fresh = {}
+        for lo, hi in ((start, total), (0, start)):   # wraps around to fill the batch
+            cur.execute(f"SELECT id, {TEXT_SQL} FROM tweets WHERE dataset_id=? AND annotated=0 "
+                        f"AND idx>=? AND idx<? ORDER BY idx LIMIT ?",
+                        (ds_id, lo, hi, AL_SCORE_BATCH - len(fresh)))
+            fresh.update(cur.fetchall())
+        cand = {**fresh, **held}
+
+        if state is None:
+            # idf from the first answers and a slice of the dataset, fixed from then on
+            _, idf = _al_featurize([r[0] for r in train] + list(fresh.values()))
+            W, B = np.zeros((len(LABELS), AL_N_FEATURES)), np.zeros(len(LABELS))
+            epochs = AL_FIRST_EPOCHS
+        else:
+            W, B, idf = state["W"], state["B"], state["idf"]
+            epochs = AL_DELTA_EPOCHS
+        if train:
+            X, _ = _al_featurize([r[0] for r in train], idf)
+            Y = np.asarray([[1.0 if v else 0.0 for v in r[1:]] for r in train])
+            W, B = _al_fit(X, Y, W, B, epochs=epochs)
+
+        if cand:
+            ids = list(cand)
+            Xs, _ = _al_featurize(list(cand.values()), idf)
+            # margin uncertainty, averaged over labels: 1 at p=0.5, 0 at p in {0,1}
+            unc = np.zeros(len(ids))
+            for k in range(len(LABELS)):
+                p = 1.0 / (1.0 + np.exp(-_al_logits(Xs, W[k], B[k])))
+                unc += 1.0 - np.abs(2.0 * p - 1.0)
+            unc /= len(LABELS)
+            top = np.argsort(-unc)[:AL_TOP_K]
+            keep = {ids[i] for i in top}
+            cur.executemany("UPDATE tweets SET priority=NULL WHERE id=?", ((i,) for i in held if i not in keep))
+            cur.executemany("UPDATE tweets SET priority=? WHERE id=?", ((float(unc[i]), ids[i]) for i in top))
+            con.commit()
+        return {"W": W, "B": B, "idf": idf, "revision": upto}
+    finally:
+        con.close()
+
+class ActiveLearner:
+    """
+    GUI-side handle for background retraining: at most one job in flight,
+    a retrain requested meanwhile is queued as 'dirty'. Call poll() from a
+    timer on the GUI thread; it returns True when fresh priorities landed.
+    """
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self.ds_id = None
+        self.state = None
+        self.future = None
+        self._future_ds = None
+        self.dirty = False
+        self.pending = 0
+        self._executor = None
+
+    @staticmethod
+    def available() -> bool:
+        return np is not None
+
+    def reset(self, ds_id, state=None):
+        self.ds_id = ds_id
+        self.state = state
+        self.pending = 0
+        self.dirty = self.future is not None
+
+    def note_saved(self):
+        self.pending += 1
+        if self.pending >= AL_RETRAIN_EVERY:
+            self.request()
+
+    def request(self):
+        if not self.available() or self.ds_id is None:
+            return
+        self.pending = 0
+        if self.future is not None:
+            self.dirty = True
+            return
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=1)
+        self.dirty = False
+        self.future = self._executor.submit(al_retrain, self.db_path, self.ds_id, self.state)
+        self._future_ds = self.ds_id
+
+    def poll(self) -> bool:
+        if self.future is None or not self.future.done():
+            return False
+        fut, self.future = self.future, None
+        try:
+            result = fut.result()
+        except Exception:
+            result = None
+        fresh = self._future_ds == self.ds_id
+        if fresh and result is not None:
+            self.state = result
+        if self.dirty:
+            self.request()
+        return fresh and result is not None
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+# ================== Backups ==================
+_BACKUP_RE = re.compile(r"^(?P<stem>.+)-(?P<ts>\d{8}-\d{6})(?:-\d+)?\.sqlite3$")
+
+class _BackupStarved(Exception):
+    pass
+
+def backup_db(db_path=None, dest_dir=None, *, pages=BACKUP_PAGES_PER_STEP, progress=None) -> str:
+    """
+    Online snapshot of `db_path` into dest_dir/<name>-YYYYmmdd-HHMMSS.sqlite3
+    with the SQLite backup API, `pages` pages per step. Safe while the app
+    writes: the copy is a consistent image of one moment (SQLite restarts
+    it if another connection writes mid-way; after BACKUP_MAX_RESTARTS it
+    copies in a single step instead). Written to a .part file and renamed
+    only after a quick_check, so a snapshot on disk is never torn.
+    Out-of-DB text stores (texts/*.blob) are not copied: they never change
+    after the import, and sweep_text_stores keeps an archived dataset's blob
+    for as long as a snapshot in `dest_dir` still reads it.
+    """
+    db_path = db_path or DB_PATH
+    dest_dir = dest_dir or BACKUP_DIR
+    os.makedirs(dest_dir, exist_ok=True)
+    stem = os.path.splitext(os.path.basename(db_path))[0]
+    base = os.path.join(dest_dir, f"{stem}-{datetime.now():%Y%m%d-%H%M%S}")
+    final, n = base + ".sqlite3", 0
+    while os.path.exists(final):
+        n += 1
+        final = f"{base}-{n}.sqlite3"
+    part = final + ".part"
+    restarts, last = 0, [None]
+
+    def on_step(status, remaining, total):
+        nonlocal restarts
+        if last[0] is not None and remaining > last[0]:
+            restarts += 1  # a write on another connection restarted the copy
+            if restarts > BACKUP_MAX_RESTARTS:
+                raise _BackupStarved()
+        last[0] = remaining
+        if progress is not None:
+            progress(status, remaining, total)
+
+    try:
+        with closing(sqlite3.connect(db_path, timeout=30)) as src, closing(sqlite3.connect(part)) as dst:
+            try:
+                src.backup(dst, pages=pages, progress=on_step, sleep=0.005)
+            except _BackupStarved:
+                src.backup(dst)
+            check = dst.execute("PRAGMA quick_check").fetchone()[0]
+        if check != "ok":
+            raise sqlite3.DatabaseError(f"Kopia zapasowa uszkodzona: {check}")
+        os.replace(part, final)
+    finally:
+        if os.path.exists(part):
+            os.remove(part)
+    return final
+
+def list_backups(dest_dir=None, db_path=None) -> list[tuple[str, datetime]]:
+    """Snapshots of `db_path` in `dest_dir` as (path, taken at), newest first."""
+    dest_dir = dest_dir or BACKUP_DIR
+    stem = os.path.splitext(os.path.basename(db_path or DB_PATH))[0]
+    if not os.path.isdir(dest_dir):
+        return []
+    out = []
+    for name in os.listdir(dest_dir):
+        m = _BACKUP_RE.match(name)
+        if m and m["stem"] == stem:
+            out.append((os.path.join(dest_dir, name), datetime.strptime(m["ts"], "%Y%m%d-%H%M%S")))
+    out.sort(key=lambda r: (r[1], r[0]), reverse=True)
+    return out
+
+def prune_backups(dest_dir=None, db_path=None, *, keep=BACKUP_KEEP, keep_daily=BACKUP_KEEP_DAILY) -> list[str]:
+    """
+    Retention: the `keep` newest snapshots, plus the newest snapshot of each
+    of the `keep_daily` most recent days that have one. Deletes the rest
+    (and stale .part files) and returns the removed paths.
+    """
+    dest_dir = dest_dir or BACKUP_DIR
+    snaps = list_backups(dest_dir, db_path)
+    kept = {p for p, _ in snaps[:keep]}
+    days = set()
+    for p, ts in snaps:
+        if ts.date() not in days and len(days) < keep_daily:
+            days.add(ts.date())
+            kept.add(p)
+    removed = [p for p, _ in snaps if p not in kept]
+    if os.path.isdir(dest_dir):
+        removed += [os.path.join(dest_dir, n) for n in os.listdir(dest_dir) if n.endswith(".sqlite3.part")]
+    for p in removed:
+        os.remove(p)
+    sweep_text_stores(db_path, dest_dir)
+    return removed
+
+def _mmap_in_use(db_file) -> set[int]:
+    """Datasets that `db_file` (the live DB or a snapshot) reads from texts/ds_<id>.blob."""
+    # older snapshots may predate archiving (archive_path) or text stores altogether
+    for sql in ("SELECT id FROM datasets WHERE text_store='mmap' AND archive_path IS NULL",
+                "SELECT id FROM datasets WHERE text_store='mmap'"):
+        try:
+            with closing(connect_db(db_file, readonly=True)) as c:
+                return {r[0] for r in c.execute(sql)}
+        except sqlite3.OperationalError:
+            continue
+    return set()
+
+def sweep_text_stores(db_path=None, dest_dir=None) -> list[str]:
+    """
+    Remove the blob (and offsets) files of archived datasets once no
+    snapshot in `dest_dir` still reads them: restoring a snapshot brings
+    back the mmap datasets it holds, blobs included. Called after archiving
+    and after each prune; returns the removed paths.
+    """
+    db_path = db_path or DB_PATH
+    texts_dir = _texts_dir(db_path)
+    if not os.path.isdir(texts_dir):
+        return []
+    with closing(connect_db(db_path, readonly=True)) as c:
+        archived = [r[0] for r in c.execute("SELECT id FROM datasets WHERE archive_path IS NOT NULL")]
+    stale = [ds_id for ds_id in archived if os.path.exists(TextStore.path_for(texts_dir, ds_id))]
+    if not stale:
+        return []
+    needed = set().union(*(_mmap_in_use(p) for p, _ in list_backups(dest_dir, db_path)))
+    removed = []
+    for ds_id in stale:
+        if ds_id in needed:
+            continue
+        blob = TextStore.path_for(texts_dir, ds_id)
+        with _text_lock:
+            store = TextStore._open.get(blob)
+            if store is not None:
+                store.close()
+        for f in (blob, blob + ".off"):
+            if os.path.exists(f):
+                os.remove(f)
+                removed.append(f)
+    return removed
+
+def backup_and_prune(db_path=None, dest_dir=None) -> str:
+    path = backup_db(db_path, dest_dir)
+    prune_backups(dest_dir, db_path)
+    return path
+
+def restore_backup(con, backup_path, dest_dir=None) -> str:
+    """
+    Replace the contents of the live DB behind `con` with `backup_path`,
+    page by page through the backup API (other handles stay valid). The
+    current state is snapshotted first; returns that snapshot's path so a
+    restore can itself be undone. Close other connections (the learner)
+    beforehand, or the restore waits for their locks.
+    """
+    db_path = _db_path(con)
+    texts_dir = _texts_dir(db_path)
+    missing = sorted(ds_id for ds_id in _mmap_in_use(backup_path)
+                     if not os.path.exists(TextStore.path_for(texts_dir, ds_id)))
+    if missing:
+        raise FileNotFoundError("Kopia zapasowa wymaga plików tekstów, których już nie ma "
+                                f"(zbiory: {', '.join(f'#{i}' for i in missing)}).")
+    with closing(sqlite3.connect(backup_path)) as src:
+        check = src.execute("PRAGMA quick_check").fetchone()[0]
+        if check != "ok":
+            raise sqlite3.DatabaseError(f"Kopia zapasowa uszkodzona: {check}")
+        con.commit()
+        before = backup_db(db_path, dest_dir)
+        src.backup(con)
+    # text caches are keyed by dataset/tweet ids, which the restore may reuse
+    with _text_lock:
+        for key in [k for k in _codecs if k[0] == db_path]:
+            del _codecs[key]
+        for key in [k for k in _text_lru if k[0] == db_path]:
+            del _text_lru[key]
+        for path, store in list(TextStore._open.items()):
+            if os.path.dirname(path) == texts_dir:
+                store.close()
+    return before
+
+def check_backup_under_writes(seconds: float = 3.0, n: int = 20_000) -> dict:
+    """
+    Snapshot a DB that a second thread keeps annotating, then verify each
+    snapshot: quick_check passes and the trigger-maintained datasets.done
+    equals the annotated rows it holds (a torn copy would break that).
+    """
+    with tempfile.TemporaryDirectory() as tmp:
+        db = os.path.join(tmp, "live.sqlite3")
+        con = ensure_db(db)
+        cur = con.cursor()
+        cur.execute("INSERT INTO datasets (name, created_at, total) VALUES ('check', '', ?)", (n,))
+        ds_id = cur.lastrowid
+        cur.executemany("INSERT INTO tweets (dataset_id, idx, text, text_hash) VALUES (?, ?, ?, ?)",
+                        ((ds_id, i, f"tweet {i} " + "x" * 200, f"h{i}") for i in range(n)))
+        con.commit()
+        con.close()
+
+        stop = threading.Event()
+        writes = [0]
+
+        def writer():
+            with closing(connect_db(db, timeout=30)) as w:
+                rnd = random.Random(0)
+                while not stop.is_set():
+                    ids = [rnd.randrange(1, n + 1) for _ in range(50)]
+                    w.executemany("UPDATE tweets SET annotated=1 - annotated, klimat=1 WHERE id=?",
+                                  [(i,) for i in ids])
+                    w.commit()
+                    writes[0] += 1
+
+        t = threading.Thread(target=writer)
+        t.start()
+        snaps, t0 = [], time.perf_counter()
+        try:
+            while time.perf_counter() - t0 < seconds:
+                snaps.append(backup_db(db, os.path.join(tmp, "backups"), pages=64))
+        finally:
+            stop.set()
+            t.join()
+
+        bad = []
+        for p in snaps:
+            with closing(sqlite3.connect(p)) as c:
+                ok = c.execute("PRAGMA quick_check").fetchone()[0] == "ok"
+                done = c.execute("SELECT done FROM datasets WHERE id=?", (ds_id,)).fetchone()[0]
+                real = c.execute("SELECT COUNT(*) FROM tweets WHERE dataset_id=? AND annotated=1",
+                                 (ds_id,)).fetchone()[0]
+            if not ok or done != real:
+                bad.append(os.path.basename(p))
+        return {"snapshots": len(snaps), "writer_commits": writes[0], "inconsistent": bad}
+
+def check_export_under_writes(seconds: float = 3.0, n: int = 20_000) -> dict:
+    """
+    Export (full and delta, alternately) from read snapshots while a second
+    thread keeps writing, then verify each file against the snapshot it
+    claims: a full export has every row and its newest change is exactly
+    the snapshot revision; both rows of a pair, always written in the same
+    transaction, agree; delta rows lie in (since, revision]. Also reports
+    how long the writer's commits took and whether a checkpoint afterwards
+    gets through the whole WAL (no snapshot left holding it back).
+    """
+    with tempfile.TemporaryDirectory() as tmp:
+        db = os.path.join(tmp, "live.sqlite3")
+        con = ensure_db(db)
+        cur = con.cursor()
+        cur.execute("INSERT INTO datasets (name, created_at, total) VALUES ('check', '', ?)", (n,))
+        ds_id = cur.lastrowid
+        cur.executemany("INSERT INTO tweets (dataset_id, idx, text, text_hash) VALUES (?, ?, ?, ?)",
+                        ((ds_id, i, f"tweet {i} " + "x" * 200, f"h{i}") for i in range(n)))
+        con.commit()
+        con.close()
+
+        half = n // 2
+        stop = threading.Event()
+        commit_ms = []
+
+        def writer():
+            # each commit stamps one pair (a, a + n/2) with its revision, in time_spent_ms too
+            with closing(connect_db(db, timeout=30)) as w:
+                rnd = random.Random(0)
+                while not stop.is_set():
+                    a = rnd.randrange(half)
+                    t0 = time.perf_counter()
+                    wc = w.cursor()
+                    _bump_revision(wc)
+                    wc.execute(f"UPDATE tweets SET time_spent_ms={REVISION_SQL}, revision={REVISION_SQL} "
+                               f"WHERE dataset_id=? AND idx IN (?, ?)", (ds_id, a, a + half))
+                    w.commit()
+                    commit_ms.append((time.perf_counter() - t0) * 1000)
+
+        t = threading.Thread(target=writer)
+        t.start()
+        exports, bad, since, t0 = 0, [], 0, time.perf_counter()
+        try:
+            while time.perf_counter() - t0 < seconds:
+                delta = exports % 2 == 1
+                out = os.path.join(tmp, f"export_{exports}.csv")
+                with read_snapshot(db) as rc:
+                    rows, rev = export_snapshot(rc, ds_id, out, since if delta else None)
+                with open(out, encoding="utf-8-sig", newline="") as f:
+                    body = list(csv.reader(f))[1:]
+                if delta:
+                    revs = {}  # pair -> revisions of its rows (dataset_id, idx, revision, ...)
+                    for r in body:
+                        revs.setdefault(int(r[1]) % half, []).append(int(r[2]))
+                    ok = (len(body) == rows and all(since < v <= rev for vs in revs.values() for v in vs)
+                          and all(len(vs) == 2 and vs[0] == vs[1] for vs in revs.values()))
+                    since = rev
+                else:
+                    col = SCHEMA.export_headers.index("Czas_s")
+                    ms = [round(float(r[col]) * 1000) for r in body]
+                    ok = (rows == len(body) == n and max(ms) == rev
+                          and all(ms[i] == ms[i + half] for i in range(half)))
+                if not ok:
+                    bad.append(os.path.basename(out))
+                exports += 1
+        finally:
+            stop.set()
+            t.join()
+
+        with closing(connect_db(db)) as c:
+            busy, log, moved = c.execute("PRAGMA wal_checkpoint(PASSIVE)").fetchone()
+        commit_ms.sort()
+        pick = lambda q: round(commit_ms[min(len(commit_ms) - 1, int(q * len(commit_ms)))], 2) if commit_ms else None
+        return {"exports": exports, "writer_commits": len(commit_ms),
+                "writer_commit_ms": {"p50": pick(0.5), "p95": pick(0.95), "max": pick(1.0)},
+                "inconsistent": bad, "checkpoint_complete": not busy and log == moved}
+
+class BackupScheduler:
+    """
+    GUI-side handle for automatic snapshots on a worker thread: at most one
+    backup in flight. Call tick() from a timer; it starts a backup when the
+    newest snapshot is older than the interval, and returns the finished
+    job's result (path or exception) once.
+    """
+    def __init__(self, db_path: str, dest_dir=None):
+        self.db_path = db_path
+        self.dest_dir = dest_dir or BACKUP_DIR
+        self.future = None
+        self._executor = None
+        newest = list_backups(self.dest_dir, db_path)
+        self.last_at = newest[0][1] if newest else None
+
+    def due(self, every_min=BACKUP_EVERY_MIN) -> bool:
+        return self.last_at is None or (datetime.now() - self.last_at).total_seconds() >= every_min * 60
+
+    def start(self) -> bool:
+        if self.future is not None:
+            return False
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="backup")
+        self.last_at = datetime.now()  # also spaces out retries after a failure
+        self.future = self._executor.submit(backup_and_prune, self.db_path, self.dest_dir)
+        return True
+
+    def tick(self, auto: bool = True):
+        if self.future is None:
+            if auto and self.due():
+                self.start()
+            return None
+        if not self.future.done():
+            return None
+        fut, self.future = self.future, None
+        try:
+            return fut.result()
+        except Exception as e:
+            return e
+
+    def shutdown(self):
+        # a running snapshot finishes (it is only renamed into place when complete)
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+# ================== Archive & maintenance ==================
+def _archive_path(ds_id, archive_dir=None) -> str:
+    return os.path.join(archive_dir or ARCHIVE_DIR, f"ds_{ds_id}.sqlite3")
+
+def _table_columns(con, table, schema="main") -> list[str]:
+    return [r[1] for r in con.execute(f"PRAGMA {schema}.table_info({table})")]
+
+def _db_bytes(con) -> int:
+    return con.execute("PRAGMA page_count").fetchone()[0] * con.execute("PRAGMA page_size").fetchone()[0]
+
+def _copy_to_memory(con, schema, ds_id):
+    """Answers of the annotated tweets of `ds_id` in `schema` (main or an attached archive) into annotation_memory."""
+    cols = ", ".join(("id", "dataset_id", "text_hash") + SCHEMA.answer_cols)
+    con.execute(f"INSERT OR REPLACE INTO main.annotation_memory ({cols}) "
+                f"SELECT {cols} FROM {schema}.tweets WHERE dataset_id=? AND annotated=1", (ds_id,))
+
+def _remember_archived(con, ds_id, path):
+    con.commit()
+    con.execute("ATTACH DATABASE ? AS arc", (path,))
+    try:
+        _copy_to_memory(con, "arc", ds_id)
+        con.commit()
+    except Exception:
+        con.rollback()
+        raise
+    finally:
+        con.execute("DETACH DATABASE arc")
+
+def archive_dataset(con, ds_id, archive_dir=None, backup_dir=None) -> str:
+    """
+    Move an exported dataset's tweets (and its text dictionary) into
+    archive/ds_<id>.sqlite3: ATTACH, set-based copies committed to the
+    archive first, then one DELETE (a transaction spanning both files is
+    not atomic under WAL; after a crash in between the tweets are still in
+    the hot DB and the next run rebuilds the archive). The datasets row
+    stays behind with archive_path set, so the dataset is still listed and
+    can be restored.
+    Texts of mmap datasets are inlined into the archive; the blob files go
+    once no snapshot in `backup_dir` reads them (sweep_text_stores). The answers of annotated tweets stay in annotation_memory, so
+    new datasets still reuse them.
+    """
+    row = con.execute("SELECT exported, archive_path, text_store FROM datasets WHERE id=?", (ds_id,)).fetchone()
+    if not row:
+        raise ValueError(f"Brak zbioru #{ds_id}.")
+    exported, archived, text_store = row
+    if archived:
+        return archived
+    if not exported:
+        raise ValueError("Archiwizować można tylko wyeksportowane zbiory.")
+    path = _archive_path(ds_id, archive_dir)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    if os.path.exists(path):
+        os.remove(path)  # left over from an archive that was restored later
+    select = ", ".join(f"{TEXT_SQL} AS text" if c == "text" and text_store == "mmap" else c
+                       for c in _table_columns(con, "tweets"))
+    con.commit()
+    con.execute("ATTACH DATABASE ? AS arc", (path,))
+    try:
+        con.execute("BEGIN")
+        con.execute("CREATE TABLE arc.datasets AS SELECT * FROM main.datasets WHERE id=?", (ds_id,))
+        con.execute(f"CREATE TABLE arc.tweets AS SELECT {select} FROM main.tweets WHERE dataset_id=? ORDER BY idx",
+                    (ds_id,))
+        con.execute("CREATE TABLE arc.text_dicts AS SELECT * FROM main.text_dicts WHERE dataset_id=?", (ds_id,))
+        if text_store == "mmap":
+            con.execute("UPDATE arc.datasets SET text_store='inline'")
+        con.commit()
+        con.execute("BEGIN")
+        _copy_to_memory(con, "main", ds_id)
+        con.execute("DELETE FROM main.text_dicts WHERE dataset_id=?", (ds_id,))
+        con.execute("DELETE FROM main.tweets WHERE dataset_id=?", (ds_id,))
+        con.execute("UPDATE main.datasets SET archive_path=? WHERE id=?", (path, ds_id))
+        con.commit()
+    except Exception:
+        con.rollback()
+        raise
+    finally:
+        con.execute("DETACH DATABASE arc")
+    if text_store == "mmap":
+        sweep_text_stores(_db_path(con), backup_dir)
+    return path
+
+def restore_archived_dataset(con, ds_id):
+    """Bring an archived dataset's tweets back into the hot DB (same ids) and drop the archive file."""
+    row = con.execute("SELECT archive_path FROM datasets WHERE id=?", (ds_id,)).fetchone()
+    if not row or not row[0]:
+        raise ValueError(f"Zbiór #{ds_id} nie jest zarchiwizowany.")
+    path = row[0]
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"Brak pliku archiwum:\n{path}")
+    con.commit()
+    con.execute("ATTACH DATABASE ? AS arc", (path,))
+    try:
+        hot = set(_table_columns(con, "tweets"))
+        cols = ", ".join(c for c in _table_columns(con, "tweets", "arc") if c in hot)
+        con.execute("BEGIN")
+        con.execute(f"INSERT INTO main.tweets ({cols}) SELECT {cols} FROM arc.tweets")
+        con.execute("INSERT OR REPLACE INTO main.text_dicts (dataset_id, codec, dict) "
+                    "SELECT dataset_id, codec, dict FROM arc.text_dicts")
+        con.execute("UPDATE main.datasets SET archive_path=NULL, "
+                    "text_store=(SELECT text_store FROM arc.datasets) WHERE id=?", (ds_id,))
+        con.execute("DELETE FROM main.annotation_memory WHERE dataset_id=?", (ds_id,))
+        con.commit()
+    except Exception:
+        con.rollback()
+        raise
+    finally:
+        con.execute("DETACH DATABASE arc")
+    os.remove(path)
+
+def list_archived_datasets(con) -> list[tuple]:
+    """(id, name, total, exported_at) of archived datasets, newest export first."""
+    cur = con.cursor()
+    cur.execute("SELECT id, name, total, exported_at FROM datasets WHERE archive_path IS NOT NULL "
+                "ORDER BY exported_at DESC, id DESC")
+    return cur.fetchall()
+
+def archive_exported(con, older_than_days=ARCHIVE_AFTER_DAYS, archive_dir=None) -> list[int]:
+    """Archive every exported dataset exported at least `older_than_days` ago; returns their ids."""
+    cutoff = datetime.fromtimestamp(time.time() - older_than_days * 86400).strftime("%Y-%m-%d %H:%M:%S")
+    cur = con.cursor()
+    cur.execute("SELECT id FROM datasets WHERE exported=1 AND archive_path IS NULL "
+                "AND exported_at <= ?", (cutoff,))
+    ids = [r[0] for r in cur.fetchall()]
+    for ds_id in ids:
+        archive_dataset(con, ds_id, archive_dir)
+    return ids
+
+def check_archive() -> dict:
+    """
+    Annotation memory survives archiving: a dataset imported after its source
+    was archived reuses the archived answers, and after the source is
+    restored its answers are read from the hot DB again. An mmap dataset's
+    blob outlives its archiving while a snapshot reads it, so restoring a
+    snapshot taken before the archive brings back readable texts; without
+    snapshots it is removed at once.
+    """
+    topic = next(iter(DETAIL_QUESTIONS))
+    texts = [f"tweet number {i}" for i in range(4)]
+    failures = []
+    with tempfile.TemporaryDirectory() as tmp:
+        archive_dir, backup_dir = os.path.join(tmp, "archive"), os.path.join(tmp, "backups")
+        db = os.path.join(tmp, "check.sqlite3")
+        with closing(ensure_db(db)) as con:
+            def import_twin(name, text_store="inline"):
+                path = os.path.join(tmp, name)
+                with open(path, "w", encoding="utf-8", newline="") as f:
+                    csv.writer(f).writerows([["tweets"], *([f"  {t} "] for t in texts)])
+                ds_id, _ = create_dataset_from_csv(con, path, text_store=text_store)
+                return ds_id
+
+            src = import_twin("src.csv")
+            for idx in (0, 1):
+                tweet_id = get_tweet_row(con, src, idx).id
+                save_labels_for(con, tweet_id, {topic: True})
+                save_detail(con, tweet_id, topic, {idx})
+            mark_dataset_exported(con, src)
+            archive_dataset(con, src, archive_dir, backup_dir)
+
+            for when in ("archived", "restored"):
+                ds_id = import_twin(f"{when}.csv")
+                rows = [get_tweet_row(con, ds_id, idx) for idx in range(len(texts))]
+                got = [(r.annotated, getattr(r, topic), str(getattr(r, f"{topic}_detail"))) for r in rows]
+                want = [(1, 1, _serialize_detail_value({0})), (1, 1, _serialize_detail_value({1}))] \
+                    + [(0, 0, "-1")] * (len(texts) - 2)
+                if got != want:
+                    failures.append(f"source {when}: reused {got}")
+                if when == "archived":
+                    restore_archived_dataset(con, src)
+                    left = con.execute("SELECT COUNT(*) FROM annotation_memory").fetchone()[0]
+                    if left:
+                        failures.append(f"restore left {left} rows in annotation_memory")
+
+            blob_of = lambda ds_id: TextStore.path_for(_texts_dir(db), ds_id)
+            lone = import_twin("lone.csv", "mmap")
+            mark_dataset_exported(con, lone)
+            archive_dataset(con, lone, archive_dir, backup_dir)
+            if os.path.exists(blob_of(lone)):
+                failures.append("blob of an archived dataset no snapshot reads was kept")
+
+            kept = import_twin("kept.csv", "mmap")
+            snapshot = backup_db(db, backup_dir)
+            mark_dataset_exported(con, kept)
+            archive_dataset(con, kept, archive_dir, backup_dir)
+            if not os.path.exists(blob_of(kept)):
+                failures.append("archiving removed a blob a snapshot still reads")
+            else:
+                restore_backup(con, snapshot, backup_dir)
+                got = [get_tweet_row(con, kept, idx).text for idx in range(len(texts))]
+                if got != texts:
+                    failures.append(f"texts after restoring the snapshot: {got}")
+    return {"cases": 5, "failures": failures, "ok": not failures}
+
+def run_maintenance(con, *, full=False) -> dict:
+    """
+    Refresh planner statistics (ANALYZE) and give free pages back to the
+    file system: incremental_vacuum once the DB is in auto_vacuum=INCREMENTAL
+    mode; otherwise (older files) a one-off VACUUM that also switches the
+    mode, when `full` or at least MAINT_VACUUM_FREE of the pages are free.
+    """
+    con.commit()
+    before = _db_bytes(con)
+    pages = con.execute("PRAGMA page_count").fetchone()[0]
+    free = con.execute("PRAGMA freelist_count").fetchone()[0]
+    if con.execute("PRAGMA auto_vacuum").fetchone()[0] == 2 and not full:
+        con.execute("PRAGMA incremental_vacuum").fetchall()
+        how = "incremental_vacuum"
+    elif full or (pages and free / pages >= MAINT_VACUUM_FREE):
+        con.execute("PRAGMA auto_vacuum=INCREMENTAL")
+        con.execute("VACUUM")
+        how = "vacuum"
+    else:
+        how = "none"
+    con.execute("ANALYZE")
+    con.commit()
+    after = _db_bytes(con)
+    return {"reclaim": how, "free_pages": free, "bytes_before": before,
+            "bytes_after": after, "reclaimed_bytes": before - after}
+
+def maintain(con, *, full=False, older_than_days=ARCHIVE_AFTER_DAYS, archive_dir=None) -> dict:
+    """Archive old exported datasets, then run_maintenance(); the combined report."""
+    archived = archive_exported(con, older_than_days, archive_dir)
+    report = run_maintenance(con, full=full)
+    report["archived"] = archived
+    settings = QSettings(ORG_NAME, APP_NAME)
+    settings.setValue("last_maintenance", datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
+    return report
+
+def maintenance_due() -> bool:
+    settings = QSettings(ORG_NAME, APP_NAME)
+    last = settings.value("last_maintenance", "")
+    if not last:
+        return True
+    try:
+        return (datetime.now() - datetime.strptime(last, "%Y-%m-%d %H:%M:%S")).days >= MAINT_EVERY_DAYS
+    except ValueError:
+        return True
+
+def format_maintenance_report(report: dict) -> str:
+    def mb(b):
+        return f"{b / 1_048_576:.1f} MB"
+    archived = ", ".join(f"#{i}" for i in report["archived"]) or "brak"
+    return (f"Zarchiwizowane zbiory: {archived}\n"
+            f"Rozmiar bazy: {mb(report['bytes_before'])} → {mb(report['bytes_after'])} "
+            f"(odzyskano {mb(report['reclaimed_bytes'])})")
 
 # ================== UI helpers ==================
+class TextMetricsCache:
+    """horizontalAdvance per (font, text); QFont.key() changes with family, size and style."""
+    def __init__(self, max_entries: int = 4096):
+        self._widths: OrderedDict = OrderedDict()
+        self._max = max_entries
+        self.hits = self.misses = 0
+
+    def width(self, font: QFont, text: str) -> int:
+        key = (font.key(), text)
+        w = self._widths.get(key)
+        if w is not None:
+            self.hits += 1
+            return w
+        self.misses += 1
+        w = self._widths[key] = QFontMetrics(font).horizontalAdvance(text)
+        if len(self._widths) > self._max:
+            self._widths.popitem(last=False)
+        return w
+
+class DeferredLayout:
+    """
+    Coalesces layout work. schedule() may be called any number of times per
+    frame; each callable then runs once, in a single pass about one frame
+    later. Lower `phase` runs first, so rows rewrap before the window sums
+    their heights. `immediate=True` runs work synchronously (one pass per call).
+    """
+    FRAME_MS = 16
+
+    def __init__(self):
+        self._pending: dict = {}
+        self._timer = None
+        self.immediate = False
+        self.passes = 0
+
+    def schedule(self, fn, phase: int = 0):
+        self._pending[fn] = min(phase, self._pending.get(fn, phase))
+        if self.immediate:
+            self.flush()
+            return
+        if self._timer is None:
+            self._timer = QTimer(QApplication.instance())
+            self._timer.setSingleShot(True)
+            self._timer.setInterval(self.FRAME_MS)
+            self._timer.timeout.connect(self.flush)
+        if not self._timer.isActive():
+            self._timer.start()
+
+    def flush(self):
+        self.passes += 1
+        for _ in range(3):  # a rewrap may schedule more work for the same pass
+            if not self._pending:
+                break
+            batch = sorted(self._pending.items(), key=lambda kv: kv[1])
+            self._pending.clear()
+            for fn, _ in batch:
+                owner = getattr(fn, "__self__", None)
+                if owner is not None and not shiboken_is_valid(owner):
+                    continue  # widget deleted before the pass ran
+                fn()
+
+TEXT_METRICS = TextMetricsCache()
+LAYOUT = DeferredLayout()
+
+class ActivityTracker(QObject):
+    """
+    Active-time clock for the timing columns. Installed as an application
+    event filter: input events only move a float forward (no timers, no DB
+    writes) and the filter never consumes anything. Time counts while the
+    application is focused and the last input is at most `idle_after` s old.
+    Input is recognised by wrapper class (key, mouse, hover, wheel, touch all
+    derive from QInputEvent), which is cheaper than calling e.type() on
+    every event the application delivers.
+    """
+
+    def __init__(self, idle_after: float, parent=None):
+        super().__init__(parent)
+        self.idle_after = float(idle_after)
+        self._last = time.monotonic()   # last input (or resume)
+        self._active = 0.0              # active seconds credited up to _last
+        self._paused = False
+
+    def eventFilter(self, obj, e):
+        if isinstance(e, QInputEvent):
+            now = time.monotonic()
+            if not self._paused:
+                gap = now - self._last
+                self._active += gap if gap < self.idle_after else self.idle_after
+            self._last = now
+        return False
+
+    def on_state_changed(self, state):
+        """QGuiApplication.applicationStateChanged: pause while another app has focus or we are minimized."""
+        now = time.monotonic()
+        if state == Qt.ApplicationActive:
+            self._paused = False
+        elif not self._paused:
+            self._active += min(now - self._last, self.idle_after)
+            self._paused = True
+        self._last = now
+
+    def now_s(self) -> float:
+        """Active seconds so far; only differences between two readings mean anything."""
+        if self._paused:
+            return self._active
+        return self._active + min(time.monotonic() - self._last, self.idle_after)
+
+class SessionRecorder:
+    """
+    Opt-in trace of what the annotator did, for reproducing slowdowns with
+    `python app.py replay`: one compact JSON object per line,
+    {"t": seconds since start, "a": action, ...}. Tweets are referred to by
+    dataset id and position only, never by text.
+    """
+    FLUSH_EVERY = 50
+
+    def __init__(self, path):
+        self.path = path
+        self._f = open(path, "w", encoding="utf-8")
+        self._t0 = time.monotonic()
+        self._n = 0
+
+    @classmethod
+    def start(cls, trace_dir=TRACE_DIR, keep=TRACE_KEEP) -> "SessionRecorder":
+        os.makedirs(trace_dir, exist_ok=True)
+        old = sorted(n for n in os.listdir(trace_dir) if n.startswith("session_") and n.endswith(".jsonl"))
+        for name in old[:max(0, len(old) - keep + 1)]:
+            try:
+                os.remove(os.path.join(trace_dir, name))
+            except OSError:
+                pass
+        return cls(os.path.join(trace_dir, datetime.now().strftime("session_%Y%m%d_%H%M%S.jsonl")))
+
+    def record(self, action: str, **fields):
+        entry = {"t": round(time.monotonic() - self._t0, 3), "a": action, **fields}
+        self._f.write(json.dumps(entry, separators=(",", ":"), ensure_ascii=False) + "\n")
+        self._n += 1
+        if self._n % self.FLUSH_EVERY == 0:
+            self._f.flush()
+
+    def close(self):
+        if not self._f.closed:
+            self.record("stop")
+            self._f.close()
+
+class LeakMonitor:
+    """
+    Memory diagnostics for long sessions: live QObjects by class (detached
+    widgets count too: they become top-level), Python QObject wrappers,
+    traced Python heap (tracemalloc) and RSS. sample() whenever suits the
+    caller; report() compares the first sample with the latest state.
+    """
+    def __init__(self, trace_python: bool = True):
+        self.samples: list[dict] = []
+        self._t0 = time.monotonic()
+        self._baseline = None
+        self._own_tracing = trace_python and not tracemalloc.is_tracing()
+        if self._own_tracing:
+            tracemalloc.start()
+
+    @staticmethod
+    def live_qobjects() -> dict[str, int]:
+        app = QApplication.instance()
+        counts: dict[str, int] = {}
+        for root in (app, *app.topLevelWidgets()):
+            for obj in (root, *root.findChildren(QObject)):
+                name = type(obj).__name__
+                counts[name] = counts.get(name, 0) + 1
+        return counts
+
+    def sample(self) -> dict:
+        gc.collect()
+        by_class = self.live_qobjects()
+        # the walk itself wraps internals such as QTextFrame, which Qt later
+        # deletes behind PySide's back: those wrappers are counted as dead
+        wrappers = [shiboken_is_valid(o) for o in gc.get_objects() if isinstance(o, QObject)]
+        entry = {
+            "t": round(time.monotonic() - self._t0, 1),
+            "rss_mb": round(_rss_mb(), 1),
+            "qobjects": sum(by_class.values()),
+            "wrappers": sum(wrappers),
+            "dead_wrappers": len(wrappers) - sum(wrappers),
+            "python_mb": round(tracemalloc.get_traced_memory()[0] / 1_048_576, 2) if tracemalloc.is_tracing() else None,
+            "by_class": by_class,
+        }
+        self.samples.append(entry)
+        if self._baseline is None and tracemalloc.is_tracing():
+            self._baseline = tracemalloc.take_snapshot()
+        return entry
+
+    def report(self, top: int = 10) -> dict:
+        if not self.samples:
+            self.sample()
+        first, last = self.samples[0], self.sample()
+        classes = set(first["by_class"]) | set(last["by_class"])
+        growth = {c: last["by_class"].get(c, 0) - first["by_class"].get(c, 0) for c in classes}
+        python_top = []
+        if self._baseline is not None and tracemalloc.is_tracing():
+            ignore = [tracemalloc.Filter(False, tracemalloc.__file__), tracemalloc.Filter(False, "<frozen importlib._bootstrap*>")]
+            stats = tracemalloc.take_snapshot().filter_traces(ignore).compare_to(self._baseline.filter_traces(ignore), "lineno")
+            python_top = [f"{s.traceback[0].filename}:{s.traceback[0].lineno} {s.size_diff / 1024:+.1f} KiB ({s.count_diff:+d})"
+                          for s in stats[:top] if s.size_diff > 0]
+        return {
+            "duration_s": last["t"] - first["t"],
+            "rss_growth_mb": round(last["rss_mb"] - first["rss_mb"], 1),
+            "qobject_growth": last["qobjects"] - first["qobjects"],
+            "wrapper_growth": last["wrappers"] - first["wrappers"],
+            "dead_wrapper_growth": last["dead_wrappers"] - first["dead_wrappers"],
+            "python_growth_mb": (round(last["python_mb"] - first["python_mb"], 2)
+                                 if first["python_mb"] is not None and last["python_mb"] is not None else None),
+            "growing_classes": dict(sorted(((c, g) for c, g in growth.items() if g > 0), key=lambda x: -x[1])[:top]),
+            "top_python_growth": python_top,
+            "samples": [{k: v for k, v in s.items() if k != "by_class"} for s in self.samples],
+        }
+
+    def stop(self):
+        if self._own_tracing and tracemalloc.is_tracing():
+            tracemalloc.stop()
+        self._baseline = None
+
+def format_leak_report(rep: dict) -> str:
+    lines = [
+        f"Okres: {rep['duration_s']:.0f} s, próbek: {len(rep['samples'])}",
+        f"RSS: {rep['rss_growth_mb']:+.1f} MB",
+        f"Obiekty Qt: {rep['qobject_growth']:+d}, obiekty Pythona opakowujące Qt: {rep['wrapper_growth']:+d}",
+    ]
+    if rep["python_growth_mb"] is not None:
+        lines.append(f"Sterta Pythona: {rep['python_growth_mb']:+.2f} MB")
+    if rep["growing_classes"]:
+        lines.append("Przybyło obiektów Qt: " + ", ".join(f"{c} {g:+d}" for c, g in rep["growing_classes"].items()))
+    else:
+        lines.append("Liczba obiektów Qt nie rośnie.")
+    return "\n".join(lines)
+
 class SquareTile(QPushButton):
     """A square, checkable tile; height is controlled by parent row."""
     def __init__(self, caption: str):
@@ -606,6 +3639,8 @@ class ChoiceRow(QWidget):
       - exclusive=True  -> int index
       - exclusive=False -> set[int] of selected indices
     """
+    wrap_epoch = 0  # bumped whenever any row changes wrap mode (and so its height)
+
     def __init__(self, on_change, *, exclusive: bool, options: list[str], preset=None):
         super().__init__()
         self.on_change = on_change
@@ -613,6 +3648,9 @@ class ChoiceRow(QWidget):
         self.options = options
         self.buttons: list[QPushButton] = []
         self._wrap_mode = None
+        self._breaks = None       # (font key, wrap below width, unwrap above width)
+        self._two_lines = None    # two-line captions, split once
+        self._last_btn_w = None
 
         self.layout = QHBoxLayout(self)
         self.layout.setContentsMargins(0, 0, 0, 0)
@@ -654,13 +3692,15 @@ class ChoiceRow(QWidget):
             if hasattr(self, "group"):
                 self.group.idToggled.connect(self._on_exclusive_toggled)
         else:
+            # silently: through _on_multi_toggled a preset option would be toggled off again
             for i in sorted(self._selected):
                 if 0 <= i < len(self.buttons):
+                    self.buttons[i].blockSignals(True)
                     self.buttons[i].setChecked(True)
+                    self.buttons[i].blockSignals(False)
 
         # initial wrap pass after layout settles
-        from PySide6.QtCore import QTimer
-        QTimer.singleShot(0, self._maybe_rewrap)
+        LAYOUT.schedule(self._maybe_rewrap)
 
     # ---- wrapping (unchanged logic from your latest version) ----
     def _compute_target_btn_width(self) -> int:
@@ -670,6 +3710,30 @@ class ChoiceRow(QWidget):
         total_w = max(0, self.width() - m.left() - m.right() - spacing * (n - 1))
         return total_w // n if n else total_w
 
+    def _two_line_texts(self) -> list[str]:
+        if self._two_lines is None:
+            self._two_lines = []
+            for b in self.buttons:
+                raw = b.property("_raw_text") or b.text()
+                words = raw.split()
+                if len(words) <= 1:
+                    line1, line2 = raw, ""
+                else:
+                    total_chars = sum(len(w) for w in words) + (len(words) - 1)
+                    half = total_chars // 2
+                    cur = 0
+                    cut = 0
+                    for i, w in enumerate(words):
+                        cur += len(w)
+                        if cur >= half:
+                            cut = i + 1
+                            break
+                        cur += 1
+                    line1 = " ".join(words[:cut]).strip()
+                    line2 = " ".join(words[cut:]).strip()
+                self._two_lines.append(line1 if not line2 else f"{line1}\n{line2}")
+        return self._two_lines
+
     def _apply_mode(self, mode: str):
         fm = self.fontMetrics()
         if mode == "one":
@@ -679,56 +3743,73 @@ class ChoiceRow(QWidget):
                 b.setMinimumHeight(48)
                 b.setMaximumHeight(60)
             self._wrap_mode = "one"
+            ChoiceRow.wrap_epoch += 1
             return
-        for b in self.buttons:
-            raw = b.property("_raw_text") or b.text()
-            words = raw.split()
-            if len(words) <= 1:
-                line1, line2 = raw, ""
-            else:
-                total_chars = sum(len(w) for w in words) + (len(words) - 1)
-                half = total_chars // 2
-                cur = 0
-                cut = 0
-                for i, w in enumerate(words):
-                    cur += len(w)
-                    if cur >= half:
-                        cut = i + 1
-                        break
-                    cur += 1
-                line1 = " ".join(words[:cut]).strip()
-                line2 = " ".join(words[cut:]).strip()
-            text = line1 if not line2 else f"{line1}\n{line2}"
+        for b, text in zip(self.buttons, self._two_line_texts()):
             b.setText(text)
         h_two = fm.height() * 2 + 22
         for b in self.buttons:
             b.setMinimumHeight(h_two)
             b.setMaximumHeight(h_two + 6)
         self._wrap_mode = "two"
+        ChoiceRow.wrap_epoch += 1
+
+    def _breakpoints(self) -> tuple[float, float]:
+        """
+        Button widths where the mode may flip: below the first the widest caption
+        no longer fits on one line, above the second it fits with room to spare.
+        Recomputed only when the font changes.
+        """
+        font = self.font()
+        if self._breaks is None or self._breaks[0] != font.key():
+            pad = 24
+            widest = max(TEXT_METRICS.width(font, b.property("_raw_text") or b.text())
+                         for b in self.buttons)
+            self._breaks = (font.key(), widest + pad, widest / 0.82 + pad)
+        return self._breaks[1], self._breaks[2]
 
     def _maybe_rewrap(self):
         if not self.buttons:
             return
-        fm = self.fontMetrics()
-        pad = 24
         w_btn = self._compute_target_btn_width()
-        if w_btn <= 0:
+        if w_btn <= 0 or w_btn == self._last_btn_w:
             return
-        raw_texts = [(b.property("_raw_text") or b.text()) for b in self.buttons]
-        widths = [fm.horizontalAdvance(t) for t in raw_texts]
-        need_wrap = any(w > (w_btn - pad) for w in widths)
-        can_unwrap = all(w < (w_btn - pad) * 0.82 for w in widths)
+        self._last_btn_w = w_btn
+        wrap_below, unwrap_above = self._breakpoints()
         desired = self._wrap_mode or "one"
         if self._wrap_mode in (None, "one"):
-            desired = "two" if need_wrap else "one"
+            desired = "two" if w_btn < wrap_below else "one"
         elif self._wrap_mode == "two":
-            desired = "one" if can_unwrap else "two"
+            desired = "one" if w_btn > unwrap_above else "two"
         if desired != self._wrap_mode:
             self._apply_mode(desired)
 
     def resizeEvent(self, e):
         super().resizeEvent(e)
-        self._maybe_rewrap()
+        if e.size().width() != e.oldSize().width():
+            LAYOUT.schedule(self._maybe_rewrap)
+
+    def changeEvent(self, e):
+        super().changeEvent(e)
+        if e.type() in (QEvent.FontChange, QEvent.StyleChange):
+            self._last_btn_w = None  # breakpoints move with the font
+            LAYOUT.schedule(self._maybe_rewrap)
+
+    def set_key_hints(self, keys: str):
+        """Prefix option captions with their rapid-mode keys ("" restores them)."""
+        for i, (b, raw) in enumerate(zip(self.buttons, self.options)):
+            b.setProperty("_raw_text", f"{keys[i]})  {raw}" if keys and i < len(keys) else raw)
+        self._two_lines = None
+        self._breaks = None
+        self._last_btn_w = None
+        if self._wrap_mode is not None:
+            self._apply_mode(self._wrap_mode)
+        LAYOUT.schedule(self._maybe_rewrap)
+
+    def press(self, idx: int):
+        """Keyboard equivalent of clicking option `idx` (same rules, same on_change)."""
+        if 0 <= idx < len(self.buttons) and self.isEnabled():
+            self.buttons[idx].click()
 
     # ---- selection handlers ----
     def _on_exclusive_toggled(self, idx: int, checked: bool):
@@ -749,6 +3830,493 @@ class ChoiceRow(QWidget):
             self.on_change(set(self._selected))  # send the whole set
 
 
+# ================== Overview ==================
+class TweetTableModel(QAbstractTableModel):
+    """
+    Read-only, lazily paged view of one dataset. Rows arrive through
+    canFetchMore/fetchMore in OVERVIEW_PAGE chunks, keyset-paginated by
+    fetch_overview_page(), so the view only ever holds what was scrolled to.
+    With a `reader` (a read-only DbWorker) pages are queried there, one at a
+    time, `loading` True meanwhile: a text filter scans the whole dataset
+    through tweet_text/tweet_unz without stalling the GUI. Only
+    OVERVIEW_SORT_COLS sort; a sort index still missing is built on `worker`
+    (a DbWorker) while `indexing` is True, then the sort applies.
+    """
+    PAGE = 500
+    indexing = Signal(bool)
+    loading = Signal(bool)
+
+    def __init__(self, con, ds_id, parent=None, worker=None, reader=None):
+        super().__init__(parent)
+        self.con = con
+        self.ds_id = ds_id
+        self.worker = worker
+        self.reader = reader
+        self._pending_sort = None   # (col, desc) waiting for its index
+        self._gen = 0               # bumped on every reset: pages of an older query are dropped
+        self._loading = False
+        detail_topics = [(name, col) for name, col in LABELS if col != "inne"]
+        # (header, db column or None for derived, kind)
+        self.columns = [("#", "idx", "idx"), ("Tweet", None, "text"), ("Status", "annotated", "status")] \
+            + [(name, col, "label") for name, col in LABELS] \
+            + [(f"{name} doprec.", f"{col}_detail", "detail") for name, col in detail_topics] \
+            + [("Intencja", "intent", "intent")]
+        self._rows: list[tuple] = []
+        self._exhausted = False
+        self._sort_col = "idx"
+        self._desc = False
+        self._where = ""
+        self._params: tuple = ()
+
+    # ---- paging ----
+    def reset_rows(self):
+        self.beginResetModel()
+        self._gen += 1
+        self._rows = []
+        self._exhausted = False
+        self.endResetModel()
+        if self._loading:
+            self._loading = False
+            self.loading.emit(False)
+
+    def canFetchMore(self, parent=QModelIndex()):
+        return not parent.isValid() and not self._exhausted
+
+    def fetchMore(self, parent=QModelIndex()):
+        if parent.isValid() or self._exhausted or self._loading:
+            return
+        after = (self._rows[-1].sort_key, self._rows[-1].idx) if self._rows else None
+        query = dict(sort_col=self._sort_col, desc=self._desc, where=self._where, params=self._params,
+                     limit=self.PAGE)
+        if self.reader is None:
+            self._append_page(fetch_overview_page(self.con, self.ds_id, after, **query))
+            return
+        gen = self._gen
+        self._loading = True
+        self.loading.emit(True)
+        self.reader.submit(lambda con: fetch_overview_page(con, self.ds_id, after, **query),
+                           then=lambda page: self._page_loaded(gen, page),
+                           fail=lambda _msg: self._page_loaded(gen, None))
+
+    def _page_loaded(self, gen: int, page):
+        if gen != self._gen:
+            return  # filter or sort changed meanwhile
+        self._loading = False
+        self.loading.emit(False)
+        if page is None:
+            self._exhausted = True  # failed query: stop instead of retrying on every scroll
+            return
+        self._append_page(page)
+
+    def _append_page(self, page: list):
+        if len(page) < self.PAGE:
+            self._exhausted = True
+        if page:
+            self.beginInsertRows(QModelIndex(), len(self._rows), len(self._rows) + len(page) - 1)
+            self._rows.extend(page)
+            self.endInsertRows()
+
+    def set_filter(self, where: str, params: tuple):
+        self._where, self._params = where, tuple(params)
+        self.reset_rows()
+
+    def sortable(self, column: int) -> bool:
+        # no index for the others (5M-row sorts otherwise), and no index per column either
+        return self.columns[column][1] in OVERVIEW_SORT_COLS
+
+    def sort(self, column: int, order=Qt.AscendingOrder):
+        if not self.sortable(column):
+            return
+        db_col = self.columns[column][1]
+        desc = order == Qt.DescendingOrder
+        if self._pending_sort is not None:
+            if self._pending_sort[0] == db_col:
+                self._pending_sort = (db_col, desc)   # same index already on its way
+            return
+        if self.worker is None or has_sort_index(self.con, db_col):
+            ensure_sort_index(self.con, db_col)
+            self._sorted_by(db_col, desc)
+            return
+        self._pending_sort = (db_col, desc)
+        self.indexing.emit(True)
+        self.worker.submit(ensure_sort_index, db_col, then=lambda _: self._index_built(),
+                           fail=lambda _msg: self._index_built(failed=True))
+
+    def _index_built(self, failed: bool = False):
+        pending, self._pending_sort = self._pending_sort, None
+        self.indexing.emit(False)
+        if not failed:
+            self._sorted_by(*pending)
+
+    def _sorted_by(self, col: str, desc: bool):
+        self._sort_col = col
+        self._desc = desc
+        self.reset_rows()
+
+    # ---- model API ----
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._rows)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.columns)
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if orientation != Qt.Horizontal:
+            return None
+        if role == Qt.DisplayRole:
+            return self.columns[section][0]
+        if role == Qt.ToolTipRole and not self.sortable(section):
+            return "Tej kolumny nie można sortować"
+        return None
+
+    def idx_at(self, row: int) -> int:
+        return self._rows[row].idx
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid() or role not in (Qt.DisplayRole, Qt.ToolTipRole):
+            return None
+        r = self._rows[index.row()]
+        header, db_col, kind = self.columns[index.column()]
+        if kind == "idx":
+            return str(r.idx + 1)
+        if kind == "text":
+            return r.preview.replace("\n", " ")
+        if kind == "status":
+            return "✓" if r.annotated == 1 else ""
+        if kind == "label":
+            return "●" if getattr(r, db_col) else ""
+        if kind == "detail":
+            raw = getattr(r, db_col)
+            if role == Qt.ToolTipRole:
+                return "; ".join(SCHEMA.detail_texts(db_col.removesuffix("_detail"), raw))
+            return ", ".join(str(i + 1) for i in sorted(_parse_detail_value(raw)))
+        if kind == "intent":
+            v = r.intent
+            opts = SCHEMA.intent_options
+            if v is None or v < 0 or v >= len(opts):
+                return ""
+            return opts[v] if role == Qt.ToolTipRole else str(v + 1)
+        return None
+
+class BulkEditDialog(QDialog):
+    """Collects one edit (labels / follow-ups / intent) to apply to many tweets."""
+    def __init__(self, parent, n_rows: int):
+        super().__init__(parent)
+        self.setWindowTitle(f"Zmień {n_rows} tweetów")
+        self.setStyleSheet(STYLE)
+        self.resize(1100, 760)
+        self._details: dict[str, set[int]] = {}
+        self._intent = None
+
+        outer = QVBoxLayout(self)
+        hint = QLabel("Pole częściowo zaznaczone = bez zmian. Odpowiedź doprecyzowująca zaznacza też kategorię.")
+        hint.setObjectName("muted"); hint.setWordWrap(True)
+        outer.addWidget(hint)
+
+        scroll = QScrollArea(); scroll.setWidgetResizable(True); scroll.setFrameShape(QFrame.NoFrame)
+        host = QWidget(); lay = QVBoxLayout(host); lay.setSpacing(10)
+        row = QHBoxLayout()
+        self.boxes: dict[str, QCheckBox] = {}
+        for name, col in LABELS:
+            cb = QCheckBox(name); cb.setTristate(True); cb.setCheckState(Qt.PartiallyChecked)
+            row.addWidget(cb); self.boxes[col] = cb
+        lay.addLayout(row)
+        for name, col in LABELS:
+            if col not in DETAIL_QUESTIONS:
+                continue
+            qtxt, opts = DETAIL_QUESTIONS[col]
+            lay.addWidget(QLabel(f"{name}: {qtxt}"))
+            lay.addWidget(ChoiceRow(lambda sel, c=col: self._details.__setitem__(c, sel),
+                                    exclusive=False, options=opts))
+        lay.addWidget(QLabel(f"INNE: {INTENT_QUESTION[0]}"))
+        lay.addWidget(ChoiceRow(lambda i: setattr(self, "_intent", i), exclusive=True, options=INTENT_QUESTION[1]))
+        lay.addStretch(1)
+        scroll.setWidget(host)
+        outer.addWidget(scroll, 1)
+
+        buttons = QDialogButtonBox(QDialogButtonBox.Ok | QDialogButtonBox.Cancel)
+        buttons.accepted.connect(self._on_ok)
+        buttons.rejected.connect(self.reject)
+        outer.addWidget(buttons)
+
+    def edit(self) -> dict:
+        labels = {col: cb.checkState() == Qt.Checked for col, cb in self.boxes.items()
+                  if cb.checkState() != Qt.PartiallyChecked}
+        # answers picked before a topic was unticked again are dropped with it
+        details = {c: sel for c, sel in self._details.items() if sel and labels.get(c) is not False}
+        intent = self._intent if labels.get("inne") is not False else None
+        return {"labels": labels, "details": details, "intent": intent}
+
+    def _on_ok(self):
+        e = self.edit()
+        labels = dict(e["labels"])
+        for col in e["details"]:
+            labels.setdefault(col, True)
+        if e["intent"] is not None:
+            labels.setdefault("inne", True)
+        if not labels:
+            QMessageBox.information(self, "Brak zmian", "Nie wybrano żadnej zmiany."); return
+        ok, msg = validate_bulk_edit(labels, e["details"], e["intent"])
+        if not ok:
+            QMessageBox.information(self, "Brak odpowiedzi", msg); return
+        self.accept()
+
+class BatchExportDialog(QDialog):
+    """Pick datasets (default: all open ones) and an output folder for a batch export."""
+    def __init__(self, parent, datasets: list[tuple], open_ids: set[int], out_dir: str):
+        super().__init__(parent)
+        self.setWindowTitle("Eksport wielu zbiorów")
+        self.setStyleSheet(STYLE)
+        self.resize(640, 520)
+        self.out_dir = out_dir
+
+        outer = QVBoxLayout(self)
+        self.list = QListWidget()
+        for ds_id, name, done, total, exported in datasets:
+            state = "wyeksportowany" if exported else f"{done}/{total}"
+            item = QListWidgetItem(f"#{ds_id} {name} — {state}")
+            item.setData(Qt.UserRole, ds_id)
+            item.setFlags(item.flags() | Qt.ItemIsUserCheckable)
+            item.setCheckState(Qt.Checked if ds_id in open_ids else Qt.Unchecked)
+            self.list.addItem(item)
+        outer.addWidget(self.list, 1)
+
+        row = QHBoxLayout()
+        btn_all = QPushButton("Zaznacz wszystkie"); btn_all.clicked.connect(lambda: self._check_all(Qt.Checked))
+        btn_none = QPushButton("Odznacz"); btn_none.clicked.connect(lambda: self._check_all(Qt.Unchecked))
+        row.addWidget(btn_all); row.addWidget(btn_none); row.addStretch(1)
+        outer.addLayout(row)
+
+        self.dir_lbl = QLabel(out_dir); self.dir_lbl.setObjectName("muted"); self.dir_lbl.setWordWrap(True)
+        btn_dir = QPushButton("Folder…"); btn_dir.clicked.connect(self._pick_dir)
+        row = QHBoxLayout(); row.addWidget(self.dir_lbl, 1); row.addWidget(btn_dir)
+        outer.addLayout(row)
+        self.mark_box = QCheckBox("Oznacz jako wyeksportowane (zamknij sesje)")
+        outer.addWidget(self.mark_box)
+
+        buttons = QDialogButtonBox(QDialogButtonBox.Ok | QDialogButtonBox.Cancel)
+        buttons.accepted.connect(self._on_ok)
+        buttons.rejected.connect(self.reject)
+        outer.addWidget(buttons)
+
+    def _check_all(self, state):
+        for i in range(self.list.count()):
+            self.list.item(i).setCheckState(state)
+
+    def _pick_dir(self):
+        d = QFileDialog.getExistingDirectory(self, "Folder eksportu", self.out_dir)
+        if d:
+            self.out_dir = d
+            self.dir_lbl.setText(d)
+
+    def selected_ids(self) -> list[int]:
+        return [self.list.item(i).data(Qt.UserRole) for i in range(self.list.count())
+                if self.list.item(i).checkState() == Qt.Checked]
+
+    def _on_ok(self):
+        if not self.selected_ids():
+            QMessageBox.information(self, "Brak zbiorów", "Zaznacz co najmniej jeden zbiór."); return
+        if not os.access(self.out_dir, os.W_OK):
+            QMessageBox.critical(self, "Błąd zapisu", "Wybrany folder nie pozwala na zapis."); return
+        self.accept()
+
+class OverviewWindow(QWidget):
+    """Whole-dataset table; double-click shows that tweet in the main window."""
+    def __init__(self, tagger: "TaggerWindow"):
+        super().__init__(tagger, Qt.Window)
+        self.tagger = tagger
+        self.setWindowTitle("Przegląd zbioru")
+        self.setStyleSheet(STYLE)
+        self.resize(1200, 700)
+
+        lay = QVBoxLayout(self); lay.setContentsMargins(12, 12, 12, 12); lay.setSpacing(8)
+        bar = QHBoxLayout(); bar.setSpacing(8)
+        self.status_filter = QComboBox()
+        self.status_filter.addItems(["Wszystkie", "Nieoznaczone", "Oznaczone", "Brak doprecyzowania"])
+        self.col_filter = QComboBox()
+        self.col_filter.addItem("— kolumna —", None)
+        for name, col in LABELS:
+            self.col_filter.addItem(name, ("label", col))
+        for name, col in LABELS:
+            if col in DETAIL_QUESTIONS:
+                self.col_filter.addItem(f"{name} doprec.", ("detail", col))
+        self.col_filter.addItem("Intencja", ("intent", "intent"))
+        self.value_filter = QComboBox()
+        self.text_filter = QLineEdit(); self.text_filter.setPlaceholderText("Szukaj w treści…")
+        btn_refresh = QPushButton("Odśwież"); btn_refresh.setObjectName("ghost")
+        self.btn_bulk_sel = QPushButton("Zmień zaznaczone…")
+        self.btn_bulk_all = QPushButton("Zmień wszystkie wyniki…")
+        for w in (self.status_filter, self.col_filter, self.value_filter):
+            bar.addWidget(w)
+        bar.addWidget(self.text_filter, 1); bar.addWidget(btn_refresh)
+        bar.addWidget(self.btn_bulk_sel); bar.addWidget(self.btn_bulk_all)
+        lay.addLayout(bar)
+
+        self.view = QTableView()
+        self.view.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.view.setSelectionMode(QAbstractItemView.ExtendedSelection)
+        self.view.setSortingEnabled(True)
+        self.view.setWordWrap(False)
+        self.view.verticalHeader().setVisible(False)
+        self.view.verticalHeader().setDefaultSectionSize(28)  # fixed height: no per-row measuring
+        hh = self.view.horizontalHeader()
+        hh.setSectionResizeMode(QHeaderView.Interactive)
+        hh.setStretchLastSection(False)
+        # a click on a column that does not sort must not move the indicator either
+        self._sort_indicator = (0, Qt.AscendingOrder)
+        hh.sortIndicatorChanged.connect(self._on_sort_indicator)
+        lay.addWidget(self.view, 1)
+        self._indexing = self._loading = False
+        # a title only for slow pages (a text search), not for every page while scrolling
+        self._loading_timer = QTimer(self, singleShot=True, interval=250)
+        self._loading_timer.timeout.connect(self._update_title)
+
+        self.status_filter.currentIndexChanged.connect(self.apply_filter)
+        self.col_filter.currentIndexChanged.connect(self._fill_values)
+        self.value_filter.currentIndexChanged.connect(self.apply_filter)
+        self.text_filter.returnPressed.connect(self.apply_filter)
+        btn_refresh.clicked.connect(self.apply_filter)
+        self.btn_bulk_sel.clicked.connect(lambda: self.on_bulk_edit(selected_only=True))
+        self.btn_bulk_all.clicked.connect(lambda: self.on_bulk_edit(selected_only=False))
+        self.view.doubleClicked.connect(self._on_double_click)
+        self.model = None
+
+    def set_dataset(self, ds_id):
+        self.model = TweetTableModel(self.tagger.con, ds_id, self, worker=self.tagger.db, reader=self.tagger.reports)
+        self.model.indexing.connect(self._on_indexing)
+        self.model.loading.connect(self._on_loading)
+        self.view.setModel(self.model)
+        self.view.sortByColumn(0, Qt.AscendingOrder)
+        self.view.setColumnWidth(1, 520)
+        self.apply_filter()
+
+    def _on_sort_indicator(self, section: int, order):
+        if self.model is None or self.model.sortable(section):
+            self._sort_indicator = (section, order)
+            return
+        hh = self.view.horizontalHeader()
+        hh.blockSignals(True)
+        hh.setSortIndicator(*self._sort_indicator)
+        hh.blockSignals(False)
+
+    def _on_indexing(self, busy: bool):
+        # first sort by a column: its index is being built in the background
+        self._indexing = busy
+        if busy:
+            QApplication.setOverrideCursor(Qt.BusyCursor)
+        else:
+            QApplication.restoreOverrideCursor()
+        self._update_title()
+
+    def _on_loading(self, busy: bool):
+        self._loading = busy
+        if busy:
+            self._loading_timer.start()
+        else:
+            self._loading_timer.stop()
+            self._update_title()
+
+    def _update_title(self):
+        if self._indexing:
+            self.setWindowTitle("Przegląd zbioru — przygotowanie sortowania…")
+        elif self._loading:
+            self.setWindowTitle("Przegląd zbioru — wyszukiwanie…")
+        else:
+            self.setWindowTitle("Przegląd zbioru")
+
+    def _fill_values(self):
+        self.value_filter.blockSignals(True)
+        self.value_filter.clear()
+        spec = self.col_filter.currentData()
+        if spec:
+            kind, col = spec
+            if kind == "label":
+                self.value_filter.addItem("zaznaczone", 1); self.value_filter.addItem("niezaznaczone", 0)
+            elif kind == "detail":
+                for i, opt in enumerate(DETAIL_QUESTIONS[col][1]):
+                    self.value_filter.addItem(opt, i)
+            else:
+                self.value_filter.addItem("brak", -1)
+                for i, opt in enumerate(INTENT_QUESTION[1]):
+                    self.value_filter.addItem(opt, i)
+        self.value_filter.blockSignals(False)
+        self.apply_filter()
+
+    def apply_filter(self):
+        if self.model is None:
+            return
+        clauses, params = [], []
+        status = self.status_filter.currentIndex()
+        if status == 1:
+            clauses.append("annotated=0")
+        elif status == 2:
+            clauses.append("annotated=1")
+        elif status == 3:
+            clauses.append(SCHEMA.missing_followup_sql)
+        spec = self.col_filter.currentData()
+        value = self.value_filter.currentData()
+        if spec and value is not None:
+            kind, col = spec
+            if kind == "label":
+                clauses.append(f"{col}=?"); params.append(value)
+            elif kind == "detail":
+                clauses.append(f"(',' || {col}_detail || ',') LIKE ?"); params.append(f"%,{value},%")
+            elif value < 0:
+                clauses.append("(intent IS NULL OR intent < 0)")
+            else:
+                clauses.append("intent=?"); params.append(value)
+        needle = self.text_filter.text().strip()
+        if needle:
+            clauses.append(f"{TEXT_SQL} LIKE ?"); params.append(f"%{needle}%")
+        self.model.set_filter(" AND ".join(clauses), tuple(params))
+
+    def on_bulk_edit(self, *, selected_only: bool):
+        if self.model is None:
+            return
+        if selected_only:
+            idxs = sorted({self.model.idx_at(ix.row()) for ix in self.view.selectionModel().selectedRows()})
+            if not idxs:
+                QMessageBox.information(self, "Brak zaznaczenia", "Zaznacz wiersze w tabeli."); return
+            n = len(idxs)
+            self._bulk_edit(self.model.ds_id, idxs, "", (), n)
+            return
+        # every match of the filter: counted on the reports worker (a text filter scans the dataset)
+        ds_id, where, params = self.model.ds_id, self.model._where, self.model._params
+        self.tagger.reports.submit(count_overview_rows, ds_id, where, params,
+                                   then=lambda n: self._bulk_edit(ds_id, None, where, params, n))
+
+    def _bulk_edit(self, ds_id, idxs, where: str, params: tuple, n: int):
+        dlg = BulkEditDialog(self, n)
+        if dlg.exec() != QDialog.Accepted:
+            return
+        edit = dlg.edit()
+        # on the DB worker behind the queued answers (in order: the bulk edit wins)
+        self.tagger._flush_draft()
+        self._bulk_busy(True)
+        self.tagger.db.submit(lambda con: bulk_apply(con, ds_id, idxs, where=where, params=params, **edit),
+                              then=lambda changed: self._bulk_applied(ds_id, changed),
+                              fail=self._bulk_failed)
+
+    def _bulk_busy(self, busy: bool):
+        self.btn_bulk_sel.setEnabled(not busy)
+        self.btn_bulk_all.setEnabled(not busy)
+
+    def _bulk_applied(self, ds_id, changed: int):
+        self._bulk_busy(False)
+        self.apply_filter()
+        self.tagger.on_bulk_applied(ds_id, changed)
+
+    def _bulk_failed(self, msg: str):
+        # bulk_apply rolled back: no row changed
+        self._bulk_busy(False)
+        QMessageBox.critical(self, "Nie zastosowano zmiany", msg)
+
+    def _on_double_click(self, index):
+        if self.model is not None and index.isValid():
+            self.tagger._jump_to(self.model.idx_at(index.row()))
+            self.tagger.raise_(); self.tagger.activateWindow()
+
+
 # ================== Main window ==================
 class TaggerWindow(QMainWindow):
     def __init__(self, con):
@@ -761,6 +4329,54 @@ class TaggerWindow(QMainWindow):
 
         self._current_tweet_id = None
         self._last_start_mono = None
+        # time_spent_ms is wall-clock; active_ms comes from this app-wide input/focus clock
+        self.activity = ActivityTracker(get_idle_after(), self)
+        self._active_mark = None
+        QApplication.instance().installEventFilter(self.activity)
+        QApplication.instance().applicationStateChanged.connect(self.activity.on_state_changed)
+
+        # active-learning ordering: background model + Back history for jumps
+        self.learner = ActiveLearner(_db_path(con))
+        self._nav_history: deque[int] = deque(maxlen=NAV_HISTORY_MAX)
+        # per-dataset session state kept warm while switching (history, model)
+        self._sessions: dict[int, dict] = {}
+        self.matcher = KeywordMatcher(load_lexicon())
+        self._al_timer = QTimer(self)
+        self._al_timer.setInterval(500)
+        self._al_timer.timeout.connect(self._poll_learner)
+        # automatic snapshots on a worker thread; the timer only checks and reports
+        self.backups = BackupScheduler(_db_path(con))
+        self._backup_manual = False
+        self._backup_timer = QTimer(self)
+        self._backup_timer.setInterval(20_000)
+        self._backup_timer.timeout.connect(self._poll_backups)
+        self._backup_timer.start()
+        # layout cache: last tile side and follow-up content key (see _relayout)
+        self._tile_side = None
+        self._detail_gen = 0
+        self._detail_min_h_key = None
+        # follow-up cards by panel key (topic column or "intent"), in display order
+        self._detail_cards: dict[str, QFrame] = {}
+        # rapid mode: the current tweet's unsaved answers and the follow-up letters go to
+        self._draft = None
+        self._rapid_focus = None
+        self._draft_timer = QTimer(self)
+        self._draft_timer.setSingleShot(True)
+        self._draft_timer.setInterval(RAPID_SAVE_DELAY_MS)
+        self._draft_timer.timeout.connect(self._flush_draft)
+        # routine DB work on its own thread (see DbWorker); answers still in flight
+        # by tweet id, as (queued flushes, latest answers), so a revisit shows them
+        self.db = DbWorker(_db_path(con), parent=self)
+        self.db.failed.connect(self._on_db_failed)
+        # export, statistics and reports read a WAL snapshot on their own connection
+        self.reports = DbWorker(_db_path(con), parent=self, readonly=True)
+        self._unsaved: dict[int, tuple[int, AnnotationDraft]] = {}
+        self._db_failing = False
+        self._progress_queued = False
+        self._progress_dirty = False
+        # opt-in session trace (see SessionRecorder); last recorded window size
+        self.recorder = None
+        self._rec_size = None
 
         self.setWindowTitle("Tagowanie Tweetów")
         self.setMinimumSize(800, 600)
@@ -775,13 +4391,20 @@ class TaggerWindow(QMainWindow):
 
         # Toolbar
 
-        self.act_import = QAction("Importuj CSV", self)
+        self.act_import = QAction("Importuj CSV / JSONL", self)
         self.act_import.setShortcut(QKeySequence("Ctrl+I"))
         self.act_import.triggered.connect(self.on_import_csv)
+        self.act_import_folder = QAction("Importuj folder CSV…", self)
+        self.act_import_folder.triggered.connect(self.on_import_folder)
 
         self.act_export = QAction("Eksportuj", self)
         self.act_export.setShortcut(QKeySequence("Ctrl+E"))
         self.act_export.triggered.connect(self.on_export)
+        self.act_export_delta = QAction("Eksportuj zmiany od ostatniego eksportu…", self)
+        self.act_export_delta.setShortcut(QKeySequence("Ctrl+Shift+E"))
+        self.act_export_delta.triggered.connect(self.on_export_delta)
+        self.act_export_batch = QAction("Eksportuj wiele zbiorów…", self)
+        self.act_export_batch.triggered.connect(self.on_export_batch)
 
         # Extra actions used in the menu bar
         self.act_quit = QAction("Zakończ", self)
@@ -789,6 +4412,98 @@ class TaggerWindow(QMainWindow):
         self.act_quit.setMenuRole(QAction.QuitRole)  # macOS: moves to app menu
         self.act_quit.triggered.connect(self.close)
 
+        self.act_undo_prop = QAction("Cofnij propagację do duplikatów", self)
+        self.act_undo_prop.triggered.connect(self.on_undo_propagation)
+
+        self.act_skip_reused = QAction("Pomijaj tweety z wcześniejszych zbiorów", self)
+        self.act_skip_reused.setCheckable(True)
+        self.act_skip_reused.setChecked(get_skip_reused())
+        self.act_skip_reused.toggled.connect(set_skip_reused)
+
+        self.act_uncertain_first = QAction("Najpierw niepewne (aktywne uczenie)", self)
+        self.act_uncertain_first.setCheckable(True)
+        self.act_uncertain_first.setEnabled(ActiveLearner.available())
+        self.act_uncertain_first.setChecked(ActiveLearner.available() and get_uncertain_first())
+        self.act_uncertain_first.toggled.connect(self.on_toggle_uncertain_first)
+
+        self.act_idle_after = QAction("Próg bezczynności w pomiarze czasu…", self)
+        self.act_idle_after.triggered.connect(self.on_idle_after)
+
+        self.act_rapid = QAction("Tryb szybki (klawiatura)", self)
+        self.act_rapid.setCheckable(True)
+        self.act_rapid.setShortcut(QKeySequence("Ctrl+K"))
+        self.act_rapid.setChecked(get_rapid_mode())
+        self.act_rapid.toggled.connect(self.on_toggle_rapid)
+
+        self.act_prelabel = QAction("Przelicz sugestie ze słownika", self)
+        self.act_prelabel.triggered.connect(self.on_prelabel)
+
+        self.act_backup_now = QAction("Utwórz kopię zapasową teraz", self)
+        self.act_backup_now.triggered.connect(self.on_backup_now)
+        self.act_restore_backup = QAction("Przywróć z kopii zapasowej…", self)
+        self.act_restore_backup.triggered.connect(self.on_restore_backup)
+        self.act_auto_backup = QAction(f"Automatyczne kopie (co {BACKUP_EVERY_MIN} min)", self)
+        self.act_auto_backup.setCheckable(True)
+        self.act_auto_backup.setChecked(get_auto_backup())
+        self.act_auto_backup.toggled.connect(set_auto_backup)
+
+        self.act_maintenance = QAction("Archiwizuj wyeksportowane zbiory i odchudź bazę", self)
+        self.act_maintenance.triggered.connect(self.on_maintenance)
+        self.act_unarchive = QAction("Przywróć zbiór z archiwum…", self)
+        self.act_unarchive.triggered.connect(self.on_unarchive)
+
+        self.act_next_dataset = QAction("Następny otwarty zbiór", self)
+        self.act_next_dataset.setShortcut(QKeySequence("Ctrl+Tab"))
+        self.act_next_dataset.triggered.connect(self.on_next_dataset)
+
+        self.act_next_gap = QAction("Następny nieoznaczony", self)
+        self.act_next_gap.setShortcut(QKeySequence("F3"))
+        self.act_next_gap.triggered.connect(lambda: self.on_jump_gap(forward=True))
+        self.act_prev_gap = QAction("Poprzedni nieoznaczony", self)
+        self.act_prev_gap.setShortcut(QKeySequence("Shift+F3"))
+        self.act_prev_gap.triggered.connect(lambda: self.on_jump_gap(forward=False))
+        self.act_next_missing = QAction("Następny bez odpowiedzi doprecyzowującej", self)
+        self.act_next_missing.setShortcut(QKeySequence("Ctrl+F3"))
+        self.act_next_missing.triggered.connect(lambda: self.on_jump_gap(forward=True, missing_followup=True))
+        self.act_goto = QAction("Przejdź do numeru…", self)
+        self.act_goto.setShortcut(QKeySequence("Ctrl+G"))
+        self.act_goto.triggered.connect(self.on_goto)
+
+        self.act_overview = QAction("Przegląd zbioru", self)
+        self.act_overview.setShortcut(QKeySequence("Ctrl+Shift+O"))
+        self.act_overview.triggered.connect(self.on_overview)
+        self.overview = None
+
+        self.act_report = QAction("Statystyki zbioru…", self)
+        self.act_report.triggered.connect(self.on_report)
+
+        # storage of tweet texts for newly imported datasets
+        self.store_group = QActionGroup(self)
+        self.store_group.setExclusive(True)
+        store_titles = {"inline": "w bazie", "mmap": "poza bazą (mmap)", "compressed": "skompresowana (słownik)"}
+        for mode in TEXT_STORE_MODES:
+            act = QAction(f"Treść nowych zbiorów: {store_titles[mode]}", self.store_group)
+            act.setCheckable(True)
+            act.setChecked(get_text_store_mode() == mode)
+            act.triggered.connect(lambda _=False, m=mode: set_text_store_mode(m))
+
+        self.act_record = QAction("Nagrywaj sesję (diagnostyka wydajności)", self)
+        self.act_record.setCheckable(True)
+        self.act_record.setChecked(get_record_sessions())
+        self.act_record.toggled.connect(self.on_toggle_recording)
+
+        # memory diagnostics: not persisted, tracemalloc costs every allocation
+        self.leaks = None
+        self._leak_timer = QTimer(self)
+        self._leak_timer.setInterval(LEAK_SAMPLE_S * 1000)
+        self._leak_timer.timeout.connect(lambda: self.leaks is not None and self.leaks.sample())
+        self.act_leaks = QAction("Diagnostyka pamięci", self)
+        self.act_leaks.setCheckable(True)
+        self.act_leaks.toggled.connect(self.on_toggle_leaks)
+        self.act_leak_report = QAction("Raport pamięci…", self)
+        self.act_leak_report.setEnabled(False)
+        self.act_leak_report.triggered.connect(self.on_leak_report)
+
         self.act_about = QAction("O TweetTagger", self)
         self.act_about.setMenuRole(QAction.AboutRole)  # macOS: moves to app menu
         self.act_about.triggered.connect(
@@ -803,12 +4518,57 @@ class TaggerWindow(QMainWindow):
         # File
         m_file = mb.addMenu("Plik")
         m_file.addAction(self.act_import)
+        m_file.addAction(self.act_import_folder)
         m_file.addAction(self.act_export)
+        m_file.addAction(self.act_export_delta)
+        m_file.addAction(self.act_export_batch)
+        m_file.addSeparator()
+        m_file.addActions(self.store_group.actions())
+        m_file.addSeparator()
+        m_backup = m_file.addMenu("Kopie zapasowe")
+        m_backup.addAction(self.act_backup_now)
+        m_backup.addAction(self.act_restore_backup)
+        m_backup.addSeparator()
+        m_backup.addAction(self.act_auto_backup)
+        m_maint = m_file.addMenu("Archiwum i konserwacja")
+        m_maint.addAction(self.act_maintenance)
+        m_maint.addAction(self.act_unarchive)
         m_file.addSeparator()
         m_file.addAction(self.act_quit)
 
+        # Datasets (switcher, filled on demand from cached progress)
+        self.m_datasets = mb.addMenu("Zbiory")
+        self.m_datasets.aboutToShow.connect(self._fill_datasets_menu)
+        self.addAction(self.act_next_dataset)
+
+        # Navigation
+        m_nav = mb.addMenu("Nawigacja")
+        m_nav.addAction(self.act_next_gap)
+        m_nav.addAction(self.act_prev_gap)
+        m_nav.addAction(self.act_next_missing)
+        m_nav.addSeparator()
+        m_nav.addAction(self.act_goto)
+        m_nav.addSeparator()
+        m_nav.addAction(self.act_overview)
+        m_nav.addAction(self.act_report)
+
+        # Edit
+        m_edit = mb.addMenu("Edycja")
+        m_edit.addAction(self.act_undo_prop)
+        m_edit.addSeparator()
+        m_edit.addAction(self.act_skip_reused)
+        m_edit.addAction(self.act_uncertain_first)
+        m_edit.addAction(self.act_rapid)
+        m_edit.addAction(self.act_idle_after)
+        m_edit.addSeparator()
+        m_edit.addAction(self.act_prelabel)
+
         # Help
         m_help = mb.addMenu("Pomoc")
+        m_help.addAction(self.act_record)
+        m_help.addAction(self.act_leaks)
+        m_help.addAction(self.act_leak_report)
+        m_help.addSeparator()
         m_help.addAction(self.act_about)
 
         # Make it feel native on macOS, keep toolbar on other OSes
@@ -857,6 +4617,7 @@ class TaggerWindow(QMainWindow):
         self.tweet_view.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Expanding)
         self._tweet_font_pt = 12
         self._current_tweet_text = ""  # <— remember plain text for zoom
+        self._current_highlights = ()
         ft = QFont(self.font()); ft.setPointSize(self._tweet_font_pt); self.tweet_view.setFont(ft)
 
         tv.addWidget(self.tweet_view, 1)
@@ -876,7 +4637,7 @@ class TaggerWindow(QMainWindow):
         self.tiles: dict[str, SquareTile] = {}
         for (label, col) in LABELS:
             tile = SquareTile(label)
-            tile.toggled.connect(self.on_tile_toggled)
+            tile.toggled.connect(lambda checked, c=col: self.on_tile_toggled(checked, c))
             self.tl.addWidget(tile, 1)
             self.tiles[col] = tile
         root.addWidget(self.tiles_card)
@@ -920,6 +4681,10 @@ class TaggerWindow(QMainWindow):
         self.restore_window_state()
         self.update_ui_enabled(False)
 
+        # opt-in action trace (replayable headless); started before the resume so it is recorded
+        if self.act_record.isChecked():
+            self._start_recording()
+
         # Resume session
         state = load_active_dataset(self.con)
         if state:
@@ -961,11 +4726,25 @@ class TaggerWindow(QMainWindow):
 
         self.setMinimumWidth(int(required))
 
+    def _detail_rows(self) -> list[ChoiceRow]:
+        rows = []
+        for i in range(self.detail_vbox.count()):
+            w = self.detail_vbox.itemAt(i).widget()
+            lay = w.layout() if w else None
+            if lay and lay.count() >= 2 and isinstance(lay.itemAt(1).widget(), ChoiceRow):
+                rows.append(lay.itemAt(1).widget())
+        return rows
+
     def _update_detail_host_minheight(self):
         """Make the scroll area show a vertical scrollbar whenever total content is taller than its viewport."""
         layout = self.detail_vbox
         if not layout:
             return
+        # card heights only change when panels are rebuilt or a row switches wrap mode
+        key = (self._detail_gen, ChoiceRow.wrap_epoch)
+        if key == self._detail_min_h_key:
+            return
+        self._detail_min_h_key = key
         m = layout.contentsMargins()
         spacing = layout.spacing()
 
@@ -983,46 +4762,246 @@ class TaggerWindow(QMainWindow):
 
     # ---------- Helpers ----------
     def _adjust_tweet_font(self, delta: int):
+        self._rec("zoom", d=delta)
         self._tweet_font_pt = max(8, min(28, self._tweet_font_pt + delta))
         # Re-render the HTML with the new font size
-        self._show_tweet_centered(self._current_tweet_text)
+        self._show_tweet_centered(self._current_tweet_text, self._current_highlights)
 
     def _autolink_html(self, text: str) -> str:
         esc = html.escape(text)
         esc = re.sub(r'(https?://\S+)', r'<a href="\\1">\\1</a>', esc)
         return f'<div style="text-align:center; line-height:1.45; font-size:{self._tweet_font_pt}pt;">{esc}</div>'
 
-    def _show_tweet_centered(self, text: str):
+    def _show_tweet_centered(self, text: str, highlights=()):
+        """`highlights`: (start, end) spans of `text` to emphasise (links are never split)."""
         self._current_tweet_text = text  # remember the plain text
-        esc = html.escape(text)
-        esc = re.sub(r'(https?://\S+)', r'<a href="\\1">\\1</a>', esc)
+        self._current_highlights = highlights
+        links = [(m.start(), m.end()) for m in re.finditer(r'https?://\S+', text)]
+        merged: list[list[int]] = []  # overlapping keyword hits -> one span
+        for a, b in sorted(highlights):
+            if any(a < le and b > ls for ls, le in links):
+                continue
+            if merged and a <= merged[-1][1]:
+                merged[-1][1] = max(merged[-1][1], b)
+            else:
+                merged.append([a, b])
+        spans = sorted([(a, b, "link") for a, b in links] + [(a, b, "kw") for a, b in merged])
+        parts, pos = [], 0
+        for a, b, kind in spans:
+            parts.append(html.escape(text[pos:a]))
+            seg = html.escape(text[a:b])
+            if kind == "link":
+                parts.append(f'<a href="{seg}">{seg}</a>')
+            else:
+                parts.append(f'<span style="color:#fbbf24; font-weight:600;">{seg}</span>')
+            pos = b
+        parts.append(html.escape(text[pos:]))
+        esc = "".join(parts)
         html_snippet = (
             f'<div style="text-align:center; line-height:1.45; font-size:{self._tweet_font_pt}pt;">{esc}</div>'
         )
         self.tweet_view.setText(html_snippet)
 
     def _stop_timer(self):
+        self._flush_draft()  # pending answers belong to the tweet being left
         if self._current_tweet_id is None or self._last_start_mono is None:
             return
         elapsed_ms = int((time.monotonic() - self._last_start_mono) * 1000)
+        active_ms = min(elapsed_ms, int((self.activity.now_s() - self._active_mark) * 1000))
         if elapsed_ms > 0:
-            cur = self.con.cursor()
-            cur.execute(
-                "UPDATE tweets SET time_spent_ms = COALESCE(time_spent_ms,0) + ? WHERE id=?",
-                (elapsed_ms, self._current_tweet_id)
-            )
-            self.con.commit()
+            self.db.submit(add_time_spent, self._current_tweet_id, elapsed_ms, active_ms)
         self._last_start_mono = None
 
     def _start_timer(self, tweet_id: int):
         self._current_tweet_id = tweet_id
         self._last_start_mono = time.monotonic()
+        self._active_mark = self.activity.now_s()
 
     def _make_shortcuts(self):
         act_next = QAction(self); act_next.setShortcut(QKeySequence.MoveToNextChar); act_next.triggered.connect(self.on_next); self.addAction(act_next)
         act_prev = QAction(self); act_prev.setShortcut(QKeySequence.MoveToPreviousChar); act_prev.triggered.connect(self.on_back); self.addAction(act_prev)
         act_next2 = QAction(self); act_next2.setShortcut(QKeySequence("Ctrl+Return")); act_next2.triggered.connect(self.on_next); self.addAction(act_next2)
 
+        # rapid mode: digits toggle tiles, letters answer the focused follow-up,
+        # Up/Down move that focus, Enter validates and advances
+        self._rapid_actions = []
+        def rapid(keys, slot):
+            act = QAction(self)
+            act.setShortcuts([QKeySequence(k) for k in keys])
+            act.triggered.connect(slot)
+            self.addAction(act)
+            self._rapid_actions.append(act)
+        for i in range(min(len(LABELS), 9)):
+            rapid([str(i + 1)], lambda _=False, i=i: self._rapid_toggle_tile(i))
+        for i, key in enumerate(RAPID_OPTION_KEYS):
+            rapid([key.upper()], lambda _=False, i=i: self._rapid_answer(i))
+        rapid(["Down"], lambda: self._rapid_move_focus(+1))
+        rapid(["Up"], lambda: self._rapid_move_focus(-1))
+        rapid(["Return", "Enter"], self.on_next)
+        self._sync_rapid_ui()
+
+    # ---------- Session recording ----------
+    def _rec(self, action: str, **fields):
+        if self.recorder is not None:
+            self.recorder.record(action, **fields)
+
+    def _start_recording(self):
+        try:
+            self.recorder = SessionRecorder.start()
+        except OSError as e:
+            self.recorder = None
+            QMessageBox.warning(self, "Nagrywanie sesji", f"Nie można zapisać śladu sesji:\n{e}")
+            return
+        self._rec_size = (self.width(), self.height())
+        self._rec("start", v=1, ds=self.ds_id, idx=self.cursor, total=self.total,
+                  w=self.width(), h=self.height(), rapid=self.act_rapid.isChecked(),
+                  font=self._tweet_font_pt, at=datetime.now().isoformat(timespec="seconds"))
+
+    def on_toggle_recording(self, checked: bool):
+        set_record_sessions(checked)
+        if checked and self.recorder is None:
+            self._start_recording()
+            if self.recorder is not None:
+                self.status_lbl.setText(f"Nagrywanie sesji: {self.recorder.path}")
+        elif not checked and self.recorder is not None:
+            self.recorder.close()
+            self.status_lbl.setText(f"Zapisano ślad sesji: {self.recorder.path}")
+            self.recorder = None
+
+    def on_toggle_leaks(self, checked: bool):
+        if checked and self.leaks is None:
+            self.leaks = LeakMonitor()
+            self.leaks.sample()
+            self._leak_timer.start()
+            self.status_lbl.setText(f"Diagnostyka pamięci: próbka co {LEAK_SAMPLE_S} s")
+        elif not checked and self.leaks is not None:
+            self._leak_timer.stop()
+            self.leaks.stop()
+            self.leaks = None
+        self.act_leak_report.setEnabled(checked)
+
+    def on_leak_report(self):
+        if self.leaks is None:
+            return
+        rep = self.leaks.report()
+        box = QMessageBox(QMessageBox.Information, "Raport pamięci", format_leak_report(rep), QMessageBox.Ok, self)
+        box.setDetailedText(json.dumps(rep, indent=2, ensure_ascii=False))
+        box.exec()
+
+    # ---------- Rapid (keyboard) mode ----------
+    def _sync_rapid_ui(self):
+        on = self.act_rapid.isChecked()
+        for act in self._rapid_actions:
+            act.setEnabled(on)
+        for i, (label, col) in enumerate(LABELS):
+            self.tiles[col].setText(f"{i + 1}\n{label}" if on and i < 9 else label)
+        for card in self._detail_cards.values():
+            card.findChild(ChoiceRow).set_key_hints(RAPID_OPTION_KEYS if on else "")
+        self._set_rapid_focus(self._rapid_focus if on else None)
+
+    def on_toggle_rapid(self, checked: bool):
+        set_rapid_mode(checked)
+        self._rec("rapid", on=checked)
+        self._flush_draft()
+        if checked and self._draft is not None:
+            self._rapid_focus = self._draft.missing_followup() or next(iter(self._detail_cards), None)
+        self._sync_rapid_ui()
+
+    def _flush_draft(self):
+        """Queue the current tweet's pending answers for the DB worker (no-op when there are none)."""
+        self._draft_timer.stop()
+        if self._draft is None or not self._draft.dirty:
+            return
+        snap = self._draft.take()
+        tid = snap.tweet_id
+        self._unsaved[tid] = (self._unsaved.get(tid, (0, None))[0] + 1, snap)
+        self.db.submit(snap.flush, then=lambda n, tid=tid: self._draft_saved(tid, n))
+        self.refresh_progress()
+
+    def _draft_saved(self, tweet_id: int, n_saved: int):
+        count, snap = self._unsaved.pop(tweet_id, (1, None))
+        if count > 1:
+            self._unsaved[tweet_id] = (count - 1, snap)
+        self._report_saved(n_saved)
+
+    def _draft_changed(self):
+        if self.act_rapid.isChecked():
+            self._draft_timer.start()  # restarts: one write after the burst of keys
+        else:
+            self._flush_draft()
+
+    def _sync_storage(self):
+        """Let queued answers and counts land; call before reading or writing on self.con."""
+        self._flush_draft()
+        self.db.drain()
+
+    def _after_writes(self, fn):
+        """Call fn on the GUI thread once the writes queued so far are committed."""
+        self._flush_draft()
+        self.db.submit(lambda _con: None, then=lambda _res: fn())
+
+    def _on_db_failed(self, msg: str):
+        """A queued job raised: say so and re-read the tweet, so the screen shows what the DB holds."""
+        if self._db_failing:
+            return  # the drain below delivers the rest of a failing queue
+        self._db_failing = True
+        try:
+            self.db.drain()
+            self._unsaved.clear()
+            self._progress_queued = self._progress_dirty = False
+            QMessageBox.critical(self, "Błąd zapisu", f"Nie udało się zapisać zmian w bazie:\n{msg}")
+            if self.ds_id:
+                self._draft = None  # its answers were not saved; the DB row wins
+                self.refresh_progress()
+                self.load_current_tweet()
+        finally:
+            self._db_failing = False
+
+    def _rapid_toggle_tile(self, i: int):
+        tile = self.tiles[LABELS[i][1]]
+        if tile.isEnabled():
+            tile.toggle()  # -> on_tile_toggled, as a click would
+
+    def _rapid_answer(self, i: int):
+        card = self._detail_cards.get(self._rapid_focus)
+        if card is not None:
+            card.findChild(ChoiceRow).press(i)
+
+    def _rapid_move_focus(self, step: int):
+        keys = list(self._detail_cards)
+        if not keys:
+            return
+        pos = keys.index(self._rapid_focus) if self._rapid_focus in keys else -step
+        self._set_rapid_focus(keys[(pos + step) % len(keys)])
+
+    def _set_rapid_focus(self, key):
+        self._rapid_focus = key if key in self._detail_cards else None
+        for k, card in self._detail_cards.items():
+            flag = k == self._rapid_focus
+            if bool(card.property("rapidFocus")) != flag:
+                card.setProperty("rapidFocus", flag)
+                card.style().unpolish(card); card.style().polish(card)
+        if self._rapid_focus is not None:
+            self.detail_scroll.ensureWidgetVisible(self._detail_cards[self._rapid_focus])
+
+    def _rapid_labels_changed(self):
+        """Tiles changed in rapid mode: update the draft and add/remove only the affected cards."""
+        d = self._draft
+        for col in SCHEMA.label_cols:
+            on = self.tiles[col].isChecked()
+            if on == d.labels[col]:
+                continue
+            d.set_label(col, on)
+            key = "intent" if col == "inne" else col
+            if key != "intent" and col not in DETAIL_QUESTIONS:
+                continue
+            if on:
+                self._insert_detail_card(key)
+                self._set_rapid_focus(key)
+            else:
+                self._remove_detail_card(key)
+        self._draft_changed()
+
     # ---------- Tile sizing ----------
     def _resize_tiles_square(self):
         """Make every tile a perfect square based on available row width."""
@@ -1035,6 +5014,9 @@ class TaggerWindow(QMainWindow):
         content_w = max(0, self.tiles_card.width() - left - right)
         cell_w = (content_w - spacing * (n - 1)) / n if n else 0
         side = int(max(TILE_MIN_SIDE, min(cell_w, TILE_MAX_SIDE)))
+        if side == self._tile_side:
+            return  # clamped: widths between the same breakpoints give the same tiles
+        self._tile_side = side
         for btn in self.tiles.values():
             btn.setMinimumHeight(side)
             btn.setMaximumHeight(side)
@@ -1044,11 +5026,14 @@ class TaggerWindow(QMainWindow):
 
     # ---------- Follow-up panel ----------
     def _clear_detail_panels(self):
+        self._detail_gen += 1
+        self._detail_cards = {}
         while self.detail_vbox.count():
             item = self.detail_vbox.takeAt(0)
             w = item.widget()
             if w:
-                w.setParent(None)
+                w.hide()
+                w.deleteLater()  # setParent(None) alone left it to the garbage collector
 
     def _make_detail_panel(self, title: str, options: list[str],
                            *, exclusive: bool, preset, on_change_cb):
@@ -1076,104 +5061,109 @@ class TaggerWindow(QMainWindow):
         ref_opts = [
             "opcja 1", "opcja 2", "opcja 3", "opcja 4", "Nie dotyczy / trudno powiedzieć"
         ]
-        ref = self._make_detail_panel(ref_title, ref_opts, None, lambda _: None)
+        ref = self._make_detail_panel(ref_title, ref_opts, exclusive=False, preset=None,
+                                      on_change_cb=lambda _: None)
         ref.setParent(self)  # keep within app for style metrics
         h = ref.sizeHint().height() + 12  # small buffer per card
-        ref.setParent(None)
+        ref.deleteLater()
         spacing = 10
         cushion = 20
         return h * 3 + spacing * 2 + cushion
 
-    def _rebuild_detail_panels(self):
-        """Render follow-ups for all active categories (+ intent if 'inne')."""
-        self._clear_detail_panels()
-        if not self.ds_id:
-            return
-        row = get_tweet_row(self.con, self.ds_id, self.cursor)
-        if not row:
-            return
-
-        labels_count = len(LABELS)
-        label_vals = {col: bool(v)
-                      for (col, v) in zip([c for _, c in LABELS], row[3:3 + labels_count])}
-        detail_cols = [c for _, c in LABELS if c != "inne"]
-        details_start = 3 + labels_count
-        details_vals: dict[str, str] = {}
-        for i, det_col in enumerate(detail_cols):
-            val = row[details_start + i]
-            details_vals[f"{det_col}_detail"] = "" if val is None else str(val)
-        intent_val = int(row[details_start + len(detail_cols)])
-
-        active_topics = [col for col, active in label_vals.items()
-                         if active and col in DETAIL_QUESTIONS]
-        want_intent = label_vals.get("inne", False)
-
-        for col in active_topics:
-            qtxt, opts = DETAIL_QUESTIONS[col]
-            raw = details_vals.get(f"{col}_detail", "")
-            preset_set = _parse_detail_value(raw)  # set[int]
-
-            def make_cb(topic=col, options=opts):
-                # receives set[int]
-                return lambda selected_set: self._save_detail_choice(topic, selected_set)
+    @staticmethod
+    def _detail_keys(labels: dict) -> list[str]:
+        """Follow-up panels for the ticked categories, in display order."""
+        keys = [col for col, active in labels.items() if active and col in DETAIL_QUESTIONS]
+        if labels.get("inne", False):
+            keys.append("intent")
+        return keys
 
-            panel = self._make_detail_panel(qtxt, opts, exclusive=False,
-                                            preset=preset_set, on_change_cb=make_cb())
-            self.detail_vbox.addWidget(panel)
-
-        if want_intent:
+    def _detail_card(self, key: str, details: dict, intent_val: int) -> QFrame:
+        if key == "intent":
             qtxt, opts = INTENT_QUESTION
-            cur_idx = intent_val if intent_val >= 0 else None
+            card = self._make_detail_panel(qtxt, opts, exclusive=True,
+                                           preset=intent_val if intent_val >= 0 else None,
+                                           on_change_cb=self._save_intent_choice)
+        else:
+            qtxt, opts = DETAIL_QUESTIONS[key]
+            card = self._make_detail_panel(qtxt, opts, exclusive=False, preset=details[key],
+                                           on_change_cb=lambda selected_set, topic=key:
+                                               self._save_detail_choice(topic, selected_set))
+        if self.act_rapid.isChecked():
+            card.findChild(ChoiceRow).set_key_hints(RAPID_OPTION_KEYS)
+        return card
 
-            panel = self._make_detail_panel(qtxt, opts, exclusive=True,
-                                            preset=cur_idx,
-                                            on_change_cb=self._save_intent_choice)
-            self.detail_vbox.addWidget(panel)
+    def _insert_detail_card(self, key: str):
+        """Add one follow-up card in place (rapid mode; no rebuild, no DB read)."""
+        d = self._draft
+        order = self._detail_keys(d.labels)
+        pos = sum(1 for k in self._detail_cards if order.index(k) < order.index(key))
+        card = self._detail_card(key, d.details, d.intent)
+        self.detail_vbox.insertWidget(pos, card)
+        self._detail_cards = {k: self._detail_cards.get(k, card) for k in order}
+        self._detail_gen += 1
+        LAYOUT.schedule(self._update_detail_host_minheight, phase=1)
+
+    def _remove_detail_card(self, key: str):
+        card = self._detail_cards.pop(key, None)
+        if card is None:
+            return
+        self.detail_vbox.removeWidget(card)
+        card.hide()
+        card.deleteLater()
+        self._detail_gen += 1
+        if self._rapid_focus == key:
+            self._set_rapid_focus(self._draft.missing_followup() if self._draft else None)
+        LAYOUT.schedule(self._update_detail_host_minheight, phase=1)
 
-        self._update_detail_host_minheight()
+    def _rebuild_detail_panels(self):
+        """Render follow-ups for all active categories (+ intent if 'inne')."""
+        self._clear_detail_panels()
+        if not self.ds_id or self._draft is None:
+            return
+        d = self._draft
+        for key in self._detail_keys(d.labels):
+            card = self._detail_card(key, d.details, d.intent)
+            self.detail_vbox.addWidget(card)
+            self._detail_cards[key] = card
+
+        # after the new rows' first wrap pass, which may change their height
+        LAYOUT.schedule(self._update_detail_host_minheight, phase=1)
         self._enforce_min_window_width()
 
     def _save_detail_choice(self, topic_col: str, selected_set: set[int]):
-        if self._loading or not self.ds_id:
-            return
-        row = get_tweet_row(self.con, self.ds_id, self.cursor)
-        if not row:
+        if self._loading or not self.ds_id or self._draft is None:
             return
-        tweet_id = row[0]
-        save_detail(self.con, tweet_id, topic_col, selected_set)
-        self.refresh_progress()
+        self._rec("detail", col=topic_col, sel=sorted(selected_set))
+        self._draft.set_detail(topic_col, selected_set)
+        self._draft_changed()
 
     def _save_intent_choice(self, idx: int):
-        if self._loading or not self.ds_id:
-            return
-        row = get_tweet_row(self.con, self.ds_id, self.cursor)
-        if not row:
+        if self._loading or not self.ds_id or self._draft is None:
             return
-        tweet_id = row[0]
-        save_intent(self.con, tweet_id, idx)
-        self.refresh_progress()
+        self._rec("intent", i=idx)
+        self._draft.set_intent(idx)
+        self._draft_changed()
+
+    def _report_saved(self, n_saved: int):
+        """Show in the status label when a save also reached duplicates."""
+        if self.act_uncertain_first.isChecked():
+            self.learner.note_saved()
+        if n_saved > 1:
+            self.status_lbl.setText(f"Sesja #{self.ds_id} — zapisano {n_saved} tweety (z duplikatami)")
+        else:
+            self.status_lbl.setText(f"Sesja #{self.ds_id}")
 
     # ---------- Required follow-ups validation ----------
     def _validate_required_followups(self) -> tuple[bool, str]:
-        row = get_tweet_row(self.con, self.ds_id, self.cursor)
-        if not row:
+        if self._draft is None:
             return True, ""
-
-        labels_count = len(LABELS)
-        vals = {col: bool(v)
-                for (col, v) in zip([c for _, c in LABELS], row[3:3 + labels_count])}
-        detail_cols = [c for _, c in LABELS if c != "inne"]
-        details_start = 3 + labels_count
-        details_vals = {}
-        for i, det_col in enumerate(detail_cols):
-            details_vals[f"{det_col}_detail"] = "" if row[details_start + i] is None else str(row[details_start + i])
-        intent_val = int(row[details_start + len(detail_cols)])
+        vals, details, intent_val = self._draft.labels, self._draft.details, self._draft.intent
 
         for col in DETAIL_QUESTIONS.keys():
             if vals.get(col, False):
-                raw = details_vals.get(f"{col}_detail", "")
-                if not _parse_detail_value(raw):
-                    disp = next(name for name, c in LABELS if c == col)
+                if not details.get(col):
+                    disp = SCHEMA.label_names[col]
                     return False, f"Zaznacz co najmniej jedną odpowiedź w pytaniu doprecyzowującym dla „{disp}”."
         if vals.get("inne", False) and intent_val < 0:
             return False, "Zaznacz odpowiedź w pytaniu o główną intencję wypowiedzi (dla „INNE”)."
@@ -1187,27 +5177,91 @@ class TaggerWindow(QMainWindow):
         self.btn_back.setEnabled(enabled)
         self.btn_next.setEnabled(enabled)
         self.act_export.setEnabled(self.ds_id is not None)
+        self.act_export_delta.setEnabled(self.ds_id is not None)
+        self.act_undo_prop.setEnabled(enabled)
+        self.act_prelabel.setEnabled(enabled)
+        for act in (self.act_next_gap, self.act_prev_gap, self.act_next_missing, self.act_goto, self.act_overview, self.act_report):
+            act.setEnabled(enabled)
         self.detail_scroll.setEnabled(enabled)
 
     def load_dataset(self, ds_id, cursor, total):
+        self._rec("dataset", ds=ds_id, idx=cursor, total=total)
         self._stop_timer()
+        self._park_session()
         self.ds_id = ds_id
         self.cursor = max(0, min(cursor, total - 1 if total else 0))
         self.total = total
+        session = self._sessions.pop(ds_id, {})
+        self._nav_history = deque(session.get("history", ()), maxlen=NAV_HISTORY_MAX)
+        self.learner.reset(ds_id, session.get("model"))
+        open_ids = [r[0] for r in load_open_datasets(self.con)]
+        if ds_id not in open_ids:
+            set_open_datasets(open_ids + [ds_id])
+        if self.act_uncertain_first.isChecked():
+            self.learner.request()
+            self._al_timer.start()
         set_active_dataset(ds_id)
         self.status_lbl.setText(f"Sesja #{ds_id}")
         self.update_ui_enabled(True)
         self.refresh_progress()
         self.load_current_tweet()
 
+    def _park_session(self):
+        """Keep the current dataset's in-memory state for a later switch back."""
+        if self.ds_id is not None:
+            self._sessions[self.ds_id] = {"history": self._nav_history, "model": self.learner.state}
+
+    def switch_dataset(self, ds_id):
+        if ds_id == self.ds_id:
+            return
+        cur = self.con.cursor()
+        cur.execute("SELECT cursor, total FROM datasets WHERE id=?", (ds_id,))
+        row = cur.fetchone()
+        if row:
+            self.load_dataset(ds_id, *row)
+
+    def _fill_datasets_menu(self):
+        self.m_datasets.clear()
+        self.m_datasets.addAction(self.act_next_dataset)
+        self.m_datasets.addSeparator()
+        for ds_id, name, _cursor, total, done in load_open_datasets(self.con):
+            act = self.m_datasets.addAction(f"#{ds_id} {name} — {done}/{total}")
+            act.setCheckable(True)
+            act.setChecked(ds_id == self.ds_id)
+            act.triggered.connect(lambda _=False, i=ds_id: self.switch_dataset(i))
+
+    def on_next_dataset(self):
+        ids = [r[0] for r in load_open_datasets(self.con)]
+        if not ids:
+            return
+        pos = ids.index(self.ds_id) if self.ds_id in ids else -1
+        self.switch_dataset(ids[(pos + 1) % len(ids)])
+
     def refresh_progress(self):
         if not self.ds_id:
             self.progress.setText("Postęp: —"); self.lbl_pos.setText("—/—"); return
-        done, total = count_annotated(self.con, self.ds_id)
-        self.progress.setText(f"Postęp: {done}/{total}")
         self.lbl_pos.setText(f"{self.cursor+1}/{self.total}")
-        self.btn_back.setEnabled(self.ds_id is not None and self.cursor > 0)
+        self.btn_back.setEnabled(self.ds_id is not None and (self.cursor > 0 or bool(self._nav_history)))
         self.btn_next.setEnabled(self.ds_id is not None and self.total > 0)
+        # counts come from the worker, behind the writes queued so far; one query in flight
+        if self._progress_queued:
+            self._progress_dirty = True
+            return
+        self._progress_queued = True
+        self.db.submit(dataset_progress, self.ds_id, then=lambda res, ds=self.ds_id: self._show_progress(ds, res))
+
+    def _show_progress(self, ds_id, res):
+        self._progress_queued = False
+        if self._progress_dirty:
+            self._progress_dirty = False
+            self.refresh_progress()
+        if ds_id != self.ds_id:
+            return
+        done, total, dups, reused = res
+        extra = []
+        if dups: extra.append(f"duplikaty: {dups}")
+        if reused: extra.append(f"z pamięci: {reused}")
+        self.progress.setText(f"Postęp: {done}/{total}" + (f" ({', '.join(extra)})" if extra else ""))
 
     def load_current_tweet(self):
         self._stop_timer()
@@ -1216,6 +5270,7 @@ class TaggerWindow(QMainWindow):
             self._show_tweet_centered("Zaimportuj CSV z kolumną 'tweets'…")
             for t in self.tiles.values(): t.setChecked(False)
             self._current_tweet_id = None
+            self._draft = None
             self._loading = False
             self._clear_detail_panels()
             return
@@ -1223,80 +5278,102 @@ class TaggerWindow(QMainWindow):
         row = get_tweet_row(self.con, self.ds_id, self.cursor)
         if not row: return
         self._loading = True
-        tweet_id = row[0]
-        text = row[1]
+        tweet_id = row.id
+        text = row.text
 
         # NEW: mark first time the tweet was seen
-        now_str = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        cur = self.con.cursor()
-        cur.execute(
-            "UPDATE tweets SET first_seen_at = COALESCE(first_seen_at, ?) WHERE id=?",
-            (now_str, tweet_id)
-        )
-        self.con.commit()
-
-        labels_count = len(LABELS)
-        label_vals_seq = row[3:3+labels_count]
-
-        self._show_tweet_centered(text)
-        for (name, col), val in zip(LABELS, label_vals_seq):
-            self.tiles[col].setChecked(bool(val))
+        if row.first_seen_at is None:
+            self.db.submit(mark_first_seen, tweet_id, datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
+        # answers still on their way to the DB win over the row
+        inflight = self._unsaved.get(tweet_id)
+        self._draft = inflight[1].resume() if inflight else AnnotationDraft(row)
+
+        # tiles from the pre-labels stored at import; matching here only finds the spans
+        suggested = _suggested_cols(row.suggested)
+        self._show_tweet_centered(text, [(a, b) for a, b, _ in self.matcher.finditer(text)])
+        for col, val in self._draft.labels.items():
+            self.tiles[col].setChecked(val)
+            self._set_tile_suggested(self.tiles[col], col in suggested)
 
         self._loading = False
         self._start_timer(tweet_id)
         self._rebuild_detail_panels()
+        if self.act_rapid.isChecked():
+            self._set_rapid_focus(self._draft.missing_followup() or next(iter(self._detail_cards), None))
         self._resize_tiles_square()
 
-    def on_tile_toggled(self, _checked: bool):
-        if self._loading or not self.ds_id:
+    def _set_tile_suggested(self, tile: SquareTile, flag: bool):
+        if bool(tile.property("suggested")) == flag:
             return
+        tile.setProperty("suggested", flag)
+        tile.style().unpolish(tile); tile.style().polish(tile)
 
-        # read current DB state BEFORE change to detect which category got unticked
-        row = get_tweet_row(self.con, self.ds_id, self.cursor)
-        if not row:
+    def on_prelabel(self):
+        """Reload the lexicon and recompute suggested tiles for the whole dataset."""
+        if not self.ds_id:
             return
-        tweet_id = row[0]
-        labels_count = len(LABELS)
-        prev_vals = {col: bool(v) for (col, v) in zip([c for _, c in LABELS], row[3:3+labels_count])}
-
-        # save new labels
-        label_values = {col: self.tiles[col].isChecked() for _, col in LABELS}
-        save_labels_for(self.con, tweet_id, label_values, mark_annotated=True)
-
-        # wipe follow-ups for any category that just got unticked
-        for _, col in LABELS:
-            was = prev_vals.get(col, False)
-            now = label_values.get(col, False)
-            if was and not now:
-                if col == "inne":
-                    clear_intent(self.con, tweet_id)
-                elif col in DETAIL_QUESTIONS:
-                    clear_detail(self.con, tweet_id, col)
+        try:
+            self.matcher = KeywordMatcher(load_lexicon())
+        except Exception as e:
+            QMessageBox.critical(self, "Błąd słownika", str(e)); return
+        ds_id, t0 = self.ds_id, time.perf_counter()
+        self.status_lbl.setText(f"Sesja #{ds_id} — przeliczanie sugestii w tle…")
+        self.db.submit(prelabel_dataset, ds_id, self.matcher,
+                       then=lambda hits: self._prelabel_done(ds_id, hits, time.perf_counter() - t0))
+
+    def _prelabel_done(self, ds_id, hits: int, dt: float):
+        if ds_id != self.ds_id:
+            return
+        self.status_lbl.setText(f"Sesja #{ds_id}")
+        self.load_current_tweet()
+        QMessageBox.information(
+            self, "Sugestie przeliczone",
+            f"Tweety z sugestiami: {hits}/{self.total} ({self.total / max(dt, 1e-9):.0f} tweetów/s)."
+        )
 
-        self.refresh_progress()
+    def on_tile_toggled(self, checked: bool, col: str = None):
+        if self._loading or not self.ds_id:
+            return
+        self._rec("tile", col=col, on=checked)
+        if self._draft is None:
+            return
+        if self.act_rapid.isChecked():
+            self._rapid_labels_changed()
+            return
+        # the draft wipes follow-ups of an unticked category, on screen and in the DB
+        for c in SCHEMA.label_cols:
+            if self.tiles[c].isChecked() != self._draft.labels[c]:
+                self._draft.set_label(c, self.tiles[c].isChecked())
+        self._flush_draft()
         self._rebuild_detail_panels()
 
     def on_next(self):
         if not self.ds_id: return
+        self._rec("next")
 
+        self._flush_draft()
         ok, msg = self._validate_required_followups()
         if not ok:
-            QMessageBox.information(self, "Brak odpowiedzi", msg)
+            if self.act_rapid.isChecked():
+                # keep the hands on the keyboard: point at the panel instead of a dialog
+                self._set_rapid_focus(self._draft.missing_followup())
+                self.status_lbl.setText(msg)
+            else:
+                QMessageBox.information(self, "Brak odpowiedzi", msg)
             return
 
         # NEW: set last_seen_at for the tweet we are leaving (only on Next)
-        try:
-            row = get_tweet_row(self.con, self.ds_id, self.cursor)
-            if row:
-                current_tweet_id = row[0]
-                now_str = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                cur = self.con.cursor()
-                cur.execute("UPDATE tweets SET last_seen_at=? WHERE id=?", (now_str, current_tweet_id))
-                self.con.commit()
-        except Exception:
-            pass  # don’t break navigation if anything odd happens
-
-        if self.cursor >= self.total - 1:
+        if self._draft is not None:
+            self.db.submit(mark_last_seen, self._draft.tweet_id, datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
+
+        nxt = None
+        if self.act_uncertain_first.isChecked():
+            nxt = next_priority_idx(self.con, self.ds_id, self.cursor)
+        if nxt is None:
+            # skip tweets whose answers were propagated from an identical one
+            nxt = next_own_idx(self.con, self.ds_id, self.cursor, skip_reused=self.act_skip_reused.isChecked())
+        if nxt is None:
+            self.db.drain()  # the count must include the answers still queued
             done, total = count_annotated(self.con, self.ds_id)
             if done == total:
                 self._stop_timer()
@@ -1310,51 +5387,325 @@ class TaggerWindow(QMainWindow):
             else:
                 self._stop_timer()
                 missing = total - done
-                resp = QMessageBox.question(
-                    self, "Nie wszystkie tweety oznaczone",
-                    f"Pozostało {missing} nieoznaczonych tweetów.\nCzy mimo to chcesz wyeksportować?",
-                    QMessageBox.Yes | QMessageBox.No, QMessageBox.No
+                first = find_idx(self.con, self.ds_id, -1, forward=True)
+                where = f" Pierwszy z nich to #{first + 1}." if first is not None else ""
+                box = QMessageBox(
+                    QMessageBox.Question, "Nie wszystkie tweety oznaczone",
+                    f"Pozostało {missing} nieoznaczonych tweetów.{where}\nCzy mimo to chcesz wyeksportować?",
+                    QMessageBox.Yes | QMessageBox.No, self
                 )
-                if resp == QMessageBox.Yes: self.on_export()
+                box.setDefaultButton(QMessageBox.No)
+                btn_go = box.addButton("Przejdź do nieoznaczonego", QMessageBox.ActionRole) if first is not None else None
+                box.exec()
+                if btn_go is not None and box.clickedButton() is btn_go:
+                    self._jump_to(first)
+                elif box.standardButton(box.clickedButton()) == QMessageBox.Yes:
+                    self.on_export()
+                elif self._draft is not None:
+                    self._start_timer(self._draft.tweet_id)
                 return
 
-        self.cursor += 1
-        set_dataset_cursor(self.con, self.ds_id, self.cursor)
+        self._nav_history.append(self.cursor)
+        self.cursor = nxt
+        self.db.submit(set_dataset_cursor, self.ds_id, self.cursor)
+        self.refresh_progress()
+        self.load_current_tweet()
+
+    def _jump_to(self, idx: int):
+        """Show tweet `idx` directly (no validation, one render); Back returns here."""
+        if not self.ds_id or idx is None or not (0 <= idx < self.total) or idx == self.cursor:
+            return
+        self._rec("jump", idx=idx)
+        self._nav_history.append(self.cursor)
+        self.cursor = idx
+        self.db.submit(set_dataset_cursor, self.ds_id, self.cursor)
+        self.refresh_progress()
+        self.load_current_tweet()
+
+    def on_jump_gap(self, *, forward: bool, missing_followup: bool = False):
+        if not self.ds_id:
+            return
+        idx = find_idx(self.con, self.ds_id, self.cursor, forward=forward, missing_followup=missing_followup)
+        if idx is None:
+            self.status_lbl.setText(
+                f"Sesja #{self.ds_id} — "
+                + ("brak brakujących odpowiedzi" if missing_followup else "brak nieoznaczonych tweetów")
+            )
+            return
+        self._jump_to(idx)
+
+    def on_goto(self):
+        if not self.ds_id or not self.total:
+            return
+        n, ok = QInputDialog.getInt(self, "Przejdź do", f"Numer tweetu (1–{self.total}):",
+                                    self.cursor + 1, 1, self.total)
+        if ok:
+            self._jump_to(n - 1)
+
+    def on_overview(self):
+        if not self.ds_id:
+            return
+        if self.overview is None:
+            self.overview = OverviewWindow(self)
+        self._sync_storage()
+        self.overview.set_dataset(self.ds_id)
+        self.overview.show(); self.overview.raise_()
+
+    def on_bulk_applied(self, ds_id, changed: int):
+        if ds_id != self.ds_id:
+            return
+        self.status_lbl.setText(f"Sesja #{self.ds_id} — zmieniono {changed} tweetów")
         self.refresh_progress()
         self.load_current_tweet()
 
+    def on_undo_propagation(self):
+        if not self.ds_id:
+            return
+        self._flush_draft()
+        if self._draft is not None:
+            self.db.submit(undo_propagation, self._draft.tweet_id, then=self._propagation_undone)
+
+    def _propagation_undone(self, n: int):
+        self.refresh_progress()
+        QMessageBox.information(
+            self, "Cofnięto propagację",
+            f"Przywrócono {n} duplikatów do stanu nieoznaczonego." if n
+            else "Ten tweet nie przekazał odpowiedzi żadnym duplikatom."
+        )
+
+    def on_idle_after(self):
+        n, ok = QInputDialog.getInt(
+            self, "Pomiar czasu",
+            "Czas aktywny zatrzymuje się po tylu sekundach bez klawiatury i myszy:",
+            int(self.activity.idle_after), 5, 3600
+        )
+        if ok:
+            set_idle_after(n)
+            self.activity.idle_after = float(n)
+
+    def on_toggle_uncertain_first(self, checked: bool):
+        set_uncertain_first(checked)
+        if checked and self.ds_id:
+            self.learner.request()
+            self._al_timer.start()
+        else:
+            self._al_timer.stop()
+
+    def _poll_learner(self):
+        if self.learner.poll():
+            self.status_lbl.setText(f"Sesja #{self.ds_id} — zaktualizowano kolejność")
+
+    def _poll_backups(self):
+        result = self.backups.tick(auto=self.act_auto_backup.isChecked())
+        if result is None:
+            return
+        manual, self._backup_manual = self._backup_manual, False
+        if isinstance(result, Exception):
+            self.status_lbl.setText(f"Kopia zapasowa nie powiodła się: {result}")
+            if manual:
+                QMessageBox.critical(self, "Błąd kopii zapasowej", str(result))
+        elif manual:
+            QMessageBox.information(self, "Kopia zapasowa", f"Zapisano kopię:\n{result}")
+
+    def on_backup_now(self):
+        self._sync_storage()  # the snapshot includes the last answers
+        if not self.backups.start():
+            QMessageBox.information(self, "Kopia zapasowa", "Kopia jest właśnie tworzona.")
+            return
+        self._backup_manual = True
+        QTimer.singleShot(500, self._poll_backups)
+
+    def on_restore_backup(self):
+        path, _ = QFileDialog.getOpenFileName(
+            self, "Wybierz kopię zapasową", self.backups.dest_dir, "SQLite (*.sqlite3)"
+        )
+        if not path:
+            return
+        ans = QMessageBox.question(
+            self, "Przywrócić kopię?",
+            f"Zastąpić bieżącą bazę kopią:\n{os.path.basename(path)}\n\n"
+            "Obecny stan zostanie najpierw zapisany jako nowa kopia."
+        )
+        if ans != QMessageBox.Yes:
+            return
+        self._stop_timer()
+        self.db.drain()
+        self.reports.drain()
+        self.learner.shutdown()  # its worker holds a connection to the DB
+        try:
+            before = restore_backup(self.con, path, self.backups.dest_dir)
+        except Exception as e:
+            QMessageBox.critical(self, "Błąd przywracania", str(e))
+            row = get_tweet_row(self.con, self.ds_id, self.cursor) if self.ds_id else None
+            if row: self._start_timer(row.id)
+            return
+        self._sessions.clear()
+        self.ds_id = None
+        state = load_active_dataset(self.con)
+        if state:
+            self.load_dataset(*state)
+        else:
+            set_active_dataset(None)
+            self.cursor = 0; self.total = 0
+            self.status_lbl.setText("Brak sesji")
+            self._current_tweet_id = None
+            self._show_tweet_centered("Zaimportuj CSV z kolumną 'tweets'…")
+            self._clear_detail_panels()
+            for t in self.tiles.values(): t.setChecked(False)
+            self.update_ui_enabled(False)
+            self.refresh_progress()
+        QMessageBox.information(
+            self, "Przywrócono kopię",
+            f"Baza przywrócona z:\n{os.path.basename(path)}\n\nPoprzedni stan zapisano jako:\n{os.path.basename(before)}"
+        )
+
+    def on_maintenance(self):
+        ans = QMessageBox.question(
+            self, "Konserwacja bazy",
+            "Przenieść wszystkie wyeksportowane zbiory do plików archiwum i odzyskać wolne miejsce?\n"
+            "Zarchiwizowany zbiór można później przywrócić."
+        )
+        if ans != QMessageBox.Yes:
+            return
+        # on the DB worker, behind the queued saves: annotation goes on during the VACUUM
+        self.act_maintenance.setEnabled(False)
+        self.status_lbl.setText("Konserwacja bazy w tle…")
+        self.db.submit(lambda con: maintain(con, full=True, older_than_days=0),
+                       then=self._manual_maintenance_done, fail=self._manual_maintenance_failed)
+
+    def _manual_maintenance_done(self, report: dict):
+        self.act_maintenance.setEnabled(True)
+        self._maintenance_done(report)
+        QMessageBox.information(self, "Konserwacja zakończona", format_maintenance_report(report))
+
+    def _manual_maintenance_failed(self, msg: str):
+        self.act_maintenance.setEnabled(True)
+        self._maintenance_failed(msg)
+        QMessageBox.critical(self, "Błąd konserwacji", msg)
+
+    def run_scheduled_maintenance(self):
+        """Scheduled maintain() on the DB worker, behind the queued saves; annotation goes on."""
+        self.status_lbl.setText("Konserwacja bazy w tle…")
+        self.db.submit(maintain, then=self._maintenance_done, fail=self._maintenance_failed)
+
+    def _maintenance_done(self, report: dict):
+        archived = ", ".join(f"#{i}" for i in report["archived"]) or "brak"
+        self.status_lbl.setText(f"Konserwacja bazy zakończona (zarchiwizowane zbiory: {archived})")
+
+    def _maintenance_failed(self, msg: str):
+        # last_maintenance is not updated, so it is retried at the next start
+        self.status_lbl.setText(f"Konserwacja bazy nie powiodła się: {msg}")
+
+    def on_unarchive(self):
+        archived = list_archived_datasets(self.con)
+        if not archived:
+            QMessageBox.information(self, "Archiwum", "Brak zarchiwizowanych zbiorów.")
+            return
+        items = [f"#{ds_id} {name} — {total} tweetów (eksport {exported_at or '?'})"
+                 for ds_id, name, total, exported_at in archived]
+        item, ok = QInputDialog.getItem(self, "Przywróć zbiór z archiwum", "Zbiór:", items, 0, False)
+        if not ok:
+            return
+        ds_id = archived[items.index(item)][0]
+        try:
+            restore_archived_dataset(self.con, ds_id)
+        except Exception as e:
+            QMessageBox.critical(self, "Błąd przywracania", str(e))
+            return
+        cur = self.con.cursor()
+        cur.execute("UPDATE datasets SET exported=0 WHERE id=?", (ds_id,))
+        self.con.commit()
+        cur.execute("SELECT cursor, total FROM datasets WHERE id=?", (ds_id,))
+        self.load_dataset(ds_id, *cur.fetchone())
+
     def on_back(self):
-        if not self.ds_id or self.cursor <= 0: return
+        if not self.ds_id: return
+        self._rec("back")
+        if self._nav_history:
+            self.cursor = self._nav_history.pop()
+            self.db.submit(set_dataset_cursor, self.ds_id, self.cursor)
+            self.refresh_progress()
+            self.load_current_tweet()
+            return
+        if self.cursor <= 0: return
         self.cursor -= 1
-        set_dataset_cursor(self.con, self.ds_id, self.cursor)
+        self.db.submit(set_dataset_cursor, self.ds_id, self.cursor)
         self.refresh_progress()
         self.load_current_tweet()
 
     def on_import_csv(self):
-        if self.ds_id is not None:
+        suffixes = [s + z for s in READER_SUFFIXES for z in ("", *_DECOMPRESSORS)]
+        path, _ = QFileDialog.getOpenFileName(
+            self, "Wybierz plik z tweetami", "",
+            f"Tweety ({' '.join('*' + s for s in suffixes)});;Wszystkie pliki (*)"
+        )
+        if not path: return
+        fmt, field = detect_format(path), None
+        if fmt is None:
+            fmt, ok = QInputDialog.getItem(self, "Format pliku", "Format:", list(READERS), 0, False)
+            if not ok: return
+        if fmt == "jsonl":
+            field, ok = QInputDialog.getText(self, "Import JSONL", "Pole z treścią tweetu:",
+                                             QLineEdit.Normal, READERS["jsonl"][1])
+            if not ok or not field.strip(): return
+            field = field.strip()
+        QApplication.setOverrideCursor(Qt.WaitCursor)
+        try:
+            ds_id, total = import_source(self.con, path, fmt=fmt, field=field)
+        except Exception as e:
+            QApplication.restoreOverrideCursor()
+            QMessageBox.critical(self, "Błąd importu", str(e)); return
+        QApplication.restoreOverrideCursor()
+        self.load_dataset(ds_id, cursor=0, total=total)
+        reused = count_reused(self.con, ds_id)
+        if reused:
             QMessageBox.information(
-                self, "Import zablokowany",
-                "Aby zaimportować nowy plik, najpierw wyeksportuj bieżący CSV."
+                self, "Pamięć anotacji",
+                f"{reused} tweetów oznaczono już we wcześniejszych zbiorach — odpowiedzi zostały uzupełnione."
             )
-            return
-        path, _ = QFileDialog.getOpenFileName(self, "Wybierz plik CSV", "", "CSV (*.csv)")
-        if not path: return
+
+    def on_import_folder(self):
+        folder = QFileDialog.getExistingDirectory(self, "Wybierz folder z plikami CSV")
+        if not folder: return
+        progress = QProgressDialog("Import plików…", "Przerwij", 0, 1, self)
+        progress.setWindowTitle("Import folderu")
+        progress.setWindowModality(Qt.WindowModal)
+        progress.setMinimumDuration(0)
+
+        def on_progress(done, files, rows):
+            progress.setMaximum(files)
+            progress.setValue(done)
+            progress.setLabelText(f"Plik {done} z {files} — {rows} tweetów")
+            QApplication.processEvents()
+            if progress.wasCanceled():
+                raise ImportCancelled()
+
         try:
-            ds_id, total = create_dataset_from_csv(self.con, path)
+            ds_id, total = import_csv_folder(self.con, folder, progress=on_progress)
+        except ImportCancelled:
+            progress.close(); return
         except Exception as e:
+            progress.close()
             QMessageBox.critical(self, "Błąd importu", str(e)); return
+        progress.close()
         self.load_dataset(ds_id, cursor=0, total=total)
+        reused = count_reused(self.con, ds_id)
+        if reused:
+            QMessageBox.information(
+                self, "Pamięć anotacji",
+                f"{reused} tweetów oznaczono już we wcześniejszych zbiorach — odpowiedzi zostały uzupełnione."
+            )
 
     def on_export(self):
         if not self.ds_id:
             QMessageBox.information(self, "Brak sesji", "Najpierw zaimportuj plik CSV.")
             return
-        self._stop_timer()
+        ds_id = self.ds_id
 
         # build default filename
         cur = self.con.cursor()
-        cur.execute("SELECT name FROM datasets WHERE id=?", (self.ds_id,))
-        name = cur.fetchone()[0] or f"dataset_{self.ds_id}"
+        cur.execute("SELECT name FROM datasets WHERE id=?", (ds_id,))
+        name = cur.fetchone()[0] or f"dataset_{ds_id}"
         default_name = os.path.splitext(name)[0] + "_annotated.csv"
 
         # pick a safe, writable default dir
@@ -1368,8 +5719,6 @@ class TaggerWindow(QMainWindow):
         )
 
         if not out_path:
-            row = get_tweet_row(self.con, self.ds_id, self.cursor)
-            if row: self._start_timer(row[0])
             return
 
         # ensure the target directory is writable
@@ -1379,8 +5728,6 @@ class TaggerWindow(QMainWindow):
                 os.makedirs(target_dir, exist_ok=True)
             except Exception as e:
                 QMessageBox.critical(self, "Błąd zapisu", f"Nie można utworzyć folderu:\n{target_dir}\n\n{e}")
-                row = get_tweet_row(self.con, self.ds_id, self.cursor)
-                if row: self._start_timer(row[0])
                 return
 
         if not os.access(target_dir, os.W_OK):
@@ -1388,33 +5735,189 @@ class TaggerWindow(QMainWindow):
                 self, "Błąd zapisu",
                 "Wybrany folder nie pozwala na zapis. Wybierz inny (np. Dokumenty)."
             )
-            row = get_tweet_row(self.con, self.ds_id, self.cursor)
-            if row: self._start_timer(row[0])
             return
 
-        # do the export
-        try:
-            export_dataset_to_csv(self.con, self.ds_id, out_path)
-            # remember last successful folder
-            settings.setValue("last_export_dir", target_dir)
-        except Exception as e:
-            QMessageBox.critical(self, "Błąd eksportu", str(e))
-            row = get_tweet_row(self.con, self.ds_id, self.cursor)
-            if row: self._start_timer(row[0])
+        # do the export: a snapshot taken once the answers so far are stored;
+        # annotation goes on meanwhile
+        self.status_lbl.setText(f"Sesja #{ds_id} — eksport w tle…")
+        self._after_writes(lambda: self.reports.submit(
+            export_snapshot, ds_id, out_path,
+            then=lambda res: self._export_done(ds_id, out_path, *res),
+            fail=lambda msg: QMessageBox.critical(self, "Błąd eksportu", msg)))
+
+    def _export_done(self, ds_id, out_path, rows: int, revision: int):
+        QSettings(ORG_NAME, APP_NAME).setValue("last_export_dir", os.path.dirname(out_path))  # last good folder
+        self.db.submit(record_export_checkpoint, ds_id, revision, "full", rows, out_path)
+        self.db.submit(count_changed_since, ds_id, revision,
+                       then=lambda later: self._export_finished(ds_id, out_path, later))
+
+    def _export_finished(self, ds_id, out_path, later: int):
+        if ds_id == self.ds_id:
+            self.status_lbl.setText(f"Sesja #{ds_id} — wyeksportowano")
+        if later:
+            # answers given during the export are not in the file: keep the dataset open
+            QMessageBox.information(
+                self, "Eksport zakończony",
+                f"Zapisano plik:\n{os.path.basename(out_path)}\n\n"
+                f"W trakcie eksportu zmieniono {later} tweetów; zbiór pozostaje otwarty, "
+                f"a te zmiany obejmie „Eksport zmian”."
+            )
             return
-
         QMessageBox.information(self, "Eksport zakończony", f"Zapisano plik:\n{os.path.basename(out_path)}")
 
+        self.db.submit(mark_dataset_exported, ds_id)
+        self._sessions.pop(ds_id, None)
+        remaining = [r for r in load_open_datasets(self.con) if r[0] != ds_id]
+        set_open_datasets([r[0] for r in remaining])
+        if ds_id != self.ds_id:
+            return  # the annotator moved to another dataset meanwhile
+        if remaining:
+            self.ds_id = None  # nothing to park
+            _id, _name, cursor, total, _done = remaining[-1]
+            self.load_dataset(_id, cursor, total)
+            return
+
+        self._stop_timer()
         set_active_dataset(None)
         self.ds_id = None; self.cursor = 0; self.total = 0
         self.status_lbl.setText("Brak sesji")
         self._current_tweet_id = None
         self._last_start_mono = None
+        self._draft = None
         self._show_tweet_centered("Zaimportuj CSV z kolumną 'tweets'…")
         for t in self.tiles.values(): t.setChecked(False)
         self.update_ui_enabled(False)
         self.refresh_progress()
 
+    def on_export_delta(self):
+        """Partial-progress export: only tweets changed since the last (full or delta) export."""
+        if not self.ds_id:
+            return
+        ds_id = self.ds_id
+        cur = self.con.cursor()
+        cur.execute("SELECT name FROM datasets WHERE id=?", (ds_id,))
+        name = cur.fetchone()[0] or f"dataset_{ds_id}"
+        settings = QSettings(ORG_NAME, APP_NAME)
+        docs_dir = QStandardPaths.writableLocation(QStandardPaths.DocumentsLocation) or os.path.expanduser("~")
+        last_dir = settings.value("last_export_dir", docs_dir)
+        default_name = f"{os.path.splitext(name)[0]}_zmiany_{datetime.now():%Y%m%d-%H%M}.csv"
+        out_path, _ = QFileDialog.getSaveFileName(
+            self, "Zapisz CSV ze zmianami", os.path.join(last_dir, default_name), "CSV (*.csv)"
+        )
+        if not out_path:
+            return
+        self.status_lbl.setText(f"Sesja #{ds_id} — eksport zmian w tle…")
+        self._flush_draft()
+        # the last checkpoint, read behind the queued answers, then the snapshot
+        self.db.submit(last_export_revision, ds_id, then=lambda since: self.reports.submit(
+            export_snapshot, ds_id, out_path, since,
+            then=lambda res: self._delta_done(ds_id, out_path, *res),
+            fail=lambda msg: QMessageBox.critical(self, "Błąd eksportu", msg)))
+
+    def _delta_done(self, ds_id, out_path, n: int, revision: int):
+        self.db.submit(record_export_checkpoint, ds_id, revision, "delta", n, out_path)
+        if ds_id == self.ds_id:
+            self.status_lbl.setText(f"Sesja #{ds_id} — wyeksportowano zmiany")
+        QSettings(ORG_NAME, APP_NAME).setValue("last_export_dir", os.path.dirname(out_path))
+        QMessageBox.information(self, "Eksport zmian",
+                                f"Zapisano {n} zmienionych tweetów:\n{os.path.basename(out_path)}")
+
+    def on_report(self):
+        """Answer statistics of the current dataset, computed from a snapshot in the background."""
+        if not self.ds_id:
+            return
+        ds_id = self.ds_id
+        self._after_writes(lambda: self.reports.submit(
+            dataset_report, ds_id, then=self._show_report,
+            fail=lambda msg: QMessageBox.critical(self, "Błąd raportu", msg)))
+
+    def _show_report(self, rep: dict):
+        box = QMessageBox(QMessageBox.Information, f"Statystyki zbioru #{rep['dataset']}",
+                          format_dataset_report(rep), QMessageBox.Ok, self)
+        box.setDetailedText(json.dumps(rep, indent=2, ensure_ascii=False))
+        box.exec()
+
+    def on_export_batch(self):
+        cur = self.con.cursor()
+        cur.execute("SELECT id, name, done, total, exported FROM datasets WHERE archive_path IS NULL ORDER BY id")
+        datasets = cur.fetchall()
+        if not datasets:
+            QMessageBox.information(self, "Brak zbiorów", "Nie ma zbiorów do eksportu."); return
+        settings = QSettings(ORG_NAME, APP_NAME)
+        docs_dir = QStandardPaths.writableLocation(QStandardPaths.DocumentsLocation) or os.path.expanduser("~")
+        dlg = BatchExportDialog(self, datasets, {r[0] for r in load_open_datasets(self.con)},
+                                settings.value("last_export_dir", docs_dir))
+        if dlg.exec() != QDialog.Accepted:
+            return
+        settings.setValue("last_export_dir", dlg.out_dir)
+        self._stop_timer()
+        self.db.drain()
+        try:
+            job = BatchExport(self.con, dlg.selected_ids(), dlg.out_dir, mark_exported=dlg.mark_box.isChecked())
+        except Exception as e:
+            QMessageBox.critical(self, "Błąd eksportu", str(e)); return
+
+        progress = QProgressDialog("Eksport zbiorów…", "Przerwij", 0, max(1, job.total), self)
+        progress.setWindowTitle("Eksport wielu zbiorów")
+        progress.setWindowModality(Qt.WindowModal)
+        progress.setMinimumDuration(0)
+        timer = QTimer(progress)
+        timer.setInterval(200)
+
+        def tick():
+            if progress.wasCanceled():
+                timer.stop()
+                job.cancel()   # running workers stop within EXPORT_PROGRESS_ROWS rows
+                progress.close()
+                self._after_batch_export(job)
+                return
+            finished = job.poll()
+            progress.setValue(job.done)
+            running = "".join(f"\n#{i}: {rows}/{job.sizes[i]}" for i, rows in sorted(job.rows_by_dataset().items())
+                              if rows)
+            progress.setLabelText(f"Wyeksportowano {len(job.ok)} z {len(job.futures)} zbiorów "
+                                  f"({job.done}/{job.total} tweetów){running}")
+            if finished:
+                timer.stop()
+                job.shutdown()
+                progress.close()
+                self._after_batch_export(job)
+
+        timer.timeout.connect(tick)
+        timer.start()
+
+    def _after_batch_export(self, job: BatchExport):
+        msg = f"Zapisano {len(job.ok)} plików."
+        if job.failed:
+            msg += "\n\nBłędy:\n" + "\n".join(f"#{i}: {e}" for i, e in sorted(job.failed.items()))
+        if job.cancelled:
+            msg += f"\n\nPrzerwano — nie wyeksportowano {len(job.cancelled)} zbiorów."
+        if job.mark_exported and job.ok:
+            exported = {i for i, _ in job.ok}
+            remaining = [r for r in load_open_datasets(self.con) if r[0] not in exported]
+            set_open_datasets([r[0] for r in remaining])
+            for i in exported:
+                self._sessions.pop(i, None)
+            if self.ds_id in exported:
+                self.ds_id = None
+                if remaining:
+                    _id, _name, cursor, total, _done = remaining[-1]
+                    self.load_dataset(_id, cursor, total)
+                else:
+                    set_active_dataset(None)
+                    self.cursor = 0; self.total = 0
+                    self.status_lbl.setText("Brak sesji")
+                    self._current_tweet_id = None
+                    self._show_tweet_centered("Zaimportuj CSV z kolumną 'tweets'…")
+                    self._clear_detail_panels()
+                    for t in self.tiles.values(): t.setChecked(False)
+                    self.update_ui_enabled(False)
+                    self.refresh_progress()
+        if self.ds_id:
+            row = get_tweet_row(self.con, self.ds_id, self.cursor)
+            if row: self._start_timer(row.id)
+        QMessageBox.information(self, "Eksport zakończony", msg)
+
     def save_window_state(self):
         settings = QSettings(ORG_NAME, APP_NAME)
         settings.setValue("geometry", self.saveGeometry())
@@ -1429,30 +5932,804 @@ class TaggerWindow(QMainWindow):
 
     def closeEvent(self, event: QCloseEvent):
         self._stop_timer()
+        self.db.shutdown()  # waits for queued writes
+        self.reports.shutdown()
+        if self.recorder is not None:
+            self.recorder.close()
+        if self.leaks is not None:
+            self.leaks.stop()
+        QApplication.instance().removeEventFilter(self.activity)
+        self.learner.shutdown()
+        self.backups.shutdown()
         self.save_window_state()
         event.accept()
 
-    # keep squares on window resize
+    # keep squares on window resize; rows rewrap from their own resizeEvent
     def resizeEvent(self, e):
         super().resizeEvent(e)
+        LAYOUT.schedule(self._relayout, phase=1)
+
+    def _relayout(self):
+        if self.recorder is not None and self._rec_size != (self.width(), self.height()):
+            self._rec_size = (self.width(), self.height())  # once per frame, not per resize event
+            self._rec("resize", w=self.width(), h=self.height())
         self._resize_tiles_square()
         self._update_detail_host_minheight()
 
-        # re-apply wrapping for every ChoiceRow currently on screen
-        for i in range(self.detail_vbox.count()):
-            w = self.detail_vbox.itemAt(i).widget()
-            if not w:
-                continue
-            lay = w.layout()
-            if not lay or lay.count() < 2:
-                continue
-            row = lay.itemAt(1).widget()
-            if isinstance(row, ChoiceRow):
-                # OLD: row._wrap_all_to_two_lines(max(1, row.width()))
-                row._maybe_rewrap()
 
+# ================== Headless commands ==================
+def bench_resize_storm(events: int = 600, calls: int = 2_000) -> dict:
+    """
+    A window drag: `events` resizes delivered back to back with every
+    follow-up panel open, coalesced into per-frame passes vs. run once per
+    event (LAYOUT.immediate), plus per-call cost of the wrap decision and
+    the follow-up height sum, old vs. cached. Runs on the offscreen platform.
+    """
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    app = QApplication.instance() or QApplication([])
+    with tempfile.TemporaryDirectory() as tmp:
+        for fmt in (QSettings.NativeFormat, QSettings.IniFormat):
+            QSettings.setPath(fmt, QSettings.UserScope, tmp)  # leave the user's settings alone
+        con = ensure_db(os.path.join(tmp, "bench.sqlite3"))
+        cur = con.cursor()
+        cur.execute("INSERT INTO datasets (name, created_at, total) VALUES ('bench', '', 1)")
+        ds_id = cur.lastrowid
+        cur.execute(f"INSERT INTO tweets (dataset_id, idx, text, text_hash, {', '.join(SCHEMA.label_cols)}) "
+                    f"VALUES (?, 0, 'bench', 'h', {', '.join('1' for _ in SCHEMA.label_cols)})", (ds_id,))
+        con.commit()
+
+        win = TaggerWindow(con)
+        win.ds_id, win.cursor, win.total = ds_id, 0, 1
+        win.show()
+        win.load_current_tweet()
+        LAYOUT.flush()
+        app.processEvents()
+        rows = win._detail_rows()
+        widths = [900 + (i * 37) % 700 for i in range(events)]
+
+        def storm(immediate: bool):
+            LAYOUT.immediate = immediate
+            passes = LAYOUT.passes
+            t0 = time.perf_counter()
+            for w in widths:
+                win.resize(w, 900)
+                app.processEvents()
+            LAYOUT.flush()
+            return round((time.perf_counter() - t0) * 1000, 1), LAYOUT.passes - passes
+
+        def legacy_rewrap(row):
+            fm = row.fontMetrics()
+            pad = 24
+            w_btn = row._compute_target_btn_width()
+            widths = [fm.horizontalAdvance(b.property("_raw_text") or b.text()) for b in row.buttons]
+            return any(w > (w_btn - pad) for w in widths), all(w < (w_btn - pad) * 0.82 for w in widths)
+
+        def cached_rewrap(row):
+            row._last_btn_w = None  # force the breakpoint check instead of the same-width shortcut
+            row._maybe_rewrap()
+
+        def legacy_minheight():
+            lay = win.detail_vbox
+            return sum(lay.itemAt(i).widget().sizeHint().height() for i in range(lay.count()))
+
+        def per_call(fn):
+            t0 = time.perf_counter()
+            for _ in range(calls):
+                fn()
+            return round((time.perf_counter() - t0) / calls * 1e6, 2)
+
+        try:
+            immediate_ms, immediate_passes = storm(True)
+            coalesced_ms, coalesced_passes = storm(False)
+            res = {
+                "events": events,
+                "panels": len(rows),
+                "per_event_ms": immediate_ms,
+                "per_event_passes": immediate_passes,
+                "coalesced_ms": coalesced_ms,
+                "coalesced_passes": coalesced_passes,
+                "rewrap_legacy_us": per_call(lambda: [legacy_rewrap(r) for r in rows]),
+                "rewrap_cached_us": per_call(lambda: [cached_rewrap(r) for r in rows]),
+                "minheight_legacy_us": per_call(legacy_minheight),
+                "minheight_cached_us": per_call(win._update_detail_host_minheight),
+                "metrics_hits": TEXT_METRICS.hits,
+                "metrics_misses": TEXT_METRICS.misses,
+            }
+        finally:
+            LAYOUT.immediate = False
+            win.learner.shutdown()
+            win.hide()
+            win.deleteLater()
+            QApplication.sendPostedEvents(None, QEvent.DeferredDelete)
+            con.close()
+    return res
+
+def bench_activity_filter(events: int = 100_000) -> dict:
+    """
+    Cost of the idle-aware timing hook: ns per delivered event without a
+    filter, with ActivityTracker installed, for an input event (recorded)
+    and a non-input event (passed through). Runs on the offscreen platform.
+    """
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    app = QApplication.instance() or QApplication([])
+    target = QWidget()
+    move = QMouseEvent(QEvent.MouseMove, QPointF(1, 1), QPointF(1, 1), Qt.NoButton, Qt.NoButton, Qt.NoModifier)
+    other = QEvent(QEvent.User)
+
+    def per_event(ev):
+        t0 = time.perf_counter()
+        for _ in range(events):
+            QApplication.sendEvent(target, ev)
+        return (time.perf_counter() - t0) / events * 1e9
+
+    res = {"events": events, "bare_ns": {"input": round(per_event(move)), "other": round(per_event(other))}}
+    tracker = ActivityTracker(IDLE_AFTER_S)
+    app.installEventFilter(tracker)
+    try:
+        res["filtered_ns"] = {"input": round(per_event(move)), "other": round(per_event(other))}
+    finally:
+        app.removeEventFilter(tracker)
+    res["overhead_ns"] = {k: res["filtered_ns"][k] - res["bare_ns"][k] for k in res["bare_ns"]}
+    return res
+
+def _rss_mb() -> float:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1_048_576
+    except (OSError, ValueError, AttributeError):
+        import resource  # no /proc: peak instead of current (kB on Linux)
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def _percentile(values, q: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+def _latency_summary(ms) -> dict:
+    return {"count": len(ms), "p50_ms": round(_percentile(ms, 0.5), 2),
+            "p95_ms": round(_percentile(ms, 0.95), 2), "max_ms": round(max(ms, default=0.0), 2)}
+
+@contextmanager
+def _intercepted_dialogs(log: list):
+    """Headless runs: message boxes are logged (title) and answered "No" instead of blocking."""
+    saved = {name: getattr(QMessageBox, name) for name in ("information", "warning", "critical", "question")}
+    def box(name):
+        def show(*args, **kw):
+            log.append(f"{name}: {args[1] if len(args) > 1 else ''}")
+            return QMessageBox.No
+        return staticmethod(show)
+    for name in saved:
+        setattr(QMessageBox, name, box(name))
+    try:
+        yield log
+    finally:
+        for name, fn in saved.items():
+            setattr(QMessageBox, name, fn)
+
+def _synthetic_tweets_csv(path, n: int, rnd) -> str:
+    """`n` tweet-like rows of mixed length with ~10% exact duplicates."""
+    words = ["klimat", "szczepionki", "granica", "podatki", "rząd", "Unia", "wybory", "sąd", "ceny", "prąd",
+             "lekarz", "szpital", "nauka", "protest", "https://t.co/x"]
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        w = csv.writer(f)
+        w.writerow(["tweets"])
+        w.writerows([" ".join(rnd.choices(words, k=rnd.randint(8, 40))) + f" #{i % (n * 9 // 10 or 1)}"]
+                    for i in range(n))
+    return path
+
+def _offscreen_window(con, settings_dir, *, rapid=False, size=(1280, 900)):
+    """TaggerWindow for headless runs: settings kept in `settings_dir`, no automatic backups."""
+    for fmt in (QSettings.NativeFormat, QSettings.IniFormat):
+        QSettings.setPath(fmt, QSettings.UserScope, settings_dir)  # leave the user's settings alone
+    set_rapid_mode(rapid)
+    win = TaggerWindow(con)
+    win._backup_timer.stop()  # never snapshot a scratch DB into the real backup folder
+    win.resize(*size)
+    win.show()
+    win.activateWindow()
+    return win
+
+def _close_offscreen_window(win):
+    win.close()
+    win.deleteLater()
+    QApplication.sendPostedEvents(None, QEvent.DeferredDelete)
+
+def run_load_test(actions: int = 3_000, tweets: int = 2_000, *, seed: int = 0,
+                  rapid: bool = False, budgets=None, warmup: int = 100,
+                  monitor=None, sample_every: int = 500, db_latency_ms: float = 0.0) -> dict:
+    """
+    End-to-end UI load test: TaggerWindow on the offscreen platform against a
+    synthetic DB, driven by a scripted annotator (random tiles, an answer for
+    every follow-up that opens, sometimes a tile ticked and unticked again,
+    then Next; with `rapid` everything is typed through the rapid-mode keys).
+    Records wall time per action including the layout pass it triggers,
+    event-loop stalls, SQL statements on the GUI connection and RSS growth,
+    and lists every budget (LOADTEST_BUDGETS, overridable) that was exceeded.
+    A LeakMonitor passed as `monitor` is sampled after warm-up and then every
+    `sample_every` actions, always between tweets; its report lands in "leaks".
+    `db_latency_ms` delays every job of the window's DB worker: the actions
+    must stay within budget anyway, and once the queue has drained every
+    tweet must hold the answers it showed when the annotator left it.
+    """
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    from PySide6.QtTest import QTest
+    app = QApplication.instance() or QApplication([])
+    budgets = {**LOADTEST_BUDGETS, **(budgets or {})}
+    rnd = random.Random(seed)
+    dialogs = []
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_path = _synthetic_tweets_csv(os.path.join(tmp, "load.csv"), tweets, rnd)
+        con = ensure_db(os.path.join(tmp, "load.sqlite3"))
+        ds_id, total = create_dataset_from_csv(con, csv_path, text_store="inline")
+        win = _offscreen_window(con, tmp, rapid=rapid)
+        win.db.latency_s = db_latency_ms / 1000
+        win.load_dataset(ds_id, 0, total)
+        LAYOUT.flush()
+        app.processEvents()
+
+        shown: dict[int, tuple] = {}   # idx -> answers on screen when the annotator moved on
+        statements = [0]
+        con.set_trace_callback(lambda _sql: statements.__setitem__(0, statements[0] + 1))
+        timings: dict[str, list[float]] = {}
+        stmt_counts: dict[str, list[int]] = {}
+        done_tweets = 0
+        rss_start = None
+        try:
+            def act(kind, fn):
+                n0 = statements[0]
+                t0 = time.perf_counter()
+                fn()
+                LAYOUT.flush()
+                app.processEvents()
+                # no running event loop here, so deleteLater() needs a nudge
+                QApplication.sendPostedEvents(None, QEvent.DeferredDelete)
+                timings.setdefault(kind, []).append((time.perf_counter() - t0) * 1000)
+                stmt_counts.setdefault(kind, []).append(statements[0] - n0)
+
+            def tile(i):
+                if rapid:
+                    act("tile", lambda: QTest.keyClick(win, Qt.Key(Qt.Key_1 + i)))
+                else:
+                    act("tile", win.tiles[LABELS[i][1]].click)
+
+            def answer(key):
+                card = win._detail_cards.get(key)
+                row = card.findChild(ChoiceRow) if card is not None else None
+                if row is None or row._selected or any(b.isChecked() for b in row.buttons):
+                    return
+                opt = rnd.randrange(len(row.options))
+                if rapid:
+                    win._set_rapid_focus(key)
+                    act("followup", lambda: QTest.keyClick(win, Qt.Key(Qt.Key_A + opt)))
+                else:
+                    act("followup", lambda: row.press(opt))
+
+            n_actions = lambda: sum(len(v) for v in timings.values())
+            sampled_at = None
+            with _intercepted_dialogs(dialogs):
+                while n_actions() < actions:
+                    if rss_start is None and n_actions() >= warmup:
+                        rss_start = _rss_mb()
+                    if monitor is not None and n_actions() >= warmup and (
+                            sampled_at is None or n_actions() - sampled_at >= sample_every):
+                        monitor.sample()
+                        sampled_at = n_actions()
+                    for i in rnd.sample(range(len(LABELS)), rnd.choice((1, 1, 2, 3))):
+                        col = LABELS[i][1]
+                        if not win.tiles[col].isChecked():
+                            tile(i)
+                        answer("intent" if col == "inne" else col)
+                    if rnd.random() < 0.1:  # second thoughts: tick and untick another tile
+                        i = rnd.randrange(len(LABELS))
+                        if not win.tiles[LABELS[i][1]].isChecked():
+                            tile(i); tile(i)
+                    d = win._draft
+                    shown[win.cursor] = (dict(d.labels), {k: set(v) for k, v in d.details.items()}, d.intent)
+                    if next_own_idx(con, ds_id, win.cursor) is None:
+                        act("jump", lambda: win._jump_to(0))  # end of the dataset: start over
+                    elif rapid:
+                        act("next", lambda: QTest.keyClick(win, Qt.Key_Return))
+                    else:
+                        act("next", win.btn_next.click)
+                    done_tweets += 1
+            rss_end = _rss_mb()
+            leaks = monitor.report() if monitor is not None else None
+            t0 = time.perf_counter()
+            win._sync_storage()
+            drain_s = time.perf_counter() - t0
+            mismatches = []
+            for idx, (labels, details, intent) in shown.items():
+                row = get_tweet_row(con, ds_id, idx)
+                if (SCHEMA.labels_of(row), SCHEMA.details_of(row), int(row.intent)) != (labels, details, intent):
+                    mismatches.append(idx)
+        finally:
+            con.set_trace_callback(None)
+            _close_offscreen_window(win)
+            con.close()
+
+    every = [t for v in timings.values() for t in v]
+    stalls = [t for t in every if t > LOADTEST_STALL_MS]
+    res = {
+        "actions": len(every),
+        "tweets": done_tweets,
+        "rapid": rapid,
+        "seed": seed,
+        "per_action": {
+            kind: {
+                **_latency_summary(v),
+                "statements_avg": round(sum(stmt_counts[kind]) / len(v), 1),
+                "statements_max": max(stmt_counts[kind]),
+            }
+            for kind, v in sorted(timings.items())
+        },
+        "p50_ms": round(_percentile(every, 0.5), 2),
+        "p95_ms": round(_percentile(every, 0.95), 2),
+        "max_ms": round(max(every, default=0.0), 2),
+        "stalls": {"threshold_ms": LOADTEST_STALL_MS, "count": len(stalls),
+                   "max_ms": round(max(stalls, default=0.0), 2)},
+        "statements_per_tweet": round(sum(sum(v) for v in stmt_counts.values()) / max(1, done_tweets), 1),
+        "rss_mb": {"start": round(rss_start or rss_end, 1), "end": round(rss_end, 1),
+                   "growth": round(rss_end - (rss_start or rss_end), 1)},
+        "dialogs": {msg: dialogs.count(msg) for msg in dict.fromkeys(dialogs)},
+        "db": {"latency_ms": db_latency_ms, "final_drain_s": round(drain_s, 2),
+               "mismatches": len(mismatches), "mismatched_idx": mismatches[:10]},
+    }
+    if leaks is not None:
+        res["leaks"] = leaks
+    measured = {
+        "p95_ms": res["p95_ms"],
+        "max_ms": res["max_ms"],
+        "stall_rate": len(stalls) / max(1, len(every)),
+        "statements_per_tweet": res["statements_per_tweet"],
+        "rss_growth_mb": res["rss_mb"]["growth"],
+        "dialogs": len(dialogs),
+        "mismatches": len(mismatches),
+    }
+    res["budgets"] = budgets
+    res["failures"] = [f"{k}: {measured[k]:.4g} > {budgets[k]}" for k in budgets
+                       if k in measured and measured[k] > budgets[k]]
+    res["ok"] = not res["failures"]
+    return res
+
+def _cli_loadtest(args) -> int:
+    budgets = {}
+    for item in args.budget or []:
+        key, _, value = item.partition("=")
+        if key not in LOADTEST_BUDGETS or not value:
+            print(f"unknown budget {item!r} (known: {', '.join(LOADTEST_BUDGETS)})", file=sys.stderr)
+            return 2
+        budgets[key] = float(value)
+    res = run_load_test(args.n, args.tweets, seed=args.seed, rapid=args.rapid, budgets=budgets,
+                        db_latency_ms=args.db_latency_ms)
+    print(json.dumps(res, indent=2, ensure_ascii=False))
+    for failure in res["failures"]:
+        print(f"over budget: {failure}", file=sys.stderr)
+    return 0 if res["ok"] else 1
+
+def run_soak(actions: int = 10_000, *, seed: int = 0, rapid: bool = False, limits=None) -> dict:
+    """
+    Leak soak: the load-test annotator for `actions` actions under a
+    LeakMonitor, on a dataset long enough never to wrap around, so every
+    sample sees the same screen (a fresh tweet) and any growth in live Qt
+    objects, wrappers, Python heap or RSS is left behind by the session.
+    Latency budgets are not checked here (tracemalloc slows everything down).
+    """
+    limits = {**SOAK_LIMITS, **(limits or {})}
+    monitor = LeakMonitor()
+    try:
+        res = run_load_test(actions, tweets=actions, seed=seed, rapid=rapid, warmup=200,
+                            budgets={k: float("inf") for k in LOADTEST_BUDGETS}, monitor=monitor)
+    finally:
+        monitor.stop()
+    leaks = res["leaks"]
+    res["limits"] = limits
+    res["failures"] = [f"{k}: {leaks[k]:.4g} > {limits[k]}" for k in limits
+                       if leaks.get(k) is not None and leaks[k] > limits[k]]
+    res["ok"] = not res["failures"]
+    return res
+
+def _cli_soak(args) -> int:
+    res = run_soak(args.n, seed=args.seed, rapid=args.rapid)
+    if not args.samples:
+        res["leaks"].pop("samples")
+    print(json.dumps(res, indent=2, ensure_ascii=False))
+    for failure in res["failures"]:
+        print(f"leak: {failure}", file=sys.stderr)
+    return 0 if res["ok"] else 1
+
+def read_trace(path) -> list[dict]:
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+def replay_session(trace_path, db_path=None, *, speed: float = 0.0) -> dict:
+    """
+    Drive an offscreen TaggerWindow from a SessionRecorder trace and report
+    latency per action, per recorded minute and the slowest actions.
+    `db_path` (copied first, never touched) should be the DB the session
+    ran on, e.g. a snapshot from backups/; without it one synthetic dataset
+    as large as the recorded one stands in for every dataset. `speed` 0
+    replays back to back, 1 at the recorded pace, 2 twice as fast. Actions
+    that no longer apply (e.g. a follow-up card the replayed tweet does not
+    show) are counted as skipped.
+    """
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    from PySide6.QtTest import QTest
+    app = QApplication.instance() or QApplication([])
+    events = read_trace(trace_path)
+    head = events[0] if events and events[0].get("a") == "start" else {}
+    dialogs = []
+    with tempfile.TemporaryDirectory() as tmp:
+        work = os.path.join(tmp, "replay.sqlite3")
+        if db_path:
+            with closing(sqlite3.connect(db_path)) as src, closing(sqlite3.connect(work)) as dst:
+                src.backup(dst)
+            con = ensure_db(work)
+            stand_in, source = None, f"copy of {db_path}"
+        else:
+            n = max([e.get("total") or 0 for e in events if e.get("a") in ("start", "dataset")] + [100])
+            con = ensure_db(work)
+            stand_in, _ = create_dataset_from_csv(
+                con, _synthetic_tweets_csv(os.path.join(tmp, "replay.csv"), n, random.Random(0)), text_store="inline")
+            source = f"synthetic ({n} tweets)"
+
+        def open_dataset(ds, idx):
+            row = con.execute("SELECT total FROM datasets WHERE id=?", (stand_in or ds,)).fetchone()
+            if not row:
+                return False
+            win.load_dataset(stand_in or ds, min(idx or 0, max(0, row[0] - 1)), row[0])
+            return True
+
+        def detail(key, target):
+            card = win._detail_cards.get(key)
+            if card is None:
+                return False
+            row = card.findChild(ChoiceRow)
+            current = {i for i, b in enumerate(row.buttons) if b.isChecked()}
+            changed = (target - current) or (current - target)
+            if not changed:
+                return False
+            row.press(min(changed))
+            return True
+
+        def tile(col, on):
+            t = win.tiles.get(col)
+            if t is None or t.isChecked() == on or not t.isEnabled():
+                return False
+            t.click()
+            return True
+
+        apply = {
+            "tile": lambda e: tile(e["col"], e["on"]),
+            "detail": lambda e: detail(e["col"], set(e["sel"])),
+            "intent": lambda e: detail("intent", {e["i"]}),
+            "next": lambda e: win.on_next() or True,
+            "back": lambda e: win.on_back() or True,
+            "jump": lambda e: win._jump_to(e["idx"]) or True,
+            "dataset": lambda e: open_dataset(e["ds"], e.get("idx")),
+            "zoom": lambda e: win._adjust_tweet_font(e["d"]) or True,
+            "resize": lambda e: win.resize(e["w"], e["h"]) or True,
+            "rapid": lambda e: win.act_rapid.setChecked(e["on"]) or True,
+        }
+
+        win = _offscreen_window(con, tmp, rapid=bool(head.get("rapid")),
+                                size=(head.get("w", 1280), head.get("h", 900)))
+        if head.get("font"):
+            win._tweet_font_pt = head["font"]
+        if head.get("ds"):
+            open_dataset(head["ds"], head.get("idx"))
+        LAYOUT.flush()
+        app.processEvents()
+
+        timings: dict[str, list[float]] = {}
+        samples = []   # (recorded t, action, ms, line)
+        skipped: dict[str, int] = {}
+        t_start = time.perf_counter()
+        try:
+            with _intercepted_dialogs(dialogs):
+                for line, e in enumerate(events, 1):
+                    fn = apply.get(e.get("a"))
+                    if fn is None:
+                        continue  # start/stop markers, or actions this version does not know
+                    if speed:
+                        wait = t_start + e["t"] / speed - time.perf_counter()
+                        if wait > 0:
+                            QTest.qWait(int(wait * 1000))
+                    t0 = time.perf_counter()
+                    done = fn(e)
+                    LAYOUT.flush()
+                    app.processEvents()
+                    QApplication.sendPostedEvents(None, QEvent.DeferredDelete)
+                    ms = (time.perf_counter() - t0) * 1000
+                    if not done:
+                        skipped[e["a"]] = skipped.get(e["a"], 0) + 1
+                        continue
+                    timings.setdefault(e["a"], []).append(ms)
+                    samples.append((e["t"], e["a"], ms, line))
+        finally:
+            _close_offscreen_window(win)
+            con.close()
+        replay_s = time.perf_counter() - t_start
+
+    minutes: dict[int, list[float]] = {}
+    for t, _a, ms, _line in samples:
+        minutes.setdefault(int(t // 60), []).append(ms)
+    every = [ms for _t, _a, ms, _line in samples]
+    return {
+        "trace": trace_path,
+        "db": source,
+        "speed": speed or "max",
+        "actions": len(samples),
+        "skipped": skipped,
+        "recorded_s": events[-1]["t"] if events else 0,
+        "replay_s": round(replay_s, 2),
+        **{k: v for k, v in _latency_summary(every).items() if k != "count"},
+        "per_action": {a: _latency_summary(v) for a, v in sorted(timings.items())},
+        "per_minute": [{"minute": m, **_latency_summary(v)} for m, v in sorted(minutes.items())],
+        "slowest": [{"line": line, "t": t, "a": a, "ms": round(ms, 2)}
+                    for t, a, ms, line in sorted(samples, key=lambda s: -s[2])[:10]],
+        "dialogs": {msg: dialogs.count(msg) for msg in dict.fromkeys(dialogs)},
+    }
+
+def _cli_check_bulk(args) -> int:
+    res = check_bulk_edit()
+    print(json.dumps(res, indent=2, ensure_ascii=False))
+    return 0 if res["ok"] else 1
+
+def _cli_check_backup(args) -> int:
+    res = check_backup_under_writes(args.seconds)
+    print(json.dumps(res, indent=2))
+    failures = [f"inconsistent snapshot: {name}" for name in res["inconsistent"]]
+    if not res["snapshots"]:
+        failures.append("no snapshot was taken")
+    for failure in failures:
+        print(failure, file=sys.stderr)
+    return 0 if not failures else 1
+
+def _cli_check_export(args) -> int:
+    res = check_export_under_writes(args.seconds)
+    print(json.dumps(res, indent=2))
+    failures = [f"inconsistent export: {name}" for name in res["inconsistent"]]
+    if not res["exports"]:
+        failures.append("no export was made")
+    if not res["checkpoint_complete"]:
+        failures.append("the checkpoint after the run did not get through the WAL")
+    for failure in failures:
+        print(failure, file=sys.stderr)
+    return 0 if not failures else 1
+
+def _cli_restore(args) -> int:
+    with closing(sqlite3.connect(args.db, timeout=30)) as con:
+        before = restore_backup(con, args.snapshot, args.dest)
+    print(f"restored {args.snapshot}; previous state saved as {before}")
+    return 0
+
+def _cli_import_folder(args) -> int:
+    def report(done, files, rows):
+        print(f"{done}/{files} files — {rows} tweets", file=sys.stderr)
+    with closing(ensure_db(args.db)) as con:
+        ds_id, total = import_csv_folder(con, args.folder, workers=args.workers,
+                                         text_store=args.store, progress=report)
+    print(f"dataset #{ds_id}: {total} tweets")
+    return 0
+
+def _cli_import(args) -> int:
+    with closing(ensure_db(args.db)) as con:
+        ds_id, total = import_source(con, args.source, fmt=args.format, field=args.field,
+                                     text_store=args.store, name=args.name)
+    print(f"dataset #{ds_id}: {total} tweets")
+    return 0
+
+def _cli_export_batch(args) -> int:
+    with closing(ensure_db(args.db)) as con:
+        if args.all:
+            ids = [r[0] for r in con.execute("SELECT id FROM datasets WHERE archive_path IS NULL ORDER BY id")]
+        else:
+            ids = args.ids or []
+        if not ids:
+            print("no datasets selected (use --ids or --all)", file=sys.stderr)
+            return 2
+        job = BatchExport(con, ids, args.out_dir, workers=args.workers, mark_exported=args.mark_exported)
+        job.run(lambda done, total, ds_id: print(f"#{ds_id} done — {done}/{total} tweets", file=sys.stderr))
+    for ds_id, path in sorted(job.ok):
+        print(f"#{ds_id}\t{path}")
+    for ds_id, err in sorted(job.failed.items()):
+        print(f"#{ds_id}\tFAILED: {err}", file=sys.stderr)
+    return 1 if job.failed else 0
+
+def _cli_export_delta(args) -> int:
+    with closing(ensure_db(args.db)) as con:
+        n, rev = export_dataset_delta(con, args.dataset, args.out, args.since)
+    print(f"{n} changed tweets written to {args.out} (checkpoint r{rev})")
+    return 0
+
+def _cli_check_archive(args) -> int:
+    res = check_archive()
+    print(json.dumps(res, indent=2, ensure_ascii=False))
+    return 0 if res["ok"] else 1
+
+def _cli_unarchive(args) -> int:
+    with closing(ensure_db(args.db)) as con:
+        restore_archived_dataset(con, args.dataset)
+    print(f"dataset #{args.dataset} restored")
+    return 0
+
+def _cli_compress_dataset(args) -> int:
+    with closing(ensure_db(args.db)) as con:
+        res = compress_dataset(con, args.dataset,
+                               lambda done, total: print(f"{done}/{total} tweets", file=sys.stderr))
+    print(json.dumps(res, indent=2))
+    return 0
+
+def _cli_maintenance(args) -> int:
+    with closing(ensure_db(args.db)) as con:
+        report = maintain(con, full=args.full, older_than_days=args.archive_after)
+    print(json.dumps(report, indent=2))
+    return 0
+
+def build_cli() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="app.py", description=f"{APP_NAME} — headless commands")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("backup", help="snapshot the DB now (safe while the app runs)")
+    p.add_argument("--db", default=DB_PATH, help="database file")
+    p.add_argument("--dest", default=BACKUP_DIR, help="snapshot folder")
+    p.set_defaults(func=lambda a: print(backup_and_prune(a.db, a.dest)))
+
+    p = sub.add_parser("backups", help="list snapshots, newest first")
+    p.add_argument("--db", default=DB_PATH, help="database file")
+    p.add_argument("--dest", default=BACKUP_DIR, help="snapshot folder")
+    p.set_defaults(func=lambda a: print("\n".join(
+        f"{ts:%Y-%m-%d %H:%M:%S}  {path}" for path, ts in list_backups(a.dest, a.db))))
+
+    p = sub.add_parser("restore", help="replace the DB with a snapshot (current state is snapshotted first)")
+    p.add_argument("snapshot", help="snapshot file to restore")
+    p.add_argument("--db", default=DB_PATH, help="database file")
+    p.add_argument("--dest", default=BACKUP_DIR, help="folder for the pre-restore snapshot")
+    p.set_defaults(func=_cli_restore)
+
+    p = sub.add_parser("import", help="one dataset from a CSV/JSONL file (.gz/.bz2/.xz ok) or stdin")
+    p.add_argument("source", help="input file, or - to read stdin")
+    p.add_argument("--format", choices=sorted(READERS), default=None,
+                   help="reader (default: from the file name; csv for stdin)")
+    p.add_argument("--field", default=None, help="column / JSON field with the tweet text (dotted path for JSONL)")
+    p.add_argument("--name", default=None, help="dataset name (default: file name)")
+    p.add_argument("--store", choices=TEXT_STORE_MODES, default=None, help="text storage (default: as in the app)")
+    p.add_argument("--db", default=DB_PATH, help="database file")
+    p.set_defaults(func=_cli_import)
+
+    p = sub.add_parser("import-folder", help="one dataset from a folder of CSV shards (parallel parsing)")
+    p.add_argument("folder", help="folder with *.csv files, each with a 'tweets' column")
+    p.add_argument("--workers", type=int, default=None, help="parser processes (default: cores, 0: inline)")
+    p.add_argument("--store", choices=TEXT_STORE_MODES, default=None, help="text storage (default: as in the app)")
+    p.add_argument("--db", default=DB_PATH, help="database file")
+    p.set_defaults(func=_cli_import_folder)
+
+    p = sub.add_parser("export-batch", help="export many datasets in parallel worker processes")
+    p.add_argument("out_dir", help="output folder (one CSV per dataset)")
+    p.add_argument("--ids", type=int, nargs="+", help="dataset ids")
+    p.add_argument("--all", action="store_true", help="every dataset that is not archived")
+    p.add_argument("--workers", type=int, default=None, help="worker processes (default: cores)")
+    p.add_argument("--mark-exported", action="store_true", help="close the exported datasets")
+    p.add_argument("--db", default=DB_PATH, help="database file")
+    p.set_defaults(func=_cli_export_batch)
+
+    p = sub.add_parser("export-delta", help="CSV of tweets changed since the last export checkpoint")
+    p.add_argument("dataset", type=int, help="dataset id")
+    p.add_argument("out", help="output CSV")
+    p.add_argument("--since", type=int, default=None, help="revision to start after (default: last checkpoint)")
+    p.add_argument("--db", default=DB_PATH, help="database file")
+    p.set_defaults(func=_cli_export_delta)
+
+    p = sub.add_parser("maintenance", help="archive exported datasets, ANALYZE, reclaim free space")
+    p.add_argument("--db", default=DB_PATH, help="database file")
+    p.add_argument("--archive-after", type=float, default=ARCHIVE_AFTER_DAYS,
+                   help="archive datasets exported at least this many days ago")
+    p.add_argument("--full", action="store_true", help="full VACUUM instead of incremental")
+    p.set_defaults(func=_cli_maintenance)
+
+    p = sub.add_parser("unarchive", help="bring an archived dataset back into the DB")
+    p.add_argument("dataset", type=int, help="dataset id")
+    p.add_argument("--db", default=DB_PATH, help="database file")
+    p.set_defaults(func=_cli_unarchive)
+
+    p = sub.add_parser("compress-dataset", help="move an existing dataset's texts to the compressed store")
+    p.add_argument("dataset", type=int, help="dataset id")
+    p.add_argument("--db", default=DB_PATH, help="database file")
+    p.set_defaults(func=_cli_compress_dataset)
+
+    p = sub.add_parser("check-backup", help="snapshot under concurrent writes and verify every snapshot")
+    p.add_argument("--seconds", type=float, default=3.0, help="how long to keep snapshotting")
+    p.set_defaults(func=_cli_check_backup)
+
+    p = sub.add_parser("check-export", help="export from read snapshots under concurrent writes and verify every file")
+    p.add_argument("--seconds", type=float, default=3.0, help="how long to keep exporting")
+    p.set_defaults(func=_cli_check_export)
+
+    p = sub.add_parser("bench-prelabel", help="keyword pre-labeling throughput")
+    p.add_argument("-n", type=int, default=100_000, help="number of synthetic tweets")
+    p.set_defaults(func=lambda a: print(json.dumps(bench_prelabel(a.n), indent=2)))
+
+    p = sub.add_parser("bench-textstore", help="inline vs. memory-mapped vs. compressed tweet text")
+    p.add_argument("-n", type=int, default=200_000, help="number of tweets")
+    p.add_argument("--updates", type=int, default=20_000, help="label updates to time")
+    p.set_defaults(func=lambda a: print(json.dumps(bench_text_store(a.n, a.updates), indent=2)))
+
+    p = sub.add_parser("bench-rowlayout", help="per-call overhead of row reads and label saves")
+    p.add_argument("-n", type=int, default=50_000, help="calls per measurement")
+    p.set_defaults(func=lambda a: print(json.dumps(bench_row_layout(a.n), indent=2)))
+
+    p = sub.add_parser("bench-resize", help="window drag: coalesced vs. per-event layout work")
+    p.add_argument("-n", type=int, default=600, help="resize events in the storm")
+    p.set_defaults(func=lambda a: print(json.dumps(bench_resize_storm(a.n), indent=2)))
+
+    p = sub.add_parser("loadtest", help="drive the window offscreen with a scripted annotator; fail over budget")
+    p.add_argument("-n", type=int, default=3_000, help="number of UI actions")
+    p.add_argument("--tweets", type=int, default=2_000, help="tweets in the synthetic dataset")
+    p.add_argument("--seed", type=int, default=0, help="random seed of the scripted session")
+    p.add_argument("--rapid", action="store_true", help="type everything through rapid-mode keys")
+    p.add_argument("--budget", action="append", metavar="KEY=VALUE",
+                   help=f"override a budget ({', '.join(LOADTEST_BUDGETS)}); repeatable")
+    p.add_argument("--db-latency-ms", type=float, default=0.0,
+                   help="delay every DB worker job this long (simulated slow disk / lock wait)")
+    p.set_defaults(func=_cli_loadtest)
+
+    p = sub.add_parser("soak", help="long scripted session under leak diagnostics; fail if memory keeps growing")
+    p.add_argument("-n", type=int, default=10_000, help="number of UI actions")
+    p.add_argument("--seed", type=int, default=0, help="random seed of the scripted session")
+    p.add_argument("--rapid", action="store_true", help="type everything through rapid-mode keys")
+    p.add_argument("--samples", action="store_true", help="include every sample in the output")
+    p.set_defaults(func=_cli_soak)
+
+    p = sub.add_parser("replay", help="replay a recorded session offscreen and report latency per action")
+    p.add_argument("trace", help="session_*.jsonl from the traces folder")
+    p.add_argument("--db", default=None, help="DB (or backup snapshot) the session ran on; copied, never modified "
+                                              "(default: a synthetic dataset)")
+    p.add_argument("--speed", type=float, default=0.0, help="0 = as fast as possible, 1 = recorded pace")
+    p.set_defaults(func=lambda a: print(json.dumps(replay_session(a.trace, a.db, speed=a.speed),
+                                                   indent=2, ensure_ascii=False)))
+
+    p = sub.add_parser("bench-idle", help="per-event cost of the idle-aware timing filter")
+    p.add_argument("-n", type=int, default=100_000, help="events delivered per measurement")
+    p.set_defaults(func=lambda a: print(json.dumps(bench_activity_filter(a.n), indent=2)))
+
+    p = sub.add_parser("bench-export", help="batch export wall time vs. worker processes")
+    p.add_argument("-n", type=int, default=50_000, help="tweets per dataset")
+    p.add_argument("--datasets", type=int, default=8, help="number of datasets")
+    p.add_argument("--workers", type=int, nargs="+", default=None, help="worker counts (default: 1, 2, 4, 8 up to cores)")
+    p.set_defaults(func=lambda a: print(json.dumps(bench_batch_export(a.datasets, a.n, a.workers), indent=2)))
+
+    p = sub.add_parser("bench-import", help="folder import throughput vs. parser processes")
+    p.add_argument("--files", type=int, default=64, help="number of CSV shards")
+    p.add_argument("-n", type=int, default=5_000, help="tweets per shard")
+    p.add_argument("--workers", type=int, nargs="+", default=None, help="worker counts (0 = inline)")
+    p.set_defaults(func=lambda a: print(json.dumps(bench_folder_import(a.files, a.n, a.workers), indent=2)))
+
+    p = sub.add_parser("bench-readers", help="import throughput per source format and compression")
+    p.add_argument("-n", type=int, default=200_000, help="tweets per file")
+    p.set_defaults(func=lambda a: print(json.dumps(bench_readers(a.n), indent=2)))
+
+    p = sub.add_parser("bench-bulk", help="bulk edit vs. per-tweet saves")
+    p.add_argument("-n", type=int, default=100_000, help="number of tweets edited at once")
+    p.set_defaults(func=lambda a: print(json.dumps(bench_bulk_edit(a.n), indent=2)))
+
+    p = sub.add_parser("check-bulk", help="contradictory bulk edits are rejected, consistent ones applied")
+    p.set_defaults(func=_cli_check_bulk)
+
+    p = sub.add_parser("check-archive", help="archived datasets still feed annotation memory")
+    p.set_defaults(func=_cli_check_archive)
+
+    return parser
+
+def run_cli(argv) -> int:
+    args = build_cli().parse_args(argv)
+    return args.func(args) or 0
 
 def main():
+    # `python app.py <command> ...` runs headless; no arguments opens the GUI
+    if len(sys.argv) > 1 and not sys.argv[1].startswith("-"):
+        sys.exit(run_cli(sys.argv[1:]))
+
     app = QApplication(sys.argv)
     app.setOrganizationName(ORG_NAME)
     app.setApplicationName(APP_NAME)
@@ -1460,6 +6737,8 @@ def main():
     con = ensure_db()
     win = TaggerWindow(con)
     win.show()
+    if maintenance_due():
+        win.run_scheduled_maintenance()
     sys.exit(app.exec())
 
 if __name__ == "__main__":